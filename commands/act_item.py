@@ -269,7 +269,7 @@ class CmdGet(Command):
             obj_pos, obj_name = parse_dot_notation(obj_name)
             con_pos, con_name = parse_dot_notation(con_name)
 
-            locs = [ch.contents, ch.location.contents]
+            locs = [ch.contents, ch.location_contents()]
 
             ####### first find container(s) ################
             matched_containers = []
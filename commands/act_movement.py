@@ -1,7 +1,7 @@
 from world.utils.act import Announce, act
-from evennia import search_object, logger
+from evennia import logger
 from commands.command import Command
-from typeclasses.rooms.rooms import Room
+from typeclasses.rooms.rooms import get_room
 
 _MOVEMENT_HELP = """
 
@@ -32,14 +32,13 @@ class _CmdMove(Command):
             return
 
         # double check to make sure destination room actually exists
-        room = search_object(str(exit), typeclass=Room)
+        room = get_room(exit)
         if not room:
             logger.log_errmsg(
                 "Attempting to move to a valid exit vnum, but room doesn't exist"
             )
             ch.msg(_ERR_MOVEMENT)
             return
-        room = room[0]
 
         # special condition if ch is in redit
         if ch.ndb._redit:
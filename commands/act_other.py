@@ -1,6 +1,19 @@
+from evennia import search_object
 from commands.command import Command
+from typeclasses.characters import Character
+from typeclasses.mobs.mob import Mob
+from world.atlas import get_atlas, render_map
+from world.graph import room_graph
 from world.map import Wormy
-from world.utils.utils import is_wiz
+from world.pathfinding import distance, next_step
+from world.utils.db import search_mobdb
+from world.utils.utils import can_see_obj, is_wiz
+
+# biggest map players can ask for
+_MAX_MAP_SIZE = 25
+
+# how far away, in steps, a trail can still be sensed
+_TRACK_MAX_STEPS = 50
 
 
 class CmdTitle(Command):
@@ -36,7 +49,7 @@ class CmdMap(Command):
     Map size must be an odd number, if an even number is supplied
     it will round to nearest number up.
 
-    Minimum value is 5
+    Minimum value is 5, maximum is 25
 
     Usage:
         map
@@ -45,6 +58,8 @@ class CmdMap(Command):
 
     Wizes:
         map 5 true/false # will display debug information if wiz
+        map zone # map of the whole floor of the zone you're in
+        map zone <z> # map of floor z of the zone you're in
     """
 
     key = "map"
@@ -54,8 +69,12 @@ class CmdMap(Command):
         args = self.args.strip().split()
         debug = False
 
+        if args and args[0] == 'zone' and is_wiz(ch):
+            self.zone_map(args[1:])
+            return
+
         if len(args) < 1:
-            wormy = Wormy(ch, debug=debug)
+            size = None
         else:
             if len(args) == 2 and is_wiz(ch):
                 debug = True if eval(args[1].capitalize()) is True else False
@@ -66,13 +85,95 @@ class CmdMap(Command):
                 ch.msg("Invalid map size")
                 return
 
-            if size > 10:
+            if size > _MAX_MAP_SIZE:
                 ch.msg("Map size too big")
                 return
             if size < 5:
                 size = 5
 
-            wormy = Wormy(ch, map_size_x=size, map_size_y=size, debug=debug)
+        if debug:
+            map_string = Wormy(ch, map_size_x=size, map_size_y=size,
+                               debug=debug).generate_map()
+        else:
+            map_string = render_map(ch, size)
+        ch.msg(map_string)
+
+    def zone_map(self, args):
+        ch = self.caller
+        vnum = int(ch.location.key)
+        zone = room_graph().zone(vnum)
+        if zone is None:
+            ch.msg("You are not in a zone")
+            return
+
+        atlas = get_atlas(zone)
+        if args:
+            try:
+                z = int(args[0])
+            except ValueError:
+                ch.msg("Invalid floor")
+                return
+        else:
+            # the atlas may not have caught up with a new room yet
+            z = atlas.coords[vnum][2] if vnum in atlas.coords else None
+
+        if z not in atlas.layers:
+            ch.msg(f"Floors of {zone}: {', '.join(map(str, atlas.layers))}")
+            return
+
+        msg = f"|c{zone}|n floor {z}\n" + atlas.render_layer(z, vnum)
+        if atlas.problems:
+            msg += f"|r{len(atlas.problems)} layout problems, see zatlas {zone}|n\n"
+        ch.msg(msg)
+
+
+class CmdTrack(Command):
+    """
+    Sense the trail to someone, and which way to head to follow it.
+
+    Usage:
+        track <name>
+
+    Example:
+        track puff
+    """
+
+    key = "track"
+
+    def func(self):
+        ch = self.caller
+        name = self.args.strip()
+        if not name:
+            ch.msg("Whom are you trying to track?")
+            return
+
+        # pc takes precedence over npc, either only if they can be seen
+        target = [
+            x for x in search_object(name, typeclass=Character)
+            if can_see_obj(ch, x)
+        ]
+        if not target:
+            vnums = search_mobdb(key=name, return_keys=True)
+            if vnums:
+                target = [
+                    x for x in search_object(str(vnums[0]), typeclass=Mob)
+                    if can_see_obj(ch, x)
+                ]
+
+        try:
+            start = int(ch.location.key)
+            goal = int(target[0].location.key)
+        except (AttributeError, IndexError, TypeError, ValueError):
+            ch.msg("You can't sense a trail to them from here.")
+            return
+
+        if start == goal:
+            ch.msg("They're right here!")
+            return
+
+        steps = distance(start, goal, max_depth=_TRACK_MAX_STEPS)
+        if steps is None or steps > _TRACK_MAX_STEPS:
+            ch.msg("You can't sense a trail to them from here.")
+            return
 
-        map_string = wormy.generate_map()
-        ch.msg(map_string)
\ No newline at end of file
+        ch.msg(f"You sense a trail {next_step(start, goal)} from here.")
@@ -6,6 +6,7 @@ Commands describe the input the account can do to the game.
 """
 
 from world.conditions import Frenzied, Flying, get_condition
+from world.storagehandler import flush_changed
 from world.utils.act import act, Announce
 from evennia import Command as BaseCommand
 from evennia import EvForm, search_object
@@ -36,6 +37,8 @@ class Command(BaseCommand):
         "called after self.func()."
         if not self.key == 'look':
             self.caller.msg(prompt=self.caller.get_prompt())
+        # whatever the command changed, on anyone, is written back once
+        flush_changed()
 
 
 class CmdFrenzied(Command):
@@ -61,6 +61,7 @@ class CharacterCmdSet(default_cmds.CharacterCmdSet):
 
         self.add(act_other.CmdTitle())
         self.add(act_other.CmdMap())
+        self.add(act_other.CmdTrack())
 
         # movement commands
         self.add(act_mov.CmdNorth())
@@ -85,6 +86,7 @@ class BuilderCmdSet(CmdSet):
         self.add(wiz.CmdOList())
         self.add(wiz.CmdRList())
         self.add(wiz.CmdZList())
+        self.add(wiz.CmdZAtlas())
         self.add(wiz.CmdMList())
         self.add(wiz.CmdHolyLight())
         self.add(wiz.CmdGoto())
@@ -102,6 +104,7 @@ class ImmCmdSet(CmdSet):
         self.add(wiz.CmdZoneSet())
         self.add(wiz.CmdRestore())
         self.add(wiz.CmdZReset())
+        self.add(wiz.CmdPerf())
 
 
 class WizCmdSet(CmdSet):
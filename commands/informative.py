@@ -10,9 +10,10 @@ from evennia.contrib import custom_gametime
 from evennia.utils import evmore
 from evennia.utils.utils import inherits_from
 from commands.command import Command
-from world.utils.utils import can_see_obj, capitalize_sentence, get_name, is_book, is_container, is_equipped, is_invis, is_npc, is_obj, is_pc, is_pc_npc, is_wielded, is_wiz, is_worn, match_name, parse_dot_notation, rplanguage_parse_string
+from world.utils.utils import can_see_obj, capitalize_sentence, get_name, is_book, is_container, is_equipped, is_invis, is_obj, is_pc_npc, is_wielded, is_wiz, is_worn, match_name, parse_dot_notation, rplanguage_parse_string
 from evennia.utils.ansi import raw as raw_ansi
-from world.map import Wormy
+from world.atlas import render_map
+from world.occupancy import NPC, OBJ, PC
 
 
 class CmdPeek(Command):
@@ -356,44 +357,27 @@ class CmdLook(Command):
     def func(self):
         ch = self.caller
         location = ch.location
-        wormy = Wormy(ch, debug=False)
 
         if not self.args:
-            if not self:
+            if not location:
                 ch.msg("You have no location to look at!")
                 return
 
-            room_msg = ""
-            room_msg = wormy.generate_map()
-
-            # get room title
-            room_msg += f"|c{location.db.name}|n\n"
-
-            #get room_desc
-            room_msg += f"|G{location.db.desc}|n\n\n"
-
-            # get room exits
-            room_msg += "|C[ Exits: "
-            for direction, dvnum in location.db.exits.items():
-                if dvnum < 0:
-                    continue  # not set
-
-                room_msg += f"|lc{direction}|lt{direction}|le "
-            room_msg += "]|n\n\n"
+            # the map and header are cached, only the contents depend
+            # on who is looking
+            room_msg = render_map(ch)
+            room_msg += location.render_header()
 
             # get room contents
             # get objects
-            for obj in sorted(location.contents,
-                              key=lambda x: x.db.look_index):
-                if is_pc(obj):
-                    if obj.id == ch.id:
-                        continue
+            for kind, obj in location.occupants.by_look_index(exclude=(ch, )):
+                if kind == PC:
                     room_msg += f"{obj.name.capitalize()}{obj.attrs.title.value} is {obj.attrs.position.value.name.lower()} here\n"
 
-                elif is_npc(obj) and can_see_obj(ch, obj):
+                elif kind == NPC and can_see_obj(ch, obj):
                     room_msg += f"{obj.db.ldesc}\n"
 
-                elif is_obj(obj):
+                elif kind == OBJ:
                     if is_invis(obj) and not can_see_obj(ch, obj):
                         ch.msg("Couldn't see")
                         continue
@@ -417,19 +401,19 @@ class CmdLook(Command):
                 evmore.EvMore(ch, msg)
                 return
             # look for obj in room
-            for obj in ch.location.contents:
-                if is_obj(obj):
+            for kind, obj in ch.location.occupants.by_look_index():
+                if kind == OBJ:
                     if obj_name in obj.db.name:
                         edesc = rplanguage_parse_string(ch, obj.db.edesc)
                         ch.msg(f"You look at {obj.db.sdesc}\n{edesc}")
                         return
-                elif is_npc(obj):
+                elif kind == NPC:
                     if obj_name in obj.db.key:
                         edesc = rplanguage_parse_string(ch, obj.db.edesc)
                         ch.msg(f"You look at {obj.db.sdesc}\n{edesc}")
                         return
 
-                elif is_pc(obj):
+                elif kind == PC:
                     if obj_name in obj.name:
                         edesc = rplanguage_parse_string(ch, obj.db.desc)
                         ch.msg(f"You look at {obj.full_title()}\n{edesc}")
@@ -4,30 +4,41 @@ import pathlib
 import traceback
 from typeclasses.rooms.rooms import get_room
 
-from evennia.utils.dbserialize import deserialize
 from typeclasses.characters import Character
 from typeclasses.mobs.mob import Mob
 
-from evennia import EvMenu, create_object, search_object, GLOBAL_SCRIPTS, EvEditor
+from twisted.internet import threads
+from evennia import EvMenu, create_object, logger, search_object, GLOBAL_SCRIPTS, EvEditor
 from evennia.commands.default.help import COMMAND_DEFAULT_CLASS
 from evennia.commands.default.system import EvenniaPythonConsole
 from evennia.utils import crop, list_to_string, inherits_from
 from evennia.utils.ansi import raw as raw_ansi
+from evennia.utils.dbserialize import deserialize
 from evennia.utils.utils import wrap
 
 from world.edit.medit import MEditMode
+from world.atlas import build_atlas
+from world.graph import room_graph
 from world.languages import VALID_LANGUAGES
-from world.utils.db import search_mobdb, search_objdb, search_roomdb, search_zonedb
+from world.occupancy import NPC, PC
+from world.utils.schema import extra_structs, upgrade_blueprint
+from world.utils.snapshot import BlueprintSnapshot, write_snapshot
+from world.utils.dbio import append_journal, apply_journal, load_blueprint_files, read_journal, shard_files, write_shards
+from world.utils.db import next_vnum, query_db, reserve_vnums, search_mobdb, search_objdb, search_roomdb, search_zonedb
+from world.utils.query import QueryError
+from world.utils.vnums import VnumRangeFull
+from world.scheduler import SCHEDULER
+from world.storagehandler import write_stats
 from commands.act_movement import CmdDown, CmdEast, CmdNorth, CmdSouth, CmdUp, CmdWest
 from world.edit.zedit import ZEditMode
 from world.edit.redit import REditMode
 from typeclasses.objs.custom import CUSTOM_OBJS
 from world.edit.oedit import OEditMode
-from world.utils.utils import DBDumpEncoder, delete_contents, has_zone, is_invis, is_npc, is_pc, is_wiz, match_string
+from world.utils.utils import DBDumpEncoder, delete_contents, has_zone, is_invis, is_wiz, match_string
 from world.conditions import HolyLight, get_condition
 from world.utils.act import Announce, act
 from commands.command import Command
-from world.globals import BUILDER_LVL, DEFAULT_ZONE, GOD_LVL, WIZ_LVL, IMM_LVL
+from world.globals import BLUEPRINT_SCHEMAS, BUILDER_LVL, DEFAULT_OBJ_STRUCT, DEFAULT_ZONE, GOD_LVL, WIZ_LVL, IMM_LVL
 
 
 class CmdZReset(Command):
@@ -53,6 +64,7 @@ class CmdZReset(Command):
             room_obj = get_room(rvnum)
             if not room_obj:
                 ch.msg(f"Room object doesn't exist, skipping {rvnum}")
+                continue
 
             room_obj.reset()
         ch.msg(f"zone reset complete for {zone}")
@@ -91,12 +103,12 @@ class CmdForce(Command):
         cmd = " ".join(args[1:])
 
         target = None
-        for obj in ch.location.contents:
-            if is_npc(obj) and target_name in obj.db.key:
+        for kind, obj in ch.location.occupants.by_look_index():
+            if kind == NPC and target_name in obj.db.key:
                 target = obj
                 break
 
-            elif is_pc(obj) and target_name in obj.name:
+            elif kind == PC and target_name in obj.name:
                 target = obj
                 break
         if not target:
@@ -143,6 +155,51 @@ class CmdWizHelp(Command):
         ch.msg(str(table))
 
 
+_PERF_CALLBACKS = 10
+
+
+class CmdPerf(Command):
+    """
+    Shows counters of the game's caches and write-back handlers, the
+    timers waiting in the scheduler and what its callbacks cost.
+
+    Usage:
+        perf
+    """
+
+    key = 'perf'
+
+    def func(self):
+        ch = self.caller
+
+        stats = write_stats()
+        table = self.styled_table("Counter", "Value", border='cells')
+        table.add_row("handler assignments", stats['assignments'])
+        table.add_row("handler writes", stats['writes'])
+        table.add_row("handler writes avoided", stats['avoided'])
+        table.add_row("clean handler saves", stats['clean'])
+        table.add_row("scheduled timers", SCHEDULER.depth())
+        table.add_row("timers per wheel",
+                      " / ".join(str(x) for x in SCHEDULER.slot_depths()))
+        table.add_row("last batch", SCHEDULER.last_batch)
+        ch.msg(str(table))
+
+        costs = sorted(SCHEDULER.costs.items(),
+                       key=lambda x: x[1][1],
+                       reverse=True)
+        if not costs:
+            return
+        table = self.styled_table("Callback",
+                                  "Calls",
+                                  "Avg ms",
+                                  "Max ms",
+                                  border='cells')
+        for name, (calls, total, most) in costs[:_PERF_CALLBACKS]:
+            table.add_row(name, calls, f"{total / calls * 1000:.2f}",
+                          f"{most * 1000:.2f}")
+        ch.msg(str(table))
+
+
 class CmdLanguageUpdate(Command):
     """
     Update language system.
@@ -166,56 +223,259 @@ class CmdLanguageUpdate(Command):
             lang.add(override=force)  # add langauge and overwrite
 
 
+_DUMP_DBS = ('zone', 'room', 'obj', 'mob')
+_JOURNAL = "journal.jsonl"
+_JOURNAL_COMPACT_SIZE = 4 * 1024 * 1024  # bytes, before folding it into the dump
+
+
+def _is_book(name, record):
+    return name == 'obj' and record.get('type') == 'book'
+
+
+def _book_details(record):
+    return {x: record[x] for x in ('key', 'sdesc', 'ldesc', 'extra')}
+
+
+def _dump_snapshots(snapshots, dump_ground, compress=False, books=None):
+    """
+    Serializes plain python database snapshots (name -> {vnum: blueprint})
+    into dump_ground/<name>s/<zone>.json, one file per zone. Books are
+    pulled out of objs into books.json, merged by key into `books` if
+    given. Runs in a worker thread, so it must only touch the snapshots
+    it was given.
+
+    Returns:
+        list of (name, number of records, number of files, bytes written)
+    """
+    summary = []
+    new_books = []
+    for name, snapshot in sorted(snapshots.items()):
+        shards = dict()
+        for vnum, record in snapshot.items():
+            if name == 'obj':
+                # remove books from dict
+                if _is_book(name, record):
+                    new_books.append(_book_details(record))
+                    continue
+
+                # for backward compatibilty assign zone to object if not assigned
+                if not record.get('zone'):
+                    record['zone'] = DEFAULT_ZONE
+
+            # zones are sharded by their own name
+            zone = record.get('name') if name == 'zone' else record.get(
+                'zone')
+            shards.setdefault(zone, dict())[vnum] = record
+
+        written = write_shards(dump_ground / f"{name}s",
+                               shards,
+                               compress=compress,
+                               cls=DBDumpEncoder)
+        summary.append((name, sum(map(len, shards.values())), len(shards),
+                        written))
+
+    if 'obj' in snapshots:
+        if books is not None:
+            keys = {book['key'] for book in new_books}
+            new_books = [b for b in books if b['key'] not in keys] + new_books
+
+        # store books now
+        with open(dump_ground / "books.json", 'w') as f:
+            js = json.dumps(new_books, indent=2, cls=DBDumpEncoder)
+            f.write(js)
+        summary.append(('book', len(new_books), 1, len(js)))
+    return summary
+
+
+def _dump_full(snapshots, dump_ground, compress=False):
+    """
+    full dump, written as json and as a binary snapshot (<name>s.snap)
+    for dbload to start from. The journal is folded into it so it's removed.
+    """
+    snapshots = {
+        name: {vnum: deserialize(record)
+               for vnum, record in snapshot.items()}
+        for name, snapshot in snapshots.items()
+    }
+    summary = _dump_snapshots(snapshots, dump_ground, compress)
+    for name, records in snapshots.items():
+        write_snapshot(dump_ground / f"{name}s.snap", records)
+
+    journal = dump_ground / _JOURNAL
+    if journal.exists():
+        journal.unlink()
+    return summary
+
+
+def _base_dump(dump_ground, name):
+    """json files of the last full dump of a database, None if there's none"""
+    shards = dump_ground / f"{name}s"
+    flat = dump_ground / f"{name}s.json"
+    if shards.is_dir():
+        return shard_files(shards)
+    return [flat] if flat.exists() else None
+
+
+def _compact_journal(dump_ground, compress=False):
+    """
+    folds the journal into the sharded dump of every database it
+    touches, then removes it. A journal alone only holds what changed,
+    so every database it touches must have a full dump to fold into.
+    """
+    journal = dump_ground / _JOURNAL
+    if not journal.exists():
+        return []
+
+    entries = read_journal(journal)
+    snapshots = dict()
+    for name in sorted({entry['db'] for entry in entries}):
+        paths = _base_dump(dump_ground, name)
+        if paths is None:
+            raise FileNotFoundError(
+                f"there is no {name} dump to fold the journal into, "
+                "make a full dump first")
+        records, _ = load_blueprint_files(paths, dict())
+        snapshots[name] = apply_journal(records, entries, name)
+
+    books = None
+    if 'obj' in snapshots and (dump_ground / "books.json").exists():
+        with open(dump_ground / "books.json") as f:
+            books = json.load(f)
+
+    summary = _dump_snapshots(snapshots, dump_ground, compress, books=books)
+    journal.unlink()
+    return summary
+
+
+def _dump_incremental(changes, dump_ground, compress=False):
+    """
+    appends changed blueprints (name -> {vnum: blueprint or None if
+    deleted}) to the journal, compacting it once it grows too large
+    """
+    entries = []
+    for name, records in sorted(changes.items()):
+        for vnum, record in sorted(records.items()):
+            if record is None:
+                entries.append({'db': name, 'op': 'del', 'vnum': vnum})
+            else:
+                entries.append({
+                    'db': name,
+                    'op': 'set',
+                    'vnum': vnum,
+                    'data': deserialize(record)
+                })
+
+    journal = dump_ground / _JOURNAL
+    written = append_journal(journal, entries, cls=DBDumpEncoder)
+    summary = [('journal', len(entries), 1, written)]
+
+    if journal.stat().st_size > _JOURNAL_COMPACT_SIZE:
+        summary.extend(_compact_journal(dump_ground, compress))
+    return summary
+
+
 class CmdDBDump(Command):
     """
-    Dumps zones/objects/room/mobs into json flat files.
+    Dumps zones/objects/room/mobs into json files, one file per
+    zone under resources/json/<dbname>s/
 
     Useful for backups and clean wipes
 
     Usage:
         dbdump
+        dbdump gzip         # compress each file
+        dbdump incremental  # only append what changed since the last dump
+        dbdump compact      # fold the incremental journal into the dump
+
+    The databases are snapshotted right away, writing the files
+    happens in the background, you are told when it's done.
+
+    A full dump also writes a binary snapshot of each database
+    (resources/json/<dbname>s.snap) that dbload reads instead of the
+    json files, as long as no incremental dump was made since.
+
+    Incremental dumps append changed and deleted blueprints to
+    resources/json/journal.jsonl, it's folded into the dump by
+    `dbdump compact`, a full dump, or once it grows too large.
+    dbload applies the journal on top of the dump. Without a full
+    dump to add to, an incremental dump makes a full one.
     """
 
     key = 'dbdump'
+    dumping = False
 
     def func(self):
         ch = self.caller
         dump_ground = pathlib.Path(
             __file__).parent.parent / "resources" / "json"
-        from evennia.utils.dbserialize import deserialize
-        #zones
-        zonedb = deserialize(GLOBAL_SCRIPTS.zonedb.vnum)
-        objdb = deserialize(GLOBAL_SCRIPTS.objdb.vnum)
-        roomdb = deserialize(GLOBAL_SCRIPTS.roomdb.vnum)
-        mobdb = deserialize(GLOBAL_SCRIPTS.mobdb.vnum)
-        books = []
-
-        objs = {'zones': zonedb, 'rooms': roomdb, 'objs': objdb, 'mobs': mobdb}
-        for fname, obj in sorted(objs.items()):
-            if fname == 'objs':
-                # remove books from dict
-                for vnum, obj_value in tuple(obj.items()):
-                    if obj_value['type'] == 'book':
-                        book_details = dict()
-                        for x in ('key', 'sdesc', 'ldesc', 'extra'):
-                            book_details[x] = obj_value[x]
-                        books.append(book_details.copy())
-                        del obj[vnum]
+        opts = {arg.lstrip('-').lower() for arg in self.args.split()}
+        compress = 'gzip' in opts
 
-                # for backward compatibilty assign zone to object if not assigned
-                    if not obj_value.get('zone'):
-                        obj[vnum]['zone'] = DEFAULT_ZONE
+        if CmdDBDump.dumping:
+            ch.msg("A dump is already being written, try again shortly.")
+            return
 
-            with open(dump_ground / f"{fname}.json", "w") as f:
-                js = json.dumps(obj, indent=2, cls=DBDumpEncoder)
-                f.write(js)
-                ch.msg(f"Wrote {fname} to file.")
+        start = time.perf_counter()
+        stores = {name: GLOBAL_SCRIPTS.get(name + 'db').vnum for name in _DUMP_DBS}
+        taken = dict()
 
-        # store books now
-        with open(dump_ground / "books.json", 'w') as f:
-            js = json.dumps(books, indent=2, cls=DBDumpEncoder)
-            f.write(js)
-            ch.msg("Wrote books to file")
+        CmdDBDump.dumping = True
+        try:
+            if 'compact' in opts:
+                d = threads.deferToThread(_compact_journal, dump_ground,
+                                          compress)
+
+            elif 'incremental' in opts and all(
+                    _base_dump(dump_ground, name) is not None
+                    for name in _DUMP_DBS):
+                changes = dict()
+                for name, store in stores.items():
+                    taken[name] = store.take_changes()
+                    kept = [
+                        vnum for vnum, deleted in taken[name].items()
+                        if not deleted and vnum in store
+                    ]
+                    changes[name] = dict.fromkeys(taken[name].keys())
+                    changes[name].update(store.snapshot(kept))
+                d = threads.deferToThread(_dump_incremental, changes,
+                                          dump_ground, compress)
+
+            else:
+                if 'incremental' in opts:
+                    ch.msg("There is no full dump to add to yet, "
+                           "making one instead.")
+                snapshots = dict()
+                for name, store in stores.items():
+                    taken[name] = store.take_changes()
+                    snapshots[name] = store.snapshot()
+                d = threads.deferToThread(_dump_full, snapshots, dump_ground,
+                                          compress)
+        except Exception:
+            CmdDBDump.dumping = False
+            for name, changes in taken.items():
+                stores[name].restore_changes(changes)
+            raise
+
+        ch.msg("Dumping databases in the background...")
+
+        def report(summary):
+            CmdDBDump.dumping = False
+            if not summary:
+                ch.msg("Nothing to dump.")
+            for name, records, files, written in summary:
+                ch.msg(f"Wrote {records} {name} record(s) to {files} file(s) "
+                       f"({written / 1024:.1f}kb).")
+            ch.msg(f"dbdump finished in {time.perf_counter() - start:.2f}s")
+
+        def failed(failure):
+            CmdDBDump.dumping = False
+            # the changes are still missing from the dump
+            for name, changes in taken.items():
+                stores[name].restore_changes(changes)
+            ch.msg(f"|rdbdump failed: {failure.getErrorMessage()}|n")
+            logger.log_err(failure.getTraceback())
+
+        d.addCallbacks(report, failed)
 
 
 class CmdGoto(Command):
@@ -288,8 +548,7 @@ class CmdGoto(Command):
             return
 
         # try to find vnum in database
-        room = search_object(str(vnum),
-                             typeclass='typeclasses.rooms.rooms.Room')
+        room = get_room(vnum)
         roomdb = GLOBAL_SCRIPTS.roomdb
 
         if not room:
@@ -300,9 +559,7 @@ class CmdGoto(Command):
                 ch.msg("That room does not exist")
                 return
             room = create_object('typeclasses.rooms.rooms.Room', key=vnum)
-            poof(room)
-        else:
-            poof(room[0])
+        poof(room)
 
 
 class CmdZoneSet(Command):
@@ -437,8 +694,12 @@ class CmdOList(Command):
 
     Usage:
         olist
-        olist <type|name> <criteria>
-        olist type criteria <extra_field> <extra_criteria>
+        olist <field> <criteria>
+        olist <field> <criteria> [condition] <field> <criteria> ...
+
+        Takes the same conditions as mlist (see `help mlist`).
+        Fields that aren't part of an object blueprint are
+        searched for in the extra field.
 
         ex:
         olist                 # lists all objects in database
@@ -446,6 +707,7 @@ class CmdOList(Command):
         olist type equipment  # list all objects of type equipment
         olist name fire       # list all objects named `fire`
         olist type book category fiction # list all books of fiction category
+        olist type weapon && level >=10 ! tags cursed
     """
     key = "olist"
 
@@ -466,7 +728,7 @@ class CmdOList(Command):
             ch.msg(table)
 
         args = self.args.strip()
-        objdb = deserialize(GLOBAL_SCRIPTS.objdb.vnum)
+        objdb = GLOBAL_SCRIPTS.objdb.vnum
 
         if not objdb:
             ch.msg("There are no objects within the game")
@@ -477,26 +739,14 @@ class CmdOList(Command):
             show_table(objs)
             return
 
-        args = args.split(' ')
-        if len(args) < 2:
-            ch.msg("Supply either type or name to search for")
-            return
-        type_ = args[0]
-        if type_ not in ('type', 'name'):
-            ch.msg("Please supply either (type or name) to searchby")
-            return
-
-        if type_ == 'name':
-            type_ = 'key'
-        criteria = args[1]
-
         try:
-            extra_field, extra_criteria = args[2], args[3]
-            objs = search_objdb(**{type_: criteria},
-                                extra=f"{extra_field} {extra_criteria}")
-
-        except IndexError:
-            objs = search_objdb(**{type_: criteria})
+            objs = query_db(objdb,
+                            args,
+                            aliases={'name': 'key'},
+                            known_fields=DEFAULT_OBJ_STRUCT)
+        except QueryError as err:
+            ch.msg(f"Invalid query: {err}")
+            return
         show_table(objs)
         return
 
@@ -517,7 +767,8 @@ class CmdMList(Command):
             ! -  logical not
 
         
-        Conditions are evaluated LHF style.
+        Conditions are evaluated LHF style, use ( ) to group
+        them and quotes for criteria with spaces.
         For example
         mlist key puff || key dragon && position standing ! attack bite
 
@@ -550,7 +801,7 @@ class CmdMList(Command):
     def func(self):
         ch = self.caller
         args = self.args.strip()
-        mobdb = dict(GLOBAL_SCRIPTS.mobdb.vnum)
+        mobdb = GLOBAL_SCRIPTS.mobdb.vnum
 
         if not mobdb:
             ch.msg("There are no mobs within the game")
@@ -573,22 +824,12 @@ class CmdMList(Command):
             show_table(mobs)
             return
 
-        args = raw_ansi(args).split(' ')
-        if args[0] == 'name' and len(args) == 2:
-            mobs = search_mobdb(key=args[1])
-            show_table(mobs)
+        try:
+            mobs = query_db(mobdb, raw_ansi(args), aliases={'name': 'key'})
+        except QueryError as err:
+            ch.msg(f"Invalid query: {err}")
             return
-        else:
-            if len(args) < 2:
-                ch.msg("Must supply a field:value for each criteria")
-                return
-            if len(args) == 2:
-                # process simple here
-                field, value = args
-                criteria = {field: value}
-                mobs = search_mobdb(**criteria)
-                show_table(mobs)
-                return
+        show_table(mobs)
 
 
 class CmdZList(Command):
@@ -597,7 +838,14 @@ class CmdZList(Command):
 
     Usage:
         zlist
-        zlist <name> <criteria>
+        zlist <field> <criteria>
+        zlist <field> <criteria> [condition] <field> <criteria> ...
+
+        Takes the same conditions as mlist (see `help mlist`).
+
+        ex:
+        zlist name forest
+        zlist builders bob || builders alice
     """
     key = "zlist"
 
@@ -617,7 +865,6 @@ class CmdZList(Command):
             ch.msg(table)
 
         args = self.args.strip()
-        search_criteria = "all" if not args else args.strip()
         if not args:
             zones = search_zonedb('all')
 
@@ -627,13 +874,12 @@ class CmdZList(Command):
             show_table(zones)
             return
 
-        args = args.split(' ')
-        if len(args) < 2:
-            ch.msg("Supply name to search for")
+        try:
+            zones = query_db(GLOBAL_SCRIPTS.zonedb.vnum, args)
+        except QueryError as err:
+            ch.msg(f"Invalid query: {err}")
             return
-        type_, criteria = args
 
-        zones = search_zonedb(**{type_: criteria})
         if not zones:
             ch.msg("No zones found matching the criteria")
             return
@@ -643,6 +889,49 @@ class CmdZList(Command):
         return
 
 
+class CmdZAtlas(Command):
+    """
+    Lays out a zone again from its exits, saves its map tiles and
+    reports rooms whose exits don't agree on where they are.
+
+    Usage:
+        zatlas          # zone you are in
+        zatlas <zone>
+        zatlas all
+    """
+    key = "zatlas"
+
+    def func(self):
+        ch = self.caller
+        graph = room_graph()
+
+        args = self.args.strip()
+        if not args:
+            zone = graph.zone(int(ch.location.key))
+            if zone is None:
+                ch.msg("You are not in a zone")
+                return
+            zones = [zone]
+        elif args == 'all':
+            zones = sorted(zone['name']
+                           for zone in (search_zonedb('all') or {}).values())
+        else:
+            zones = [args]
+
+        msg = ""
+        for zone in zones:
+            if not graph.zone_rooms(zone):
+                msg += f"{zone}: no rooms\n"
+                continue
+            atlas = build_atlas(zone, graph)
+            msg += (f"|c{zone}|n: {len(atlas.coords)} rooms on floors "
+                    f"{', '.join(map(str, atlas.layers))}, "
+                    f"{len(atlas.problems)} problems\n")
+            for problem in atlas.problems:
+                msg += f"  |r{problem}|n\n"
+        ch.msg(msg)
+
+
 class CmdZEdit(Command):
     """
     Generic zone building command
@@ -666,10 +955,7 @@ class CmdZEdit(Command):
         ch = self.caller
 
         if 'new' in self.args.lower():
-            if not zonedb.vnum.keys():
-                vnum = 1
-            else:
-                vnum = max(zonedb.vnum.keys()) + 1
+            vnum = zonedb.vnum.allocator.allocate()
         else:
             vnum = self.args
             try:
@@ -720,10 +1006,11 @@ class CmdREdit(Command):
             roomdb = GLOBAL_SCRIPTS.roomdb
 
             if 'new' in self.args.lower():
-                if not roomdb.vnum.keys():
-                    vnum = 1
-                else:
-                    vnum = max(roomdb.vnum.keys()) + 1
+                try:
+                    vnum = next_vnum(roomdb.vnum, zone=has_zone(ch))
+                except VnumRangeFull:
+                    ch.msg("There are no free room vnums left in your zone")
+                    return
             else:
                 vnum = self.args
                 try:
@@ -755,7 +1042,10 @@ class CmdRList(Command):
 
     Usage:
         rlist
-        rlist <zone||name> <parameter>
+        rlist <field> <parameter>
+        rlist <field> <parameter> [condition] <field> <parameter> ...
+
+        Takes the same conditions as mlist (see `help mlist`).
 
     Example
 
@@ -763,6 +1053,7 @@ class CmdRList(Command):
 
         rlist zone myzone # returns room based in zone
         rlist name cellar # returns all rooms that matches cellar in room name
+        rlist zone myzone && sector forest ! flags dark
     """
     key = "rlist"
 
@@ -788,7 +1079,7 @@ class CmdRList(Command):
             ch.msg(table)
 
         args = self.args.strip()
-        roomdb = dict(GLOBAL_SCRIPTS.roomdb.vnum)
+        roomdb = GLOBAL_SCRIPTS.roomdb.vnum
         if not roomdb:
             ch.msg("There are no rooms within the game")
             return
@@ -810,22 +1101,12 @@ class CmdRList(Command):
 
             return
 
-        args = args.split(' ')
-        if len(args) < 2:
-            ch.msg("Supply either type or name to search for")
-            return
-        type_ = args[0]
-        if type_ not in ('zone', 'name'):
-            ch.msg("Please supply either (type or name) to searchby")
+        try:
+            rooms = query_db(roomdb, args, aliases={'sector': 'type'})
+        except QueryError as err:
+            ch.msg(f"Invalid query: {err}")
             return
 
-        criteria = args[1]
-        rooms = None
-        if type_ == 'zone':
-            rooms = search_roomdb(zone=criteria)
-        elif type_ == 'name':
-            rooms = search_roomdb(name=criteria)
-
         if not rooms:
             ch.msg("No such rooms were found")
             return
@@ -862,10 +1143,11 @@ class CmdOEdit(Command):
         ch = self.caller
 
         if 'new' in self.args.lower():
-            if not objdb.vnum.keys():
-                vnum = 1
-            else:
-                vnum = max(objdb.vnum.keys()) + 1
+            try:
+                vnum = next_vnum(objdb.vnum, zone=has_zone(ch))
+            except VnumRangeFull:
+                ch.msg("There are no free object vnums left in your zone")
+                return
         else:
             vnum = self.args
             try:
@@ -911,10 +1193,11 @@ class CmdMEdit(Command):
         mobdb = GLOBAL_SCRIPTS.mobdb
 
         if 'new' in self.args.lower():
-            if not mobdb.vnum.keys():
-                vnum = 1
-            else:
-                vnum = max(mobdb.vnum.keys()) + 1
+            try:
+                vnum = next_vnum(mobdb.vnum, zone=has_zone(ch))
+            except VnumRangeFull:
+                ch.msg("There are no free mob vnums left in your zone")
+                return
         else:
             vnum = self.args
             try:
@@ -1037,12 +1320,15 @@ class CmdDBLoad(Command):
     """
     Restore blueprints for mobs, objs, zones, and room
     using this command. It reads the associated json files found in
-    |cresources|n folder and updates the associated blueprint databases
+    |cresources|n folder (the per zone files written by dbdump, or a
+    single <dbname>s.json) and updates the associated blueprint databases
 
     Usage:
         dbload all
+        dbload <dbname>
 
-
+    Each database is read and checked in full, missing fields are filled
+    in from its default blueprint, then it is replaced in one transaction.
     """
 
     key = 'dbload'
@@ -1055,16 +1341,60 @@ class CmdDBLoad(Command):
 
         def load_db(name):
             dbname = name + 'db'
-            GLOBAL_SCRIPTS.get(dbname).vnum.clear()
-
             fobj = dumping_ground / f"{name}s.json"
 
-            if fobj.exists():
-                with open(fobj, "r") as f:
-                    data = json.load(f)
-                    for vnum, data in data.items():
-                        GLOBAL_SCRIPTS.get(dbname).vnum[int(vnum)] = data
-                ch.msg(f"loaded {name}")
+            # sharded dumps (<name>s/*.json) take over flat files
+            shards = dumping_ground / f"{name}s"
+            if shards.is_dir():
+                paths = shard_files(shards)
+            else:
+                paths = [fobj] if fobj.exists() else []
+
+            start = time.perf_counter()
+            struct = BLUEPRINT_SCHEMAS[name]['struct']
+            extras = extra_structs(name)
+
+            # the binary snapshot of the last full dump, as long as
+            # nothing was dumped since, holds validated blueprints
+            snap = dumping_ground / f"{name}s.snap"
+            journal = dumping_ground / _JOURNAL
+            use_snap = snap.exists() and not journal.exists() and all(
+                snap.stat().st_mtime >= p.stat().st_mtime for p in paths)
+
+            try:
+                if use_snap:
+                    # blueprints are decoded one by one as they're written
+                    records, errors = BlueprintSnapshot(snap, keep=False), []
+                else:
+                    records, errors = load_blueprint_files(
+                        paths, struct, extras)
+            except ValueError as err:
+                ch.msg(f"|rcould not read {name}s: {err}|n")
+                return
+
+            try:
+                # changes dumped since with `dbdump incremental`
+                if journal.exists():
+                    apply_journal(records, read_journal(journal), name,
+                                  struct, extras)
+                parsed = time.perf_counter()
+
+                script = GLOBAL_SCRIPTS.get(dbname)
+                script.vnum.replace(records)
+                # what was just loaded is what's on disk already
+                script.vnum.take_changes()
+                # and was filled in to the current schema while reading
+                script.schema_version = BLUEPRINT_SCHEMAS[name]['version']
+                done = time.perf_counter()
+            finally:
+                if use_snap:
+                    records.close()
+
+            for error in errors:
+                ch.msg(f"|y{name}: {error}|n")
+            ch.msg(f"loaded {name}: {len(records)} records in "
+                   f"{done - start:.2f}s (read {parsed - start:.2f}s, "
+                   f"write {done - parsed:.2f}s)")
 
         if not self.args:
             names = [f"|c{x.name[:-2]}|n"
@@ -1113,8 +1443,6 @@ class CmdBookLoad(Command):
             if v['type'] == 'book':
                 del GLOBAL_SCRIPTS.objdb.vnum[k]
 
-        current_vnums = list(GLOBAL_SCRIPTS.objdb.vnum.keys())
-        book_idx = 0
         obj_info = {
             'edesc': "",
             'adesc': "",
@@ -1126,28 +1454,19 @@ class CmdBookLoad(Command):
             'tags': []
         }
 
-        next_vnum = 1
-        if current_vnums:
-            # find missing vnums
-            a = list(range(1, current_vnums[-1] + 1))
-
-            missing_vnums = list(set(current_vnums) ^ set(a))
-
-            # fill in missing vnums first
-            for vnum in missing_vnums:
-
-                books[book_idx].update(obj_info)
-                GLOBAL_SCRIPTS.objdb.vnum[vnum] = books[book_idx]
-                book_idx += 1
+        # books fill the lowest free vnums first, written in one batch
+        objdb = GLOBAL_SCRIPTS.objdb.vnum
+        try:
+            vnums = reserve_vnums(objdb, len(books))
+        except VnumRangeFull:
+            ch.msg("There aren't enough free object vnums for the books")
+            return
 
-            next_vnum = max(GLOBAL_SCRIPTS.objdb.vnum.keys()) + 1
-        # create new ones
-        # ch.msg(str((len(books), book_idx, next_vnum)))
-        for book in books[book_idx:]:
-            # ch.msg("adding book")
+        records = dict()
+        for vnum, book in zip(vnums, books):
             book.update(obj_info)
-            GLOBAL_SCRIPTS.objdb.vnum[next_vnum] = book
-            next_vnum += 1
+            records[vnum] = upgrade_blueprint('obj', book)
+        objdb.update(records)
 
         ch.msg("loaded books")
 
@@ -15,6 +15,18 @@ at_server_cold_start()
 at_server_cold_stop()
 
 """
+from evennia import logger
+
+
+def _puppets():
+    """characters puppeted by a session, still online after a reload"""
+    from evennia import SESSION_HANDLER
+    from typeclasses.characters import Character
+    puppets = {
+        session.get_puppet()
+        for session in SESSION_HANDLER.get_sessions()
+    }
+    return [pc for pc in puppets if isinstance(pc, Character)]
 
 
 def at_server_start():
@@ -22,7 +34,41 @@ def at_server_start():
     This is called every time the server starts up, regardless of
     how it was shut down.
     """
-    pass
+    from world.utils.schema import migrate_blueprints
+    for db, upgraded in migrate_blueprints().items():
+        if upgraded:
+            logger.log_info(f"upgraded {upgraded} {db} blueprint(s) "
+                            "to the current schema")
+
+    from typeclasses.rooms.rooms import cache_rooms
+    logger.log_info(f"cached {cache_rooms()} room(s)")
+
+    # characters due to save in the same tick save in one transaction,
+    # each in a savepoint of it so a failed save only undoes itself
+    from django.db import transaction
+    from world.scheduler import SCHEDULER
+    SCHEDULER.set_batch('save', transaction.atomic, transaction.atomic)
+    SCHEDULER.start()
+
+    # at_post_puppet isn't called again for characters online over a
+    # reload, their timers and the players listening went with the old
+    # server
+    from world.broadcast import LISTENERS
+    for pc in _puppets():
+        pc.attrs.start_regen()
+        pc.register_timers()
+        LISTENERS.enter(pc)
+
+    from world.atlas import ATLAS_SAVE_INTERVAL, save_atlases
+    SCHEDULER.every(ATLAS_SAVE_INTERVAL, save_atlases, key='save_atlases')
+
+    # handlers changed outside of a command, on mobs and scripts too
+    from world.globals import TICK_SAVE_CHAR
+    from world.storagehandler import flush_changed
+    SCHEDULER.every(TICK_SAVE_CHAR,
+                    flush_changed,
+                    key='flush_changed',
+                    group='save')
 
 
 def at_server_stop():
@@ -30,7 +76,14 @@ def at_server_stop():
     This is called just before the server is shut down, regardless
     of it is for a reload, reset or shutdown.
     """
-    pass
+    from world.scheduler import SCHEDULER
+    SCHEDULER.stop()
+
+    from world.atlas import save_atlases
+    save_atlases()
+
+    from world.storagehandler import flush_changed
+    flush_changed()
 
 
 def at_server_reload_start():
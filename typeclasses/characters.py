@@ -8,18 +8,21 @@ creation commands.
 
 """
 import copy
+import time
 import numpy as np
 from world.utils.db import search_roomdb
-from evennia import DefaultCharacter, EvMenu, TICKER_HANDLER, search_object
+from evennia import DefaultCharacter, EvMenu
 from evennia.utils.utils import inherits_from, lazy_property, make_iter
 
-from typeclasses.rooms.rooms import Room
+from typeclasses.rooms.rooms import get_room
 from world.conditions import HolyLight
 from world.utils.act import Announce, act
-from world.utils.utils import can_see_obj, delete_contents, is_equippable, is_npc, is_obj, is_pc, is_pc_npc, is_wieldable, is_wielded, is_wiz, is_worn, apply_obj_effects, remove_obj_effects
+from world.utils.utils import can_see_obj, delete_contents, is_equippable, is_npc, is_pc, is_pc_npc, is_wieldable, is_wielded, is_wiz, is_worn, apply_obj_effects, remove_obj_effects
 from world.gender import Gender
 from world.races import NoRace
 from world.attributes import Attribute, VitalAttribute
+from world.broadcast import LISTENERS
+from world.scheduler import SCHEDULER
 from world.birthsigns import NoSign
 from world.globals import BUILDER_LVL, GOD_LVL, IMM_LVL, Positions, START_LOCATION_VNUM, TICK_HEAL_CHAR, TICK_SAVE_CHAR, WIZ_LVL, WEAR_LOCATIONS
 from world.characteristics import CHARACTERISTICS
@@ -172,9 +175,7 @@ class SkillHandler(StorageHandler):
     __attr_name__ = "skills"
 
     def __getitem__(self, key):
-        if key in self.__dict__.keys():
-            return self.__dict__[key]
-        return None
+        return self._load().get(key)
 
     def add(self, skill: Skill):
         if not isinstance(skill, Skill):
@@ -240,6 +241,7 @@ class ConditionHandler(StorageHandler):
 
             if match is not None:
                 self.__getattr__(self.__attr_name__).remove(match)
+                self.mark_dirty(self.__attr_name__)
                 if not quiet and (c.__deactivate_msg__ != ""):
                     self.caller.msg(c.__deactivate_msg__)
 
@@ -260,14 +262,50 @@ class ConditionHandler(StorageHandler):
     def set(self, condition):
         name = self.__attr_name__
         self.__getattr__(name).append(condition)
+        self.mark_dirty(name)
 
 
 class TraitHandler(ConditionHandler):
     __attr_name__ = "traits"
 
 
+# vitals that regenerate over time, carry is the weight carried
+_REGEN_VITALS = ('health', 'magicka', 'speed', 'stamina')
+
+# regen still running from before this start was left by a reload, or by
+# a crash, the time the server was down doesn't count
+_STARTED = time.time()
+
+
 class AttrHandler(StorageHandler):
+    """
+    The max of every vital is derived from level, characteristics and the
+    vital's modifiers. It's only computed again when one of those inputs
+    changed since the last time.
+    """
     __attr_name__ = "attrs"
+    __internal__ = StorageHandler.__internal__ + ('_maxima', )
+
+    def init(self):
+        # vital name -> (vital, inputs its max was computed from)
+        object.__setattr__(self, '_maxima', dict())
+
+    def reload(self):
+        super().reload()
+        self._maxima.clear()
+
+    def _fresh(self, name, inputs):
+        """whether the max of vital name is still the one computed from inputs"""
+        memo = self._maxima.get(name)
+        return memo is not None and memo[0] is getattr(
+            self, name) and memo[1] == inputs
+
+    def _set_max(self, name, value, inputs):
+        vital = getattr(self, name)
+        vital.settle()  # regen up to now counts against the old max
+        vital.max = value
+        self.mark_dirty(name)
+        self._maxima[name] = (vital, inputs)
 
     def update(self):
         self.max_carry()
@@ -276,6 +314,56 @@ class AttrHandler(StorageHandler):
         self.max_speed()
         self.max_stamina()
 
+        regen = self.health.regen
+        if regen and regen != self.regen_per_second():
+            self.start_regen()  # level changed
+
+    def regen_per_second(self):
+        # what the heal tick restored every TICK_HEAL_CHAR seconds
+        return (0.17588 * self.level.value + 5) / TICK_HEAL_CHAR
+
+    def start_regen(self):
+        """vitals regenerate while the character is in game"""
+        for name in _REGEN_VITALS:
+            vital = getattr(self, name)
+            if vital.regen and vital.stamp < _STARTED:
+                # the time offline since doesn't count as regen
+                vital.regen = 0.0
+        self._set_regen(self.regen_per_second())
+
+    def stop_regen(self):
+        self._set_regen(0.0)
+
+    def settle_regen(self):
+        """stores what the vitals regenerated up to now"""
+        for name in _REGEN_VITALS:
+            vital = getattr(self, name)
+            if vital.regen:
+                vital.settle()
+                self.mark_dirty(name)
+
+    def until_full(self, name):
+        """
+        seconds until vital name regenerates to its max, 0 if it's full,
+        None if it isn't regenerating
+        """
+        vital = getattr(self, name)
+        cur = vital.cur
+        if cur >= vital.max:
+            return 0
+        per_second = vital.regen * vital.rate
+        if per_second <= 0:
+            return None
+        return (vital.max - cur) / per_second
+
+    def _set_regen(self, regen):
+        for name in _REGEN_VITALS:
+            vital = getattr(self, name)
+            if vital.regen != regen:
+                vital.settle()
+                vital.regen = regen
+                self.mark_dirty(name)
+
     @property
     def base_vital(self):
         level = self.caller.attrs.level.value
@@ -364,50 +452,76 @@ class AttrHandler(StorageHandler):
         self.update()
 
     def max_health(self):
-        health = self.base_vital * np.log(self.caller.stats.end.base)
+        end = self.caller.stats.end.base
+        inputs = (self.level.value, end, self.health.mods)
+        if self._fresh('health', inputs):
+            return self.health.max
+
+        health = self.base_vital * np.log(end)
         tot = int(health) + self.health.mods
 
-        self.health.max = max(tot, 3)
+        self._set_max('health', max(tot, 3), inputs)
         return max(tot, 3)
 
     def max_stamina(self):
         end = self.caller.stats.end.base
         agi = self.caller.stats.agi.base
+        inputs = (self.level.value, end, agi, self.stamina.mods)
+        if self._fresh('stamina', inputs):
+            return self.stamina.max
+
         stamina = self.base_vital * np.log(((end + agi) / 2))
         tot = int(stamina) + self.stamina.mods
 
-        self.stamina.max = max(tot, 3)
+        self._set_max('stamina', max(tot, 3), inputs)
         return max(tot, 3)
 
     def max_magicka(self):
         wp = self.caller.stats.wp.base
         int_ = self.caller.stats.int.base
+        inputs = (self.level.value, wp, int_, self.magicka.mods)
+        if self._fresh('magicka', inputs):
+            return self.magicka.max
+
         magicka = self.base_vital * np.log((wp + int_) / 2)
         tot = int(magicka) + self.magicka.mods + 20
 
-        self.magicka.max = max(tot, 3)
+        self._set_max('magicka', max(tot, 3), inputs)
         return max(tot, 3)
 
     def max_speed(self):
         sb = self.caller.stats.str.bonus
         ab = self.caller.stats.agi.bonus
+        inputs = (sb, ab, self.speed.mods)
+        if self._fresh('speed', inputs):
+            return self.speed.max
+
         speed = sb + (2 * ab) + 20
 
         tot = speed + self.speed.mods
-        self.speed.max = tot
+        self._set_max('speed', tot, inputs)
         return tot
 
     def max_carry(self):
         # carry rating
         str = self.caller.stats.str.collect()
         end = self.caller.stats.end.collect()
+        inputs = (str, end, self.carry.mods)
+        if self._fresh('carry', inputs):
+            return self.carry.max
+
         carry = ((0.75 * str) + (0.25 * end)) + 50
 
         tot = int(carry) + self.carry.mods
-        self.carry.max = tot
+        self._set_max('carry', tot, inputs)
         return tot
 
 
+# lazy properties of Character that are StorageHandlers
+_STORAGE_HANDLERS = ('attrs', 'skills', 'stats', 'conditions', 'traits',
+                     'languages')
+
+
 class Character(DefaultCharacter):
     """
     The Character defaults to reimplementing some of base Object's hook methods with the
@@ -497,42 +611,78 @@ class Character(DefaultCharacter):
                    auto_quit=False)
             self.attributes.remove('new_character')
 
-        ############### Non-Persistent Tickers ####################
-        TICKER_HANDLER.add(interval=TICK_HEAL_CHAR,
-                           callback=self.tick_heal_player,
-                           idstring=f"tick_heal_{self.name}",
-                           persistent=False)
-
-        TICKER_HANDLER.add(interval=TICK_SAVE_CHAR,
-                           callback=self.save_character,
-                           idstring=f"tick_save_{self.name}",
-                           persistent=False)
-        ###########################################################
+        self.attrs.start_regen()
+        self.register_timers()
+        LISTENERS.enter(self)
         self.msg(f"\nYou become |c{self.name.capitalize()}|n")
         self.execute_cmd('look')
 
-    def save_character(self):
-        self.db.stats = dict(self.db.stats)
-        self.db.skills = dict(self.db.skills)
-        self.db.conditions = dict(self.db.conditions)
-        self.db.traits = dict(self.db.traits)
-        self.db.attrs = dict(self.db.attrs)
+    def register_timers(self):
+        """
+        timers of an online character, the scheduler doesn't keep them
+        over a reload so they are registered again at server start
+        """
+        SCHEDULER.every(TICK_SAVE_CHAR,
+                        self.tick_save,
+                        key=('save', self.id),
+                        group='save')
+        self.watch_regen()
 
+    def save_character(self):
+        """writes back the handlers changed, in place or not"""
+        return sum(
+            handler.flush(check=True)
+            for handler in self._storage_handlers())
+
+    def watch_regen(self):
+        """tells the character once their health has regenerated to full"""
+        delay = self.attrs.until_full('health')
+        if not delay:
+            SCHEDULER.cancel(('regen', self.id))
+            return
+        SCHEDULER.call_later(delay, self._at_regen_full, key=('regen', self.id))
+
+    def _at_regen_full(self):
+        delay = self.attrs.until_full('health')
+        if delay == 0:
+            self.msg("You feel fully healed.")
+        elif delay is not None:
+            # hurt since, not there yet
+            self.watch_regen()
+
+    def tick_save(self):
+        # runs in the transaction of the scheduler's 'save' batch
+        if ('regen', self.id) not in SCHEDULER:
+            self.watch_regen()  # hurt since the last one
+        self.save_character()
         try:
             self.msg(prompt=self.get_prompt())
         except:
             pass
 
     def at_pre_unpuppet(self):
+        LISTENERS.leave(self)
+        SCHEDULER.cancel(('save', self.id))
+        SCHEDULER.cancel(('regen', self.id))
+        self.attrs.stop_regen()
         self.save_character()
 
     def at_server_reload(self):
+        # regen up to now is kept, at_server_start restarts it without
+        # the time the server was down
+        if 'attrs' in self.__dict__:
+            self.attrs.settle_regen()
         self.save_character()
 
     def at_server_shutdown(self):
+        # the account has to come back, at_post_puppet starts it again
+        if 'attrs' in self.__dict__:
+            self.attrs.stop_regen()
         self.save_character()
 
     def at_after_move(self, src, **kwargs):
+        if self.has_account:
+            LISTENERS.enter(self)
         self.execute_cmd('look')
 
     def at_cmdset_get(self, **kwargs):
@@ -614,45 +764,38 @@ class Character(DefaultCharacter):
         self.attrs.speed.cur = self.attrs.speed.max
         self.attrs.stamina.cur = self.attrs.stamina.max
 
-    def tick_heal_player(self):
-        # called by global ticker  handler
-        # heals the player based on vitals restore rate
-        # up until the player is fully healed.
-        # then remove subscription until damaged again.
-
-        # heal stats based on level
-        level = self.attrs.level.value
-        amnt = 0.17588 * level + 5
-
-        #health
-        self.attrs.change_vital('health', by=amnt, update=False)
-        self.attrs.change_vital('magicka', by=amnt, update=False)
-        self.attrs.change_vital('speed', by=amnt, update=False)
-        self.attrs.change_vital('stamina', by=amnt, update=True)
-
     def clear_inventory(self):
         """ recurively delete all objs within self.contents """
         delete_contents(self)
 
     def location_contents(self):
-        objs = []
-        for obj in self.location.contents:
-            if is_obj(obj):
-                objs.append(obj)
-        return objs
+        return self.location.occupants.objs()
 
     def debug_msg(self, *args):
         x = tuple(args)
         self.msg(str(x))
 
     def add_attr(self, name, value, is_vital=False):
-        if not self.attributes.has('attrs'):
-            self.attributes.add('attrs', dict())
-
         if is_vital:
-            self.db.attrs[name] = VitalAttribute(name=name, value=value)
+            self.attrs.set(name, VitalAttribute(name=name, value=value))
         else:
-            self.db.attrs[name] = Attribute(name=name, value=value)
+            self.attrs.set(name, Attribute(name=name, value=value))
+
+    def _storage_handlers(self):
+        # lazy_property keeps handlers in __dict__, only take those in use
+        return [
+            self.__dict__[name] for name in _STORAGE_HANDLERS
+            if name in self.__dict__
+        ]
+
+    def flush_handlers(self):
+        """writes back the handlers changed since the last flush"""
+        return sum(handler.flush() for handler in self._storage_handlers())
+
+    def reload_handlers(self):
+        """handlers read their Attributes again, after they were reset"""
+        for handler in self._storage_handlers():
+            handler.reload()
 
     def at_object_creation(self):
         self.db.look_index = 0
@@ -667,6 +810,7 @@ class Character(DefaultCharacter):
         self.db.stats = copy.deepcopy(CHARACTERISTICS)
         self.db.is_npc = False
         self.db.is_pc = True
+        self.reload_handlers()
 
         # level
         level = GOD_LVL if self.is_superuser else 1
@@ -690,8 +834,9 @@ class Character(DefaultCharacter):
         self.add_attr('stamina', None, is_vital=True)
         self.add_attr('speed', None, is_vital=True)
         self.add_attr('carry', None, is_vital=True)
+        self.flush_handlers()
 
         # set new starting location here
-        start_loc = search_object('2', typeclass=Room)
+        start_loc = get_room(2)
         if start_loc:
-            self.location = start_loc[0]
+            self.location = start_loc
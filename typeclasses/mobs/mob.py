@@ -7,8 +7,6 @@ from world.traits import DiseaseResistTrait, DiseasedTrait, ImmunityTrait
 from world.globals import Positions, Size
 from evennia import GLOBAL_SCRIPTS
 
-from evennia.utils.dbserialize import deserialize
-
 from world.characteristics import CHARACTERISTICS
 from world.conditions import Blinded, DarkSight, DetectHidden, DetectInvis, Diseased, Flying, Hidden, Invisible, Sanctuary, Silenced, Sneak, WaterWalking, get_condition
 from typeclasses.characters import Character
@@ -44,8 +42,9 @@ class Mob(Character):
         self.db.stats = copy.deepcopy(CHARACTERISTICS)
         self.db.is_npc = True
         self.db.is_pc = False
+        self.reload_handlers()
 
-        obj = deserialize(GLOBAL_SCRIPTS.mobdb.vnum[int(self.key)])
+        obj = GLOBAL_SCRIPTS.mobdb.vnum[int(self.key)]
 
         self.db.key = obj['key']
         self.db.sdesc = obj['sdesc']
@@ -73,6 +72,7 @@ class Mob(Character):
         # do stats here
         for stat_name, stat_value in obj['stats'].items():
             self.attributes.add(stat_name, stat_value)
+        self.flush_handlers()
 
 
 VALID_MOB_FLAGS = {
@@ -2,8 +2,6 @@
 Default Scrolls object
 All objects must inherit this class to work properly
 """
-from evennia.utils.dbserialize import deserialize
-from world.globals import DEFAULT_OBJ_STRUCT
 from world.conditions import ALL_CONDITIONS, get_condition
 from evennia import DefaultObject, GLOBAL_SCRIPTS
 
@@ -203,16 +201,9 @@ class Object(DefaultObject):
         """
         self.db.is_obj = True
         self.db.look_index = 2
-        obj = deserialize(GLOBAL_SCRIPTS.objdb.vnum[int(self.key)])
-
-        # set fields that didn't exist before, mostly used
-        # if future fields are added and old already created objs
-        # don't know about them.
-        for field, default_value in DEFAULT_OBJ_STRUCT.items():
-            try:
-                _ = obj[field]
-            except KeyError:
-                obj[field] = default_value
+        # blueprints are upgraded to the current schema when loaded
+        # (see world.utils.schema), every field is already there
+        obj = GLOBAL_SCRIPTS.objdb.vnum[int(self.key)]
 
         keys_aliases = obj['key'].split()
 
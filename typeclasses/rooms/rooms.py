@@ -4,11 +4,13 @@ Room
 Rooms are simple containers that has no location of their own.
 
 """
+import itertools
 
 from world.utils.db import search_roomdb
-from world.globals import DEFAULT_ROOM_STRUCT
 from evennia import DefaultRoom, GLOBAL_SCRIPTS, search_object
-from world.utils.utils import delete_contents, is_pc, EntityLoader
+from evennia.utils.utils import lazy_property
+from world.occupancy import Occupancy
+from world.utils.utils import delete_contents, EntityLoader
 
 
 class Room(DefaultRoom):
@@ -25,11 +27,56 @@ class Room(DefaultRoom):
     __specific_fields__ = {}
     __help_msg__ = ""
 
+    def at_init(self):
+        # called every time the room is loaded into memory
+        _cache_room(self)
+
+    def delete(self):
+        _uncache_room(self)
+        return super().delete()
+
+    @lazy_property
+    def occupants(self):
+        return Occupancy(self)
+
+    def at_object_receive(self, moved_obj, source_location, **kwargs):
+        self.occupants.add(moved_obj)
+        super().at_object_receive(moved_obj, source_location, **kwargs)
+
+    def at_object_leave(self, moved_obj, target_location, **kwargs):
+        self.occupants.discard(moved_obj)
+        super().at_object_leave(moved_obj, target_location, **kwargs)
+
+    def touch(self):
+        """the room changed, anything rendered from it is stale"""
+        self.ndb.render_version = next(_RENDER_VERSIONS)
+
+    def render_header(self):
+        """
+        name, description and exits of the room, the same for everyone
+        looking, so only rendered again once the room is touched
+        """
+        version = self.ndb.render_version
+        header = self.ndb.header
+        if header is not None and header[0] == version:
+            return header[1]
+
+        msg = f"|c{self.db.name}|n\n"
+        msg += f"|G{self.db.desc}|n\n\n"
+        msg += "|C[ Exits: "
+        for direction, dvnum in self.db.exits.items():
+            if dvnum < 0:
+                continue  # not set
+            msg += f"|lc{direction}|lt{direction}|le "
+        msg += "]|n\n\n"
+
+        self.ndb.header = (version, msg)
+        return msg
+
     def announce(self, msg, exclude=[]):
         """send msg to all pcs in current room"""
-        for obj in self.contents:
-            if is_pc(obj) and obj not in exclude:
-                obj.msg(msg)
+        for obj in self.occupants.pcs(exclude=exclude):
+            obj.msg(msg)
 
     def reset(self, populate=True):
         """resets room and populates based on load_list"""
@@ -71,25 +118,21 @@ class Room(DefaultRoom):
                     "down": -1
                 },
                 "edesc": {},
+                "load_list": "",
                 "extra": {}
             }
             GLOBAL_SCRIPTS.roomdb.vnum[1] = room
         key = int(self.key)
+        _cache_room(self)
         # room = dict(GLOBAL_SCRIPTS.roomdb.vnum[int(key)])
         room = search_roomdb(vnum=key)
         if not room:
             raise NotImplementedError(
                 "attempting to create a room that doesn't exist in blueprint database"
             )
+        # blueprints are upgraded to the current schema when loaded
+        # (see world.utils.schema), every field is already there
         room = room[key]
-        # set fields that didn't exist before, mostly used
-        # if future fields are added and old already created objs
-        # don't know about them.
-        for field, default_value in DEFAULT_ROOM_STRUCT.items():
-            try:
-                _ = room[field]
-            except KeyError:
-                room[field] = default_value
 
         self.db.name = room['name']
         self.db.zone = room['zone']
@@ -106,6 +149,7 @@ class Room(DefaultRoom):
                 self.attributes.add(efield, self.db.extra[efield])
             else:
                 self.attributes.add(efield, evalue)
+        self.touch()
 
 
 class RoomSector:
@@ -134,8 +178,58 @@ VALID_ROOM_SECTORS = {
 }
 
 
+# stamps Room.render_header checks its cached header against
+_RENDER_VERSIONS = itertools.count(1)
+
+# vnum -> live Room, so looking rooms up by vnum doesn't hit the database
+_ROOM_CACHE = dict()
+
+
+def _room_vnum(room):
+    try:
+        return int(room.key)
+    except (TypeError, ValueError):
+        return None
+
+
+def _cache_room(room):
+    vnum = _room_vnum(room)
+    if vnum is not None:
+        _ROOM_CACHE[vnum] = room
+
+
+def _uncache_room(room):
+    vnum = _room_vnum(room)
+    if vnum is not None and _ROOM_CACHE.get(vnum) is room:
+        del _ROOM_CACHE[vnum]
+
+
+def cache_rooms():
+    """fills the room cache with every room, called at server start"""
+    _ROOM_CACHE.clear()
+    for room in Room.objects.all_family():
+        _cache_room(room)
+    return len(_ROOM_CACHE)
+
+
 def get_room(vnum):
+    """returns the live Room of vnum, None if it doesn't exist"""
+    try:
+        vnum = int(vnum)
+    except (TypeError, ValueError):
+        return None
+    if vnum <= 0:
+        return None
+
+    room = _ROOM_CACHE.get(vnum)
+    if room is not None:
+        if room.pk is not None:
+            return room
+        # deleted without going through Room.delete
+        del _ROOM_CACHE[vnum]
+
     room = search_object(str(vnum), typeclass=Room)
     if not room:
         return None
+    _ROOM_CACHE[vnum] = room[0]
     return room[0]
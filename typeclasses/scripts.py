@@ -12,7 +12,13 @@ just overloads its hooks to have it perform its function.
 
 """
 
+from collections.abc import MutableMapping
+from itertools import islice
+from django.db import transaction
 from evennia import DefaultScript
+from evennia.utils.dbserialize import deserialize
+from world.utils.indexes import BlueprintIndexes, HashIndex, SetIndex, SortedIndex, TrigramIndex
+from world.utils.vnums import VnumAllocator
 
 
 class Script(DefaultScript):
@@ -92,9 +98,387 @@ class Script(DefaultScript):
     pass
 
 
+class BlueprintShards(MutableMapping):
+    """
+    Mapping of vnum -> blueprint persisted as one Attribute per vnum
+    (key is the vnum, category is `category`) on the owning script.
+
+    Writing a blueprint only pickles and saves that blueprint. Cached
+    values are bound to their own Attribute, but they are only reached
+    through a BlueprintStore, which hands out copies, so blueprints are
+    always written back whole.
+    """
+    __batch__ = 1000  # blueprints per query when replacing them all
+
+    def __init__(self, obj, category):
+        self.obj = obj
+        self.category = category
+        self._cache = dict()  # vnum -> value bound to its attribute
+        self._pending = set()  # vnums whose _cache entry is still the Attribute
+        self._load()
+
+    def _load(self):
+        # values are only unpickled the first time they are accessed
+        self._cache.clear()
+        self._pending.clear()
+        attrs = self.obj.attributes.get(category=self.category,
+                                        return_obj=True,
+                                        return_list=True)
+        for attr in attrs:
+            if attr is not None:
+                vnum = int(attr.key)
+                self._cache[vnum] = attr
+                self._pending.add(vnum)
+
+    def __getitem__(self, vnum):
+        if vnum in self._pending:
+            self._cache[vnum] = self._cache[vnum].value
+            self._pending.discard(vnum)
+        return self._cache[vnum]
+
+    def raw(self, vnum):
+        """
+        value of vnum as loaded from the database, not decoded if it
+        wasn't accessed yet, see deserialize()
+        """
+        value = self._cache[vnum]
+        if vnum in self._pending:
+            return value.db_value
+        return value
+
+    def __setitem__(self, vnum, record):
+        self.obj.attributes.add(str(vnum), record, category=self.category)
+        self._cache[vnum] = self.obj.attributes.get(str(vnum),
+                                                    category=self.category)
+        self._pending.discard(vnum)
+
+    def __delitem__(self, vnum):
+        del self._cache[vnum]
+        self._pending.discard(vnum)
+        self.obj.attributes.remove(str(vnum), category=self.category)
+
+    def __iter__(self):
+        return iter(self._cache)
+
+    def __len__(self):
+        return len(self._cache)
+
+    def __contains__(self, vnum):
+        return vnum in self._cache
+
+    def clear(self):
+        self._cache.clear()
+        self._pending.clear()
+        self.obj.attributes.clear(category=self.category)
+
+    def batch_set(self, records):
+        """writes several blueprints (vnum -> blueprint) in a single transaction"""
+        with transaction.atomic():
+            self.obj.attributes.batch_add(*[(str(vnum), record,
+                                             self.category)
+                                            for vnum, record in records.items()
+                                            ])
+        for vnum in records.keys():
+            self._cache[vnum] = self.obj.attributes.get(str(vnum),
+                                                        category=self.category)
+            self._pending.discard(vnum)
+
+    def replace(self, records):
+        """
+        replaces every blueprint with records in a single transaction,
+        written __batch__ at a time so a lazy mapping of records (like a
+        BlueprintSnapshot) is never decoded all at once
+        """
+        items = iter(records.items())
+        with transaction.atomic():
+            self.obj.attributes.clear(category=self.category)
+            while True:
+                batch = [(str(vnum), record, self.category)
+                         for vnum, record in islice(items, self.__batch__)]
+                if not batch:
+                    break
+                self.obj.attributes.batch_add(*batch)
+        self._load()
+
+
+class BlueprintStore(MutableMapping):
+    """
+    Mapping of vnum -> blueprint that sits in front of the persisted
+    blueprints of an EntityDB (see BlueprintShards). Every write made
+    through it also updates the in-memory secondary indexes, which
+    `_search_db` uses to avoid scanning the whole database.
+
+    Reading a blueprint returns a detached copy, changes to it are only
+    kept (and indexed, and counted as changes) once it is written back
+    through the store. peek() reads without copying, for code that only
+    looks at blueprints, like searches.
+
+    Args:
+        data: mapping of vnum -> blueprint being wrapped
+        spec: dictionary of field -> index class
+        changes: vnum -> deleted, of blueprints changed since last dump
+        on_change: called with the vnum -> deleted marks that changed in
+            `changes`, or None when it was emptied
+
+    Callables in `listeners` are called with (vnum, blueprint) after every
+    write, blueprint is None when deleted and both are None when the
+    whole database was cleared or replaced.
+    """
+    def __init__(self, data, spec, changes=None, on_change=None):
+        self.data = data
+        self.spec = spec
+        self._indexes = None
+        self._allocator = None
+        self.changes = dict() if changes is None else changes
+        self.on_change = on_change
+        self.listeners = []
+
+    @property
+    def indexes(self):
+        """built on first use, so blueprints aren't all decoded at startup"""
+        if self._indexes is None:
+            self._indexes = BlueprintIndexes(self.spec)
+            self._indexes.rebuild(self.data.items())
+        return self._indexes
+
+    @property
+    def allocator(self):
+        """free vnums of the database, kept in step with writes and deletes"""
+        if self._allocator is None:
+            self._allocator = VnumAllocator(self.data.keys())
+        return self._allocator
+
+    def _rebuild_allocator(self):
+        # vnums handed out to editors stay taken
+        if self._allocator is not None:
+            self._allocator = VnumAllocator(self.data.keys(),
+                                            held=self._allocator.held)
+
+    def __getitem__(self, vnum):
+        return deserialize(self.data[vnum])
+
+    def peek(self, vnum):
+        """the stored blueprint itself, must not be changed"""
+        return self.data[vnum]
+
+    def peek_items(self):
+        """(vnum, stored blueprint) pairs, must not be changed"""
+        return self.data.items()
+
+    def __setitem__(self, vnum, record):
+        self.data[vnum] = record
+        if self._indexes is not None:
+            self._indexes.add(vnum, record)
+        if self._allocator is not None:
+            self._allocator.use(vnum)
+        self._mark({vnum: False})
+        self._notify(vnum, record)
+
+    def __delitem__(self, vnum):
+        del self.data[vnum]
+        if self._indexes is not None:
+            self._indexes.remove(vnum)
+        if self._allocator is not None:
+            self._allocator.release(vnum)
+        self._mark({vnum: True})
+        self._notify(vnum, None)
+
+    def update(self, records):
+        """writes several blueprints (vnum -> blueprint) in one go"""
+        records = dict(records)
+        if hasattr(self.data, 'batch_set'):
+            self.data.batch_set(records)
+        else:
+            for vnum, record in records.items():
+                self.data[vnum] = record
+
+        if self._indexes is not None:
+            for vnum, record in records.items():
+                self._indexes.add(vnum, record)
+        if self._allocator is not None:
+            for vnum in records.keys():
+                self._allocator.use(vnum)
+        self._mark(dict.fromkeys(records.keys(), False))
+        for vnum, record in records.items():
+            self._notify(vnum, record)
+
+    def _notify(self, vnum, record):
+        for listener in self.listeners:
+            listener(vnum, record)
+
+    def _mark(self, changes):
+        # a blueprint saved again and again is only marked once
+        marks = {
+            vnum: deleted
+            for vnum, deleted in changes.items()
+            if self.changes.get(vnum) is not deleted
+        }
+        if not marks:
+            return
+        self.changes.update(marks)
+        if self.on_change is not None:
+            self.on_change(marks)
+
+    def take_changes(self):
+        """
+        returns vnum -> deleted of every blueprint changed since the
+        last call, and starts tracking from scratch
+        """
+        changes = dict(self.changes)
+        self.changes.clear()
+        if changes and self.on_change is not None:
+            self.on_change(None)
+        return changes
+
+    def restore_changes(self, changes):
+        """puts back changes taken by a dump that failed"""
+        self._mark({
+            vnum: deleted
+            for vnum, deleted in changes.items() if vnum not in self.changes
+        })
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, vnum):
+        return vnum in self.data
+
+    def clear(self):
+        # clear in one go, MutableMapping.clear pops (and saves) per record
+        deleted = dict.fromkeys(self.data.keys(), True)
+        self.data.clear()
+        self._indexes = None
+        self._rebuild_allocator()
+        self._mark(deleted)
+        self._notify(None, None)
+
+    def replace(self, records):
+        """
+        replaces the whole database with records (vnum -> blueprint),
+        persisted in one go and indexed again on the next search. Only
+        the vnums of records are read up front, the blueprints when
+        written.
+        """
+        changes = dict.fromkeys(self.data.keys(), True)
+        changes.update(dict.fromkeys(records.keys(), False))
+
+        if hasattr(self.data, 'replace'):
+            self.data.replace(records)
+        else:
+            self.data.clear()
+            self.data.update(records)
+        self._indexes = None
+        self._rebuild_allocator()
+        self._mark(changes)
+        self._notify(None, None)
+
+    def snapshot(self, vnums=None):
+        """
+        returns a shallow vnum -> blueprint copy of the store (or of
+        vnums), cheap to take: blueprints not read yet are left encoded,
+        deserialize() them off the main thread. Writes replace whole
+        blueprints, so the ones in a snapshot don't change afterwards.
+        """
+        raw = getattr(self.data, 'raw', self.data.__getitem__)
+        vnums = self.data.keys() if vnums is None else vnums
+        return {vnum: raw(vnum) for vnum in vnums}
+
+    def as_dict(self):
+        """returns a detached, plain python copy of all blueprints"""
+        return {
+            vnum: deserialize(record)
+            for vnum, record in self.data.items()
+        }
+
+
 class EntityDB(Script):
+    """
+    Global blueprint database (mobdb, objdb, roomdb, ...), blueprints are
+    reached through `vnum` which is indexed on the fields in __indexes__
+    """
+    __indexes__ = {
+        'zone': HashIndex,
+        'type': HashIndex,
+        'sector': HashIndex,
+        'position': HashIndex,
+        'attack': HashIndex,
+        'size': HashIndex,
+        'flags': SetIndex,
+        'applies': SetIndex,
+        'tags': SetIndex,
+        'level': SortedIndex,
+        'weight': SortedIndex,
+        'cost': SortedIndex,
+        'key': TrigramIndex,
+        'sdesc': TrigramIndex,
+        'ldesc': TrigramIndex,
+        'name': TrigramIndex,
+        'desc': TrigramIndex,
+    }
+
+    __blueprint_category__ = 'blueprint'
+    __meta_category__ = 'blueprint_meta'
+    __changes_category__ = 'blueprint_change'
+
     @property
     def vnum(self):
-        if not self.attributes.has('vnum'):
-            self.attributes.add('vnum', dict())
-        return self.db.vnum
+        if self.ndb.store is None:
+            if self.attributes.has('vnum'):
+                self._migrate_vnum_attribute()
+
+            shards = BlueprintShards(self, self.__blueprint_category__)
+            self.ndb.store = BlueprintStore(shards,
+                                            self.__indexes__,
+                                            changes=self._load_changes(),
+                                            on_change=self._save_changes)
+        return self.ndb.store
+
+    @property
+    def schema_version(self):
+        """BLUEPRINT_SCHEMAS version the blueprints were last upgraded to"""
+        return self.attributes.get('schema_version',
+                                   default=0,
+                                   category=self.__meta_category__)
+
+    @schema_version.setter
+    def schema_version(self, version):
+        self.attributes.add('schema_version',
+                            version,
+                            category=self.__meta_category__)
+
+    def _load_changes(self):
+        """vnum -> deleted marks of the blueprints changed since last dump"""
+        changes = dict()
+        attrs = self.attributes.get(category=self.__changes_category__,
+                                    return_obj=True,
+                                    return_list=True)
+        for attr in attrs:
+            if attr is not None:
+                changes[int(attr.key)] = attr.value
+        return changes
+
+    def _save_changes(self, marks):
+        """
+        persists the changed vnums, an attribute each, so incremental
+        dumps survive reboots
+        """
+        if marks is None:
+            self.attributes.clear(category=self.__changes_category__)
+            return
+        self.attributes.batch_add(*[(str(vnum), deleted,
+                                     self.__changes_category__)
+                                    for vnum, deleted in marks.items()])
+
+    def _migrate_vnum_attribute(self):
+        """
+        moves blueprints out of the old single `vnum` attribute
+        into an attribute per vnum
+        """
+        legacy = deserialize(self.attributes.get('vnum')) or dict()
+        self.attributes.batch_add(*[(str(vnum), record,
+                                     self.__blueprint_category__)
+                                    for vnum, record in legacy.items()])
+        self.attributes.remove('vnum')
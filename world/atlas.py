@@ -0,0 +1,347 @@
+"""
+Zone atlas, fixed (x, y, z) coordinates for the rooms of a zone laid out
+from their exits, pre-rendered into map tiles.
+
+The layout walks the exits of each zone once: north/south move along y,
+east/west along x and up/down along z. Exits that disagree with where a
+room was already placed, and rooms sharing a spot, are reported as
+problems. Every z layer is rendered into tiles of _TILE_SIZE cells, maps
+of any size are sliced out of them with the viewer's @ put on top.
+
+Atlases are persisted on zonedb (category `atlas`, keyed by zone name)
+along with a signature of the zone's rooms. When the zone's rooms or
+exits change it's laid out again from the scheduler, shortly after it's
+next asked for, in the meantime the old atlas is served. Atlases laid
+out since are written to zonedb every ATLAS_SAVE_INTERVAL seconds, and
+when the server stops (see save_atlases).
+
+Usage:
+    atlas = get_atlas('void')
+    atlas.window(1, 9, 9)   # 9x9 cell map centered on room 1
+    atlas.render_layer(0)   # whole ground floor of the zone
+"""
+import hashlib
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from evennia import GLOBAL_SCRIPTS
+from typeclasses.rooms.rooms import VALID_ROOM_SECTORS
+from world.graph import room_graph
+from world.scheduler import SCHEDULER
+from world.map import (_CENTER_SYMBOL, _DOWN, _EDGE_BITS, _EMPTY_ICON, _UP,
+                       MapGrid, Wormy)
+
+ATLAS_CATEGORY = 'atlas'
+ATLAS_SAVE_INTERVAL = 300  # seconds between writes of new atlases
+
+_RELAYOUT_DELAY = 2  # seconds a stale atlas is served before laying it out
+
+_TILE_SIZE = 16
+
+# (x, y, z) offset of the next room in a direction
+_DIRECTION_OFFSETS: Dict[str, Tuple[int, int, int]] = {
+    'north': (0, -1, 0),
+    'south': (0, 1, 0),
+    'east': (1, 0, 0),
+    'west': (-1, 0, 0),
+    'up': (0, 0, 1),
+    'down': (0, 0, -1)
+}
+
+
+def zone_signature(graph, zone) -> str:
+    """digest of the rooms, exits and sectors of zone, to tell if an atlas is current"""
+    digest = hashlib.sha1()
+    for vnum in sorted(graph.zone_rooms(zone)):
+        exits = sorted(graph.exits(vnum).items())
+        digest.update(repr((vnum, graph.sector(vnum), exits)).encode())
+    return digest.hexdigest()
+
+
+def layout_zone(graph, zone):
+    """
+    Places the rooms of zone on a grid following their exits, exits that
+    leave the zone are ignored. Parts of the zone that aren't connected
+    are laid out side by side.
+
+    Returns:
+        tuple of (vnum -> (x, y, z), list of problem strings)
+    """
+    rooms = graph.zone_rooms(zone)
+    coords, problems = dict(), list()
+    reported = set()
+    offset_x = 0
+
+    for root in sorted(rooms):
+        if root in coords:
+            continue
+
+        # lay out the part of the zone connected to root around (0, 0, 0)
+        local = {root: (0, 0, 0)}
+        queue = deque([root])
+        while queue:
+            vnum = queue.popleft()
+            x, y, z = local[vnum]
+            for direction, dest in graph.exits(vnum).items():
+                if dest not in rooms or dest in coords:
+                    continue  # placed with another part already
+                dx, dy, dz = _DIRECTION_OFFSETS[direction]
+                expected = (x + dx, y + dy, z + dz)
+                if dest not in local:
+                    local[dest] = expected
+                    queue.append(dest)
+                elif local[dest] != expected:
+                    pair = frozenset((vnum, dest))
+                    if pair not in reported:
+                        reported.add(pair)
+                        problems.append(
+                            f"exit {direction} of {vnum} leads to {dest}, "
+                            f"placed at {local[dest]} instead of {expected}")
+
+        # shift it to the right of the parts already placed
+        min_x = min(x for x, _, _ in local.values())
+        max_x = max(x for x, _, _ in local.values())
+        for vnum, (x, y, z) in local.items():
+            coords[vnum] = (x - min_x + offset_x, y, z)
+        offset_x += max_x - min_x + 2
+
+    taken = dict()
+    for vnum in sorted(coords):
+        other = taken.setdefault(coords[vnum], vnum)
+        if other != vnum:
+            problems.append(f"rooms {other} and {vnum} both sit at "
+                            f"{coords[vnum]}")
+    return coords, problems
+
+
+class ZoneAtlas:
+    """
+    Args:
+        zone: name of the zone
+        coords: vnum -> (x, y, z)
+        problems: list of inconsistencies found while laying out
+        tiles: (z, tile row, tile column) -> rows of rendered cells
+        origin: (x, y) of the top left cell of every layer
+        shape: (rows, columns) of cells of every layer
+        signature: zone_signature of the zone laid out
+    """
+    def __init__(self, zone, coords, problems, tiles, origin, shape,
+                 signature):
+        self.zone = zone
+        self.coords = coords
+        self.problems = problems
+        self.tiles = tiles
+        self.origin = origin
+        self.shape = shape
+        self.signature = signature
+        self.version = None  # zone_version of the graph it was checked against
+
+    @classmethod
+    def build(cls, graph, zone):
+        """lays out zone and renders every layer into tiles"""
+        coords, problems = layout_zone(graph, zone)
+        signature = zone_signature(graph, zone)
+        if not coords:
+            return cls(zone, coords, problems, dict(), (0, 0), (0, 0),
+                       signature)
+
+        min_x = min(x for x, _, _ in coords.values())
+        min_y = min(y for _, y, _ in coords.values())
+        max_x = max(x for x, _, _ in coords.values())
+        max_y = max(y for _, y, _ in coords.values())
+        shape = (2 * (max_y - min_y) + 1, 2 * (max_x - min_x) + 1)
+
+        grids = dict()  # z -> MapGrid
+        for vnum in sorted(coords):
+            x, y, z = coords[vnum]
+            grid = grids.get(z)
+            if grid is None:
+                grid = grids[z] = MapGrid(*shape)
+            row, col = 2 * (y - min_y), 2 * (x - min_x)
+            if grid.symbols[row, col] != '':
+                continue  # reported as a problem, first room wins
+
+            sector = VALID_ROOM_SECTORS.get(graph.sector(vnum))
+            grid.symbols[row, col] = sector.symbol if sector else '?'
+            for direction in graph.exits(vnum):
+                if direction == 'up':
+                    grid.vertical[row, col] |= _UP
+                elif direction == 'down':
+                    grid.vertical[row, col] |= _DOWN
+                else:
+                    grid.edges[row, col] |= _EDGE_BITS[direction]
+
+        tiles = dict()
+        for z, grid in grids.items():
+            cells = grid.cells()
+            for top in range(0, shape[0], _TILE_SIZE):
+                for left in range(0, shape[1], _TILE_SIZE):
+                    tile = cells[top:top + _TILE_SIZE, left:left + _TILE_SIZE]
+                    if (tile != _EMPTY_ICON).any():
+                        tiles[(z, top // _TILE_SIZE, left // _TILE_SIZE)] = [
+                            list(row) for row in tile
+                        ]
+        return cls(zone, coords, problems, tiles, (min_x, min_y), shape,
+                   signature)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['zone'], {
+            int(vnum): tuple(xyz)
+            for vnum, xyz in data['coords'].items()
+        }, list(data['problems']), {
+            tuple(key): [list(row) for row in rows]
+            for key, rows in data['tiles']
+        }, tuple(data['origin']), tuple(data['shape']), data['signature'])
+
+    def as_dict(self):
+        """plain python form, to be saved as an Attribute"""
+        return {
+            'zone': self.zone,
+            'coords': {vnum: list(xyz)
+                       for vnum, xyz in self.coords.items()},
+            'problems': list(self.problems),
+            'tiles': [(list(key), rows) for key, rows in self.tiles.items()],
+            'origin': list(self.origin),
+            'shape': list(self.shape),
+            'signature': self.signature
+        }
+
+    @property
+    def layers(self) -> List[int]:
+        return sorted({z for z, _, _ in self.tiles})
+
+    def cell_of(self, vnum) -> Optional[Tuple[int, int, int]]:
+        """(z, row, column) of the cell vnum is drawn on"""
+        if vnum not in self.coords:
+            return None
+        x, y, z = self.coords[vnum]
+        return z, 2 * (y - self.origin[1]), 2 * (x - self.origin[0])
+
+    def _cell(self, z, row, col) -> str:
+        if not (0 <= row < self.shape[0] and 0 <= col < self.shape[1]):
+            return _EMPTY_ICON
+        tile = self.tiles.get((z, row // _TILE_SIZE, col // _TILE_SIZE))
+        if tile is None:
+            return _EMPTY_ICON
+        return tile[row % _TILE_SIZE][col % _TILE_SIZE]
+
+    def window(self, vnum, rows, cols) -> Optional[str]:
+        """
+        rows x cols cells of the layer of vnum centered on it, with an @
+        on vnum. None if vnum isn't in the atlas.
+        """
+        cell = self.cell_of(vnum)
+        if cell is None:
+            return None
+        z, center_row, center_col = cell
+        top, left = center_row - rows // 2, center_col - cols // 2
+
+        lines = []
+        for row in range(top, top + rows):
+            line = [self._cell(z, row, col) for col in range(left, left + cols)]
+            if row == center_row:
+                line[center_col - left] = f"|c[{_CENTER_SYMBOL:1}|c]|n"
+            lines.append("".join(line) + "\n")
+        return "".join(lines)
+
+    def render_layer(self, z, vnum=None) -> str:
+        """the whole layer z of the zone, with an @ on vnum if given"""
+        lines = []
+        center = self.cell_of(vnum) if vnum is not None else None
+        for row in range(self.shape[0]):
+            line = [self._cell(z, row, col) for col in range(self.shape[1])]
+            if center is not None and center[0] == z and center[1] == row:
+                line[center[2]] = f"|c[{_CENTER_SYMBOL:1}|c]|n"
+            lines.append("".join(line).rstrip() + "\n")
+        return "".join(lines)
+
+
+_ATLASES: Dict[str, ZoneAtlas] = dict()
+_UNSAVED = set()  # zones whose atlas in _ATLASES isn't on zonedb yet
+
+
+def save_atlas(atlas):
+    GLOBAL_SCRIPTS.zonedb.attributes.add(atlas.zone,
+                                         atlas.as_dict(),
+                                         category=ATLAS_CATEGORY)
+
+
+def save_atlases():
+    """writes the atlases laid out since the last call, returns how many"""
+    saved = 0
+    for zone in sorted(_UNSAVED):
+        atlas = _ATLASES.get(zone)
+        if atlas is not None:
+            save_atlas(atlas)
+            saved += 1
+    _UNSAVED.clear()
+    return saved
+
+
+def _layout(zone, graph):
+    atlas = ZoneAtlas.build(graph, zone)
+    atlas.version = graph.zone_version(zone)
+    _ATLASES[zone] = atlas
+    _UNSAVED.add(zone)
+    return atlas
+
+
+def _relayout(zone):
+    graph = room_graph()
+    atlas = _ATLASES.get(zone)
+    if atlas is None or atlas.version != graph.zone_version(zone):
+        _layout(zone, graph)
+
+
+def build_atlas(zone, graph=None):
+    """lays out zone again, saves and returns its atlas"""
+    graph = room_graph() if graph is None else graph
+    atlas = _layout(zone, graph)
+    save_atlas(atlas)
+    _UNSAVED.discard(zone)
+    return atlas
+
+
+def get_atlas(zone, graph=None):
+    """
+    the atlas of zone, from memory, then zonedb if it's still current
+    with the zone, otherwise laid out (and saved later). An atlas older
+    than the zone is still returned, it's laid out again shortly.
+    """
+    graph = room_graph() if graph is None else graph
+    version = graph.zone_version(zone)
+    atlas = _ATLASES.get(zone)
+    if atlas is not None:
+        key = ('atlas', zone)
+        if atlas.version != version and key not in SCHEDULER:
+            SCHEDULER.call_later(_RELAYOUT_DELAY, _relayout, zone, key=key)
+        return atlas
+
+    saved = GLOBAL_SCRIPTS.zonedb.attributes.get(zone,
+                                                 category=ATLAS_CATEGORY)
+    if saved:
+        atlas = ZoneAtlas.from_dict(saved)
+        if atlas.signature == zone_signature(graph, zone):
+            atlas.version = version
+            _ATLASES[zone] = atlas
+            return atlas
+    return _layout(zone, graph)
+
+
+def render_map(ch, size=None):
+    """
+    map around ch's location, sliced from the atlas of its zone. Falls
+    back to crawling with Wormy when the zone's layout has problems.
+    """
+    graph = room_graph()
+    vnum = int(ch.location.key)
+    zone = graph.zone(vnum)
+    if zone is not None:
+        atlas = get_atlas(zone, graph)
+        if not atlas.problems:
+            rows, cols = Wormy.calculate_map_size(size, size)
+            map_string = atlas.window(vnum, rows, cols)
+            if map_string is not None:
+                return map_string
+    return Wormy(ch, map_size_x=size, map_size_y=size).generate_map()
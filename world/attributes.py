@@ -1,3 +1,5 @@
+import time
+
 from evennia.utils.utils import inherits_from, make_iter
 
 
@@ -19,16 +21,47 @@ class Attribute:
 
 
 class VitalAttribute(Attribute):
+    """
+    cur regenerates by itself, `regen` points a second (times `rate`) up
+    to max. It isn't ticked, only the value it had when last set and the
+    time it was set are stored, and cur is worked out when read.
+    """
     def init(self):
         for k, v, in dict({
                 'cur': 0,
                 'max': -1,
                 'mod': [],
                 'rate': 1.0,
-                'rate_mod': 0.0
+                'rate_mod': 0.0,
+                'regen': 0.0
         }).items():
             setattr(self, k, v)
 
+    def __setstate__(self, state):
+        # vitals saved before regen was lazy store cur as is
+        if 'cur' in state:
+            state['_cur'] = state.pop('cur')
+            state['stamp'] = time.time()
+        state.setdefault('regen', 0.0)
+        self.__dict__.update(state)
+
+    @property
+    def cur(self):
+        cur = self._cur
+        if self.regen <= 0 or cur >= self.max:
+            return cur
+        regained = self.regen * self.rate * (time.time() - self.stamp)
+        return min(self.max, cur + int(regained))
+
+    @cur.setter
+    def cur(self, value):
+        self._cur = value
+        self.stamp = time.time()
+
+    def settle(self):
+        """stores the regenerated value, before regen or rate change"""
+        self.cur = self.cur
+
     @property
     def mods(self):
         return sum(self.__dict__['mod'])
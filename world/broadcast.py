@@ -0,0 +1,136 @@
+"""
+Messages to every player in a zone, a set of rooms, or within a number of
+steps of a room.
+
+Recipients come from an index of the online players by room and zone,
+kept up to date as players log in, move and log out (see Character), so
+a message costs as much as the number of players listening, not the
+number of rooms or things in them. The zones are checked again when the
+room graph changed, rooms can be moved to another zone while players
+are in them.
+
+Usage:
+    to_zone('void', "The ground trembles.")
+    to_rooms([1, 2, 3], "Thunder rolls.")
+    within(1, 3, "You hear a scream nearby.")
+"""
+from collections import deque
+
+from world.graph import room_graph
+
+
+class Listeners:
+    """
+    Online players, by the room and zone they are in
+
+    Args:
+        graph: callable returning the RoomGraph, to know the zone of rooms
+    """
+    def __init__(self, graph=room_graph):
+        self._graph = graph
+        self._rooms = dict()  # pc -> vnum of its room
+        self._zones = dict()  # zone -> {pc: None}, in order of arrival
+        self._pc_zones = dict()  # pc -> zone
+        self._version = None  # of the graph the zones were checked against
+
+    def __len__(self):
+        return len(self._rooms)
+
+    def __contains__(self, pc):
+        return pc in self._rooms
+
+    def _vnum(self, pc):
+        try:
+            return int(pc.location.key)
+        except (AttributeError, TypeError, ValueError):
+            return None
+
+    def enter(self, pc):
+        """pc came online, or moved while online"""
+        vnum = self._vnum(pc)
+        if vnum is None:
+            self.leave(pc)
+            return
+        self._rooms[pc] = vnum
+        self._set_zone(pc, self._graph().zone(vnum))
+
+    def _set_zone(self, pc, zone):
+        if pc in self._pc_zones and self._pc_zones[pc] == zone:
+            return
+        self._drop_zone(pc)
+        self._pc_zones[pc] = zone
+        self._zones.setdefault(zone, dict())[pc] = None
+
+    def _rezone(self):
+        """moves players to the zone their room is in now, if rooms changed"""
+        graph = self._graph()
+        if graph.version == self._version:
+            return
+        self._version = graph.version
+        for pc, vnum in self._rooms.items():
+            self._set_zone(pc, graph.zone(vnum))
+
+    def leave(self, pc):
+        """pc went offline"""
+        self._rooms.pop(pc, None)
+        self._drop_zone(pc)
+
+    def _drop_zone(self, pc):
+        zone = self._pc_zones.pop(pc, None)
+        pcs = self._zones.get(zone)
+        if pcs is not None:
+            pcs.pop(pc, None)
+            if not pcs:
+                del self._zones[zone]
+
+    def in_zone(self, zone, exclude=()):
+        self._rezone()
+        return [pc for pc in self._zones.get(zone, ()) if pc not in exclude]
+
+    def in_rooms(self, vnums, exclude=()):
+        vnums = set(vnums)
+        return [
+            pc for pc, vnum in self._rooms.items()
+            if vnum in vnums and pc not in exclude
+        ]
+
+    def within(self, vnum, steps, exclude=()):
+        """players at most steps moves away from vnum"""
+        if not self._rooms:
+            return []
+        graph = self._graph()
+        seen = {vnum}
+        frontier = deque([(vnum, 0)])
+        while frontier:
+            current, depth = frontier.popleft()
+            if depth == steps:
+                continue
+            for dest in graph.neighbours(current):
+                if dest not in seen:
+                    seen.add(dest)
+                    frontier.append((dest, depth + 1))
+        return self.in_rooms(seen, exclude=exclude)
+
+
+LISTENERS = Listeners()
+
+
+def _send(pcs, msg):
+    for pc in pcs:
+        pc.msg(msg)
+    return len(pcs)
+
+
+def to_zone(zone, msg, exclude=()):
+    """sends msg to every online player in zone, returns how many got it"""
+    return _send(LISTENERS.in_zone(zone, exclude=exclude), msg)
+
+
+def to_rooms(vnums, msg, exclude=()):
+    """sends msg to every online player in the rooms of vnums"""
+    return _send(LISTENERS.in_rooms(vnums, exclude=exclude), msg)
+
+
+def within(vnum, steps, msg, exclude=()):
+    """sends msg to every online player at most steps moves from vnum"""
+    return _send(LISTENERS.within(int(vnum), steps, exclude=exclude), msg)
@@ -120,6 +120,7 @@ class Bleeding(Condition):
         # take damage to caller of value X and end condition
         if self.enabled:
             caller.attrs.health.cur -= self.X
+            caller.attrs.mark_dirty('health')
             self.end_condition()
 
 
@@ -141,6 +142,7 @@ class Burning(Condition):
 
     def effect(self, caller, **kwargs):
         caller.attrs.health.cur -= self.X
+        caller.attrs.mark_dirty('health')
         self.X += 1
 
 
@@ -167,6 +169,7 @@ class Dazed(Condition):
         if self.enabled:
             # reduce action point by 1, minimum of one
             caller.attrs.action_points.value -= 1
+            caller.attrs.mark_dirty('action_points')
 
 
 class Deafened(Condition):
@@ -200,8 +203,10 @@ class Fatigued(Condition):
         if self.enabled:
             if self.X >= 5:  # character dies
                 caller.attrs.health.cur = -1
+                caller.attrs.mark_dirty('health')
             elif self.X == 4:  # character falls unconcious
                 caller.attrs.health.cur = 0
+                caller.attrs.mark_dirty('health')
             elif self.X == 3:  # -30 penalty
                 self.meta['penalty'] = {'all': -30}
             elif self.X == 2:  # -20
@@ -281,6 +286,7 @@ class Prone(Condition):
             return False
 
         caller.attrs.speed.cur -= cost
+        caller.attrs.mark_dirty('speed')
         self.enabled = False
         return True
 
@@ -340,6 +346,7 @@ class Stunned(Condition):
 
     def at_condition(self, caller):
         caller.attrs.action_points.value = 0
+        caller.attrs.mark_dirty('action_points')
 
 
 class Sanctuary(Condition):
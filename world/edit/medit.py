@@ -418,9 +418,11 @@ class Exit(MEditCommand):
         try:
             b = bool(eval(self.args.strip().capitalize()))
             ch.ndb._medit.save(override=b, bypass_checks=False)
+            ch.ndb._medit.close()
             del ch.ndb._medit
         except:
             ch.ndb._medit.save(override=False, bypass_checks=False)
+            ch.ndb._medit.close()
             del ch.ndb._medit
 
 
@@ -1,6 +1,6 @@
 import copy
 
-from evennia.utils.dbserialize import deserialize
+from world.utils.db import release_vnums
 
 
 class _EditMode:
@@ -20,18 +20,10 @@ class _EditMode:
 
         # attempt to find vnum in objdb
         if self.vnum in self.db.vnum.keys():
-            self.obj = deserialize(self.db.vnum[self.vnum])
+            # blueprints are already upgraded to the current schema
+            # (see world.utils.schema), the store hands out a copy
+            self.obj = self.db.vnum[self.vnum]
             self.caller.msg("|rstart|n")
-            # account for new fields added to default object builder
-            for field, value in self.__default_struct__.items():
-                if field not in self.obj.keys():
-                    self.obj[field] = value
-
-                # handle special case if value is type dict
-                if field in self.obj.keys() and isinstance(value, dict):
-                    for nfield, nvalue in value.items():
-                        if not self.obj[field].get(nfield, None):
-                            self.obj[field][nfield] = nvalue
 
             # if obj is a special type based on type, add those
             # extra fields here
@@ -69,5 +61,9 @@ class _EditMode:
             self.db.vnum[self.vnum] = self.obj
             self.caller.msg('mob saved')
 
+    def close(self):
+        """leaving the editor, a new vnum that was never saved is given back"""
+        release_vnums(self.db.vnum, [self.vnum])
+
     def summarize(self):
         raise NotImplementedError()
\ No newline at end of file
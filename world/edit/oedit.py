@@ -412,7 +412,9 @@ class Exit(OEditCommand):
         try:
             b = bool(eval(self.args.strip().capitalize()))
             ch.ndb._oedit.save(override=b)
+            ch.ndb._oedit.close()
             del ch.ndb._oedit
         except:
             ch.ndb._oedit.save(override=False)
+            ch.ndb._oedit.close()
             del ch.ndb._oedit
\ No newline at end of file
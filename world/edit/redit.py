@@ -6,14 +6,18 @@ import re, copy
 from evennia import GLOBAL_SCRIPTS, EvTable
 from evennia.commands.default.help import CmdHelp
 from evennia.utils.utils import wrap
-from evennia import CmdSet, Command, EvEditor, search_object, create_object
+from evennia import CmdSet, Command, EvEditor, create_object
 from evennia.utils import crop, list_to_string
+from evennia.utils.dbserialize import deserialize
 
 from typeclasses.rooms.custom import CUSTOM_ROOMS
 from world.globals import DEFAULT_ROOM_STRUCT, OPPOSITE_DIRECTION, VALID_DIRECTIONS
 
 from typeclasses.rooms.rooms import VALID_ROOM_FLAGS, VALID_ROOM_SECTORS, get_room
-from world.utils.utils import clear_terminal, has_zone, match_string, mxp_string, next_available_rvnum, room_exists, EntityLoader
+from world.graph import room_graph
+from world.utils.db import next_vnum
+from world.utils.vnums import VnumRangeFull
+from world.utils.utils import clear_terminal, has_zone, match_string, mxp_string, room_exists, EntityLoader
 from .model import _EditMode
 
 _REDIT_PROMPT = "(|rredit|n)"
@@ -61,7 +65,8 @@ class REditMode(_EditMode):
         exit_summary = ""
 
         for ename, rvnum in self.obj['exits'].items():
-            room = "" if get_room(rvnum) is None else get_room(rvnum).db.name
+            room = get_room(rvnum)
+            room = "" if room is None else room.db.name
             exit_summary += f"    |y{ename.capitalize():<5}|n: {rvnum:<7} {room:<15}\n"
 
         edesc_msg = ""
@@ -160,10 +165,15 @@ class New(REditCommand):
 
     def func(self):
         ch = self.caller
-        nextvnum = next_available_rvnum()
+        try:
+            nextvnum = next_vnum(GLOBAL_SCRIPTS.roomdb.vnum, zone=has_zone(ch))
+        except VnumRangeFull:
+            ch.msg("There are no free room vnums left in your zone")
+            return
         new_room_info = copy.deepcopy(DEFAULT_ROOM_STRUCT)
         new_room_info['zone'] = has_zone(ch)
 
+        ch.ndb._redit.close()  # the room edited so far, if never saved
         ch.ndb._redit.__init__(ch, nextvnum)
         ch.ndb._redit.save(override=True)
 
@@ -388,9 +398,11 @@ class Exit(REditCommand):
         try:
             b = bool(eval(self.args.strip().capitalize()))
             ch.ndb._redit.save(override=b)
+            ch.ndb._redit.close()
             del ch.ndb._redit
         except:
             ch.ndb._redit.save(override=False)
+            ch.ndb._redit.close()
             del ch.ndb._redit
 
 
@@ -434,25 +446,25 @@ class Delete(Command):
                 return
 
             # find all rooms that have exits that come to this room
-            # delete those exits, since code only allows connecting rooms
-            # within the same zone, this should be relatively low computationally
-            # heavy.
-
-            # search for all rooms within zone that has exit defined to this vnum
-            for v, data in GLOBAL_SCRIPTS.roomdb.vnum.items():
-                if data['zone'] != room.db.zone:
-                    continue
-
-                # room is in same zone
-                # afgfected by it
-                for direction, dest_vnum in data['exits'].items():
-                    if dest_vnum == vnum:
-
-                        # delete from roomdb
-                        GLOBAL_SCRIPTS.roomdb.vnum[v]['exits'][direction] = -1
-                        # delete exist from instance as well
-
-                        ch.msg(f"Removed exit from room: {v}")
+            # and delete those exits, the room graph keeps track of
+            # incoming exits so no rooms have to be scanned.
+            roomdb = GLOBAL_SCRIPTS.roomdb.vnum
+            incoming = dict()
+            for v, direction in room_graph().incoming(vnum):
+                incoming.setdefault(v, []).append(direction)
+
+            for v, exits in incoming.items():
+                # delete from roomdb, written back as a whole blueprint
+                data = deserialize(roomdb[v])
+                for direction in exits:
+                    data['exits'][direction] = -1
+                    ch.msg(f"Removed exit from room: {v}")
+                roomdb[v] = data
+
+                # keep the live room in step with its blueprint
+                other = get_room(v)
+                if other:
+                    other.at_object_creation()
 
             # first safely remove blueprint of room
             del GLOBAL_SCRIPTS.roomdb.vnum[vnum]
@@ -532,7 +544,12 @@ class Dig(Command):
 
                     # get next available vnum, we are also guarenteed that room will
                     # not exist
-                    nextvnum = next_available_rvnum()
+                    try:
+                        nextvnum = next_vnum(ch.ndb._redit.db.vnum,
+                                             zone=has_zone(ch))
+                    except VnumRangeFull:
+                        ch.msg("There are no free room vnums left in your zone")
+                        return
                     new_room_info = copy.deepcopy(DEFAULT_ROOM_STRUCT)
 
                     # set exit of new room to the vnum of current room, using opposite
@@ -549,9 +566,7 @@ class Dig(Command):
 
                     # actually create the object of new_room
                     # but just to be safe, let's make sure
-                    room_exists = search_object(
-                        str(nextvnum),
-                        typeclass='typeclasses.rooms.rooms.Room')
+                    room_exists = get_room(nextvnum)
 
                     # create and store blueprint of new room
                     ch.ndb._redit.db.vnum[nextvnum] = new_room_info
@@ -561,7 +576,7 @@ class Dig(Command):
                         room = create_object('typeclasses.rooms.rooms.Room',
                                              key=nextvnum)
                     else:
-                        room = room_exists[0]
+                        room = room_exists
 
                     # save current room in redit to update exits
                     ch.ndb._redit.save(override=True)
@@ -577,32 +592,33 @@ class Dig(Command):
             else:
                 vnum = int(vnum)
                 # first check to see if vnum of room exists
-                target_room = search_object(
-                    str(vnum), typeclass='typeclasses.rooms.rooms.Room')
-
-                if not target_room:
-                    # check to see if is in database
-                    try:
-                        target_room = GLOBAL_SCRIPTS.roomdb.vnum[vnum]
-                    except KeyError:
-
-                        ch.msg(
-                            "room doesn't exist create it first and then rerun this command"
-                        )
-                        return
-                    _ = create_object('typeclasses.rooms.rooms.Room', key=vnum)
+                roomdb = GLOBAL_SCRIPTS.roomdb.vnum
+                if vnum not in roomdb:
+                    ch.msg(
+                        "room doesn't exist create it first and then rerun this command"
+                    )
+                    return
 
                 cur_room = ch.ndb._redit.obj
-                target_room = target_room[0]
-                if target_room.db.zone != cur_room['zone']:
+                if roomdb[vnum]['zone'] != cur_room['zone']:
                     ch.msg(
                         "You can't create an exit to a room that doesn't belong to this zone"
                     )
                     return
 
+                target_room = get_room(vnum)
+                if not target_room:
+                    target_room = create_object('typeclasses.rooms.rooms.Room',
+                                                key=vnum)
+
                 if type_ == 'bi':
-                    target_room['exits'][
+                    # written back as a whole blueprint, so the room graph
+                    # sees the new exit
+                    data = deserialize(roomdb[vnum])
+                    data['exits'][
                         OPPOSITE_DIRECTION[direction]] = ch.ndb._redit.vnum
+                    roomdb[vnum] = data
+                    target_room.at_object_creation()
                     ch.msg(
                         f"You created an exit in room {vnum} to your current location"
                     )
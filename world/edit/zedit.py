@@ -12,7 +12,9 @@ from world.utils.utils import is_builder, is_online, is_pc, match_string
 from evennia import CmdSet, Command, GLOBAL_SCRIPTS, create_script
 from evennia.utils import wrap
 from evennia.commands.default.help import CmdHelp
-from world.utils.db import search_roomdb
+from world.broadcast import to_zone
+from world.graph import room_graph
+from world.utils.db import zone_vnum_ranges
 
 from .model import _EditMode
 
@@ -21,16 +23,16 @@ _ZEDIT_PROMPT = "(|gzedit|n)"
 
 def zone_reset(**kwargs):
     # get all rooms
-    rooms = search_roomdb(zone=kwargs['name'], return_keys=True)
+    rooms = room_graph().zone_rooms(kwargs['name'])
     if not rooms:
         return
 
-    for vnum in rooms:
+    for vnum in sorted(rooms):
         room_obj = get_room(vnum)
         if not room_obj:
             continue
         room_obj.reset()
-        room_obj.announce(kwargs['reset_msg'])
+    to_zone(kwargs['name'], kwargs['reset_msg'])
 
 
 class ZEditMode(_EditMode):
@@ -67,6 +69,8 @@ class ZEditMode(_EditMode):
         builders = wrap(", ".join(self.obj['builders']))
         min_, max_ = self.obj['level_range']
         lvl_range = f"Min: {min_} Max: {max_}"
+        low, high = self.obj['vnums']
+        vnums = f"{low}-{high}" if low > 0 else "any"
         msg = f"""
 
 ********Zone Summary*******
@@ -76,6 +80,7 @@ class ZEditMode(_EditMode):
 |Gbuilders|n    : 
 {builders}
 
+|Gvnums|n       : |y{vnums}|n
 |Glifespan|n    : |y{self.obj['lifespan']}|n
 |Glevel_range|n : |m{lvl_range}|n
 |Greset_msg|n   : 
@@ -181,6 +186,29 @@ class Set(ZEditCommand):
 
                 obj['lifespan'] = ls
             ch.msg(set_str.format(keyword='lifespan'))
+        elif match_string(keyword, 'vnums'):
+            # vnums new rooms, objs and mobs of the zone are given
+            if len(args) == 2 and args[1] == 'clear':
+                obj['vnums'] = [-1, -1]
+                ch.msg("vnums cleared")
+                return
+            try:
+                low, high = int(args[1]), int(args[2])
+            except (IndexError, ValueError):
+                ch.msg("Supply the range as `set vnums <low> <high>` or `clear`")
+                return
+
+            if not 0 < low <= high:
+                ch.msg("The range must be positive with low <= high")
+                return
+
+            for name, (olow, ohigh) in zone_vnum_ranges().items():
+                if name != obj['name'] and low <= ohigh and olow <= high:
+                    ch.msg(f"That range overlaps zone `{name}` ({olow}-{ohigh})")
+                    return
+
+            obj['vnums'] = [low, high]
+            ch.msg(set_str)
         else:
             ch.msg("That isn't a valid keyword")
             return
@@ -214,4 +242,5 @@ class Exit(ZEditCommand):
         ch = self.caller
         ch.cmdset.remove('world.edit.zedit.ZEditCmdSet')
         ch.ndb._zedit.save(override=True)
+        ch.ndb._zedit.close()
         del ch.ndb._zedit
\ No newline at end of file
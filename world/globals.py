@@ -100,6 +100,18 @@ DEFAULT_TRIG_STRUCT = {
     'prog': ''
 }
 
+# schema of the blueprints in each EntityDB (mobdb, objdb, ...). Bump the
+# version when its struct changes (and register a migration in
+# world.utils.schema if fields are renamed/reshaped), stored blueprints
+# are upgraded once at startup or dbload, not every time they're used.
+BLUEPRINT_SCHEMAS = {
+    'mob': {'version': 1, 'struct': DEFAULT_MOB_STRUCT},
+    'obj': {'version': 1, 'struct': DEFAULT_OBJ_STRUCT},
+    'room': {'version': 1, 'struct': DEFAULT_ROOM_STRUCT},
+    'zone': {'version': 1, 'struct': DEFAULT_ZONE_STRUCT},
+    'trig': {'version': 1, 'struct': DEFAULT_TRIG_STRUCT},
+}
+
 DAM_TYPES = {
     "physical": {
         "hit",
@@ -0,0 +1,274 @@
+"""
+Compiled graph of the rooms in roomdb and their exits
+
+Rooms are given a dense index, exits are kept in an (index x direction)
+numpy table of destination indexes, along with a reverse index of the
+exits coming into every room. Writes to roomdb update the graph in place,
+so lookups never have to go through the blueprints.
+
+Usage:
+    graph = room_graph()
+    graph.exits(1)      # {'north': 2, ...}
+    graph.incoming(2)   # [(1, 'north'), ...]
+    graph.zone_rooms('void')
+"""
+import itertools
+
+import numpy as np
+from evennia import GLOBAL_SCRIPTS
+from world.globals import VALID_DIRECTIONS
+
+DIRECTIONS = VALID_DIRECTIONS
+DIRECTION_CODES = {name: code for code, name in enumerate(DIRECTIONS)}
+
+# shared by every graph, so versions keep increasing across rebuilds
+_VERSIONS = itertools.count(1)
+
+
+class RoomGraph:
+    """
+    Args:
+        rooms: mapping of vnum -> room blueprint to build the graph from
+    """
+    def __init__(self, rooms=None, capacity=64):
+        self._index = dict()  # vnum -> dense index
+        self._vnums = np.zeros(capacity, dtype=np.int64)
+        self._exits = np.full((capacity, len(DIRECTIONS)), -1, dtype=np.int32)
+        self._present = np.zeros(capacity, dtype=bool)
+        self._incoming = []  # per index, set of (source index, direction code)
+        self._zones = dict()  # vnum -> zone
+        self._sectors = dict()  # vnum -> sector (blueprint `type`)
+        self._zone_rooms = dict()  # zone -> set of vnums
+        self._zone_versions = dict()
+        self._csr = None
+        self._components = None
+        self.version = next(_VERSIONS)
+        self.store = None
+        self.stale = False
+        self.listeners = []  # called with the vnum of every room changed
+
+        if rooms:
+            for vnum, room in rooms.items():
+                self._set(vnum, room)
+            self.version = next(_VERSIONS)
+
+    @classmethod
+    def from_store(cls, store):
+        """builds the graph of a BlueprintStore and keeps it in step with it"""
+        graph = cls(store, capacity=max(64, len(store) * 2))
+        graph.store = store
+        store.listeners.append(graph.blueprint_changed)
+        return graph
+
+    def _node(self, vnum):
+        try:
+            return self._index[vnum]
+        except KeyError:
+            pass
+
+        idx = len(self._index)
+        if idx == len(self._vnums):
+            grow = len(self._vnums)
+            self._vnums = np.concatenate(
+                (self._vnums, np.zeros(grow, dtype=np.int64)))
+            self._exits = np.concatenate(
+                (self._exits,
+                 np.full((grow, len(DIRECTIONS)), -1, dtype=np.int32)))
+            self._present = np.concatenate(
+                (self._present, np.zeros(grow, dtype=bool)))
+
+        self._index[vnum] = idx
+        self._vnums[idx] = vnum
+        self._incoming.append(set())
+        return idx
+
+    def _set_exit(self, idx, code, target):
+        old = self._exits[idx, code]
+        if old == target:
+            return
+        if old >= 0:
+            self._incoming[old].discard((idx, code))
+        if target >= 0:
+            self._incoming[target].add((idx, code))
+        self._exits[idx, code] = target
+
+    def _set_zone(self, vnum, zone):
+        old = self._zones.pop(vnum, None)
+        if old is not None:
+            self._zone_rooms[old].discard(vnum)
+            self._zone_versions[old] = self.version
+        if zone is not None:
+            self._zones[vnum] = zone
+            self._zone_rooms.setdefault(zone, set()).add(vnum)
+            self._zone_versions[zone] = self.version
+
+    def _set(self, vnum, room):
+        idx = self._node(vnum)
+        self._present[idx] = True
+        exits = room['exits']
+        for code, direction in enumerate(DIRECTIONS):
+            target = exits.get(direction, -1)
+            self._set_exit(idx, code, self._node(target) if target > 0 else -1)
+        self._set_zone(vnum, room['zone'])
+        self._sectors[vnum] = room.get('type')
+
+    def _changed(self):
+        self.version = next(_VERSIONS)
+        self._csr = None
+        self._components = None
+
+    def set_room(self, vnum, room):
+        """adds or updates the room of vnum from its blueprint"""
+        self._changed()
+        self._set(vnum, room)
+        self._notify(vnum)
+
+    def remove_room(self, vnum):
+        """removes vnum and its exits, exits leading into it are kept"""
+        idx = self._index.get(vnum)
+        if idx is None or not self._present[idx]:
+            return
+        self._changed()
+        self._present[idx] = False
+        for code in range(len(DIRECTIONS)):
+            self._set_exit(idx, code, -1)
+        self._set_zone(vnum, None)
+        self._sectors.pop(vnum, None)
+        self._notify(vnum)
+
+    def _notify(self, vnum):
+        for listener in self.listeners:
+            listener(vnum)
+
+    def blueprint_changed(self, vnum, record):
+        """BlueprintStore listener, vnum is None when the store was reset"""
+        if vnum is None:
+            self.stale = True
+        elif record is None:
+            self.remove_room(vnum)
+        else:
+            self.set_room(vnum, record)
+
+    def __contains__(self, vnum):
+        idx = self._index.get(vnum)
+        return idx is not None and bool(self._present[idx])
+
+    def __len__(self):
+        return len(self._zones)
+
+    def index(self, vnum):
+        """dense index of vnum, None if it isn't in the graph"""
+        return self._index.get(vnum)
+
+    def vnum(self, idx):
+        return int(self._vnums[idx])
+
+    def exits(self, vnum):
+        """direction -> destination vnum of every exit of vnum"""
+        idx = self._index.get(vnum)
+        if idx is None:
+            return dict()
+        return {
+            DIRECTIONS[code]: int(self._vnums[target])
+            for code, target in enumerate(self._exits[idx]) if target >= 0
+        }
+
+    def neighbours(self, vnum):
+        """vnums of the existing rooms vnum has an exit to"""
+        idx = self._index.get(vnum)
+        if idx is None:
+            return []
+        return [
+            int(self._vnums[target]) for target in self._exits[idx]
+            if target >= 0 and self._present[target]
+        ]
+
+    def incoming(self, vnum):
+        """(vnum, direction) of every exit of an existing room leading to vnum"""
+        idx = self._index.get(vnum)
+        if idx is None:
+            return []
+        return sorted((int(self._vnums[source]), DIRECTIONS[code])
+                      for source, code in self._incoming[idx]
+                      if self._present[source])
+
+    def zone(self, vnum):
+        return self._zones.get(vnum)
+
+    def sector(self, vnum):
+        return self._sectors.get(vnum)
+
+    def zone_rooms(self, zone):
+        """set of vnums in zone"""
+        return set(self._zone_rooms.get(zone, ()))
+
+    def zone_version(self, zone):
+        """changes every time a room of zone, or its exits, changes"""
+        return self._zone_versions.get(zone, 0)
+
+    def csr(self):
+        """
+        Compiled (indptr, targets, directions) arrays of the exits between
+        existing rooms: the exits of index i are targets[indptr[i]:indptr[i+1]]
+        in directions[...]. Cached until the graph changes.
+        """
+        if self._csr is None:
+            size = len(self._index)
+            exits = self._exits[:size]
+            present = self._present[:size]
+            valid = exits >= 0
+            valid &= present[:, None]
+            valid[valid] = present[exits[valid]]
+
+            rows, codes = np.nonzero(valid)
+            indptr = np.zeros(size + 1, dtype=np.int64)
+            np.cumsum(np.bincount(rows, minlength=size), out=indptr[1:])
+            self._csr = (indptr, exits[rows, codes].astype(np.int32),
+                         codes.astype(np.int8))
+        return self._csr
+
+    def components(self):
+        """list of sets of vnums, rooms connected by exits either way"""
+        if self._components is None:
+            indptr, targets, _ = self.csr()
+            size = len(self._index)
+            parent = np.arange(size)
+
+            def find(i):
+                while parent[i] != i:
+                    parent[i] = parent[parent[i]]
+                    i = parent[i]
+                return i
+
+            sources = np.repeat(np.arange(size), np.diff(indptr))
+            for source, target in zip(sources, targets):
+                a, b = find(source), find(target)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+
+            groups = dict()
+            for idx in np.flatnonzero(self._present[:size]):
+                groups.setdefault(find(idx), set()).add(int(self._vnums[idx]))
+            self._components = sorted(groups.values(), key=min)
+        return [set(group) for group in self._components]
+
+
+_GRAPH = None
+
+
+def room_graph():
+    """
+    the graph of roomdb, built on first use and kept up to date after,
+    only goes through GLOBAL_SCRIPTS (a database query) when (re)built
+    """
+    global _GRAPH
+    if _GRAPH is not None and not _GRAPH.stale:
+        return _GRAPH
+
+    if _GRAPH is not None and _GRAPH.store is not None:
+        try:
+            _GRAPH.store.listeners.remove(_GRAPH.blueprint_changed)
+        except ValueError:
+            pass
+    _GRAPH = RoomGraph.from_store(GLOBAL_SCRIPTS.roomdb.vnum)
+    return _GRAPH
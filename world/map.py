@@ -2,52 +2,173 @@
 Holds the class to generate a map
 """
 import json
-from typing import Any, Dict, Optional, Tuple, List, Dict
+from collections import OrderedDict, deque
+from typing import Dict, Optional, Tuple
 import numpy as np
 
-from typeclasses.rooms.rooms import VALID_ROOM_SECTORS, Room
-from typeclasses.characters import Character
-from world.utils.db import search_roomdb
+from typeclasses.rooms.rooms import VALID_ROOM_SECTORS
+from world.graph import RoomGraph, room_graph
 from world.utils.utils import DBDumpEncoder
-from world.globals import OPPOSITE_DIRECTION
 
 _DEFAULT_MAP_SIZE: Tuple[int, int] = (5, 5)
 
-_DIRECTION_MAPPING: Dict[str, np.ndarray] = {
-    'north': np.array((0, -2)),
-    'south': np.array((0, 2)),
-    'east': np.array((2, 0)),
-    'west': np.array((-2, 0))
+# (row, column) offset of the next room in a direction
+_DIRECTION_MAPPING: Dict[str, Tuple[int, int]] = {
+    'north': (-2, 0),
+    'south': (2, 0),
+    'east': (0, 2),
+    'west': (0, -2)
 }
 
+# bits of MapGrid.edges
+_EDGE_BITS: Dict[str, int] = {'north': 1, 'south': 2, 'east': 4, 'west': 8}
+
+# bits of MapGrid.vertical
+_UP: int = 1
+_DOWN: int = 2
+
 _HORIZONTAL_PATH_ICON: str = '---'
 _VERTICAL_PATH_ICON: str = ' | '
 _UP_ICON: str = '|r+  |n'
 _DOWN_ICON: str = '|r  ‾|n'
+_EMPTY_ICON: str = '   '
+_CENTER_SYMBOL: str = '|M@|n'
+
+_MAP_CACHE_SIZE: int = 4096
+
+
+class MapGrid:
+    """
+    Cells of a map, indexed by (row, column). Rooms sit on even offsets
+    from the center, the paths between them in between.
+
+    symbols: sector symbol of the room drawn in a cell, '' if none
+    edges: bitmask of the exits (_EDGE_BITS) of the room in a cell
+    vertical: bitmask of the up/down exits of the room in a cell
+    """
+    def __init__(self, rows: int, cols: int) -> None:
+        self.symbols = np.full((rows, cols), '', dtype=object)
+        self.edges = np.zeros((rows, cols), dtype=np.uint8)
+        self.vertical = np.zeros((rows, cols), dtype=np.uint8)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.symbols.shape
+
+    def render(self) -> str:
+        return "".join("".join(row) + "\n" for row in self.cells())
+
+    def cells(self) -> np.ndarray:
+        """rendered string of every cell, 3 characters wide once printed"""
+        rows, cols = self.shape
+        cells = np.full((rows, cols), _EMPTY_ICON, dtype=object)
+
+        rooms = self.symbols != ''
+        cells[rooms] = [f"|c[{symbol:1}|c]|n" for symbol in self.symbols[rooms]]
+
+        # paths are drawn next to the rooms that have the exits
+        edges = np.where(rooms, self.edges, 0)
+        vertical = np.where(rooms, self.vertical, 0)
+        cells[:-1][(edges[1:] & _EDGE_BITS['north']) > 0] = _VERTICAL_PATH_ICON
+        cells[1:][(edges[:-1] & _EDGE_BITS['south']) > 0] = _VERTICAL_PATH_ICON
+        cells[:, 1:][(edges[:, :-1] & _EDGE_BITS['east']) > 0] = _HORIZONTAL_PATH_ICON
+        cells[:, :-1][(edges[:, 1:] & _EDGE_BITS['west']) > 0] = _HORIZONTAL_PATH_ICON
+        cells[:-1, 1:][(vertical[1:, :-1] & _UP) > 0] = _UP_ICON
+        cells[1:, :-1][(vertical[:-1, 1:] & _DOWN) > 0] = _DOWN_ICON
+        return cells
+
+
+class MapCache:
+    """
+    Rendered maps keyed on (room vnum, map size). Each map remembers the
+    rooms it was drawn from, and is dropped as soon as one of them is
+    changed in the room graph, or the graph itself is rebuilt. The least
+    recently used maps are dropped past `maxsize`.
+    """
+    def __init__(self, maxsize: int = _MAP_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self._graph: Optional[RoomGraph] = None
+        self._maps: OrderedDict = OrderedDict()  # key -> (map string, vnums)
+        self._keys: Dict[int, set] = dict()  # vnum -> keys of maps it's on
+
+    def _bind(self, graph: RoomGraph) -> None:
+        if graph is self._graph:
+            return
+        if self._graph is not None:
+            try:
+                self._graph.listeners.remove(self.invalidate)
+            except ValueError:
+                pass
+        self.clear()
+        self._graph = graph
+        graph.listeners.append(self.invalidate)
+
+    def get(self, graph: RoomGraph, key) -> Optional[str]:
+        self._bind(graph)
+        try:
+            self._maps.move_to_end(key)
+        except KeyError:
+            return None
+        return self._maps[key][0]
+
+    def put(self, graph: RoomGraph, key, map_string: str, vnums) -> None:
+        self._bind(graph)
+        self._drop(key)
+        self._maps[key] = (map_string, vnums)
+        for vnum in vnums:
+            self._keys.setdefault(vnum, set()).add(key)
+        while len(self._maps) > self.maxsize:
+            self._drop(next(iter(self._maps)))
+
+    def _drop(self, key) -> None:
+        entry = self._maps.pop(key, None)
+        if entry is None:
+            return
+        for vnum in entry[1]:
+            keys = self._keys.get(vnum)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys[vnum]
+
+    def invalidate(self, vnum: int) -> None:
+        """drops every map vnum is drawn on, RoomGraph listener"""
+        for key in list(self._keys.get(vnum, ())):
+            self._drop(key)
+
+    def clear(self) -> None:
+        self._maps.clear()
+        self._keys.clear()
+
+    def __len__(self) -> int:
+        return len(self._maps)
+
+
+MAP_CACHE = MapCache()
 
 
 class Wormy:
     """
-    Creates a crawler that maps out nearby rooms based on position and thresholds.
-    Generates a pretty string and returns back.
+    Crawls the rooms around a position, breadth first and each room once,
+    within the bounds of the map. Generates a pretty string and returns back.
 
     Usage:
         ```python
-        
-        wormy = Wormy(ch.location)
 
-        map_string = wormy.generate()
+        wormy = Wormy(ch)
+
+        map_string = wormy.generate_map()
 
         # or
-        
-        # turn on debug mode    
+
+        # turn on debug mode
         # caller_obj must support .msg() method
 
-        map_string = wormy.generate(caller_obj=ch)
+        map_string = Wormy(ch, debug=True).generate_map()
 
         ch.msg(map_string)
         ```
-    
+
     """
     @staticmethod
     def calculate_map_size(map_size_x, map_size_y) -> Tuple[int, int]:
@@ -78,63 +199,48 @@ class Wormy:
         return tuple(map(lambda x: x // 2, (map_size_x, map_size_y)))
 
     @staticmethod
-    def initialize_grid_map(max_x, max_y) -> List[List[Dict[str, Any]]]:
+    def initialize_grid(max_x, max_y) -> MapGrid:
         # initalize empty map for drawing
-        grid_map: List[List[Dict[str, Any]]] = list()
-
-        for _ in range(max_x):
-            tmp_row = list()
-            for _ in range(max_y):
-                tmp_row.append({
-                    'symbol': '',
-                    'up': False,
-                    'down': False,
-                    'south': False,
-                    'east': False,
-                    'west': False,
-                    'north': False
-                })
-            grid_map.append(tmp_row)
-        return grid_map
+        return MapGrid(max_x, max_y)
 
     def __init__(self,
-                 caller_obj: Character,
+                 caller_obj,
                  map_size_x: Optional[int] = None,
                  map_size_y: Optional[int] = None,
-                 debug=False) -> None:
+                 debug=False,
+                 graph: Optional[RoomGraph] = None) -> None:
 
-        self._caller_obj: Character = caller_obj
+        self._caller_obj = caller_obj
         self._debug: bool = debug
+        self._graph: RoomGraph = room_graph() if graph is None else graph
 
-        map_size: Tuple[int, int] = Wormy.calculate_map_size(
+        self.map_size: Tuple[int, int] = Wormy.calculate_map_size(
             map_size_x, map_size_y)
 
         # get center coords based on map size
-        center_coords: Tuple[int, int] = Wormy.calculate_center_coordinates(
-            map_size[0], map_size[1])
+        self.center_coords: Tuple[int, int] = Wormy.calculate_center_coordinates(
+            self.map_size[0], self.map_size[1])
 
         # get current location object
-        self.cur_location: Room = caller_obj.location
+        self.cur_location = caller_obj.location
 
-        # initalize empty map for drawing
-        self._grid_map: List[List[Dict[str, Any]]] = Wormy.initialize_grid_map(
-            map_size[0], map_size[1])
+        self._grid: MapGrid = Wormy.initialize_grid(self.map_size[0],
+                                                    self.map_size[1])
 
-        # initalize starting coordinates
-        self.current_coords: np.ndarray = np.array(center_coords,
-                                                   dtype=np.int32)
+        # number of rooms crawled through
+        self.crawled: int = 0
 
-        # initalize center coordinates in np array form
-        self.center_coords = np.array(center_coords, dtype=np.int32)
+        # rooms the map depends on, crawled ones and missing exit destinations
+        self.seen: set = set()
 
         self.debug_msg(
             json.dumps(
                 {
                     "map_size_x": map_size_x,
                     "map_size_y": map_size_y,
-                    "center_coords": center_coords,
+                    "center_coords": self.center_coords,
                     "caller_obj": str(caller_obj),
-                    "supplied_map_size": map_size
+                    "supplied_map_size": self.map_size
                 },
                 cls=DBDumpEncoder))
 
@@ -144,194 +250,75 @@ class Wormy:
             return
         self._caller_obj.msg(str(msg))
 
-    def traverse(self,
-                 exits: Dict[str, int],
-                 previous_current_coordinates: Optional[np.ndarray] = None,
-                 previous_exit_name: Optional[str] = None,
-                 _debug_indent: int = 0) -> None:
+    def traverse(self) -> None:
         """
-        Main recursive method that 'crawls' into other rooms and
-        dynamically generates the map, stores initial data in a grid-like
-        data type which is a python-native list of lists of dictionaries
+        Breadth first crawl from the starting room, every room is
+        placed once, on the first cell it's reached at. Rooms that
+        would fall on an already drawn cell, or off the map, are skipped.
         """
-        for exit_name, rvnum in exits.items():
-            # check for exit conditions
-
-            # skip exit that you came from
-            if exit_name == previous_exit_name:
-                continue
-
-            # skip if no exit is found
-            if rvnum < 0:
-                continue
-
-            # wormy can't traverse up or down right now :(
-            # but we can indicate it!
-            if exit_name in ('up', 'down'):
-                self.debug_msg(("FOUND A INVLAID EXIT: ", exit_name,
-                                self.cur_x, self.cur_y))
+        graph, grid = self._graph, self._grid
+        max_row, max_col = grid.shape[0] - 1, grid.shape[1] - 1
+
+        start_vnum = int(self.cur_location.key)
+        row, col = self.center_coords
+        grid.symbols[row, col] = _CENTER_SYMBOL
+        visited = {start_vnum}
+        queue = deque([(start_vnum, row, col)])
+
+        while queue:
+            vnum, row, col = queue.popleft()
+            self.crawled += 1
+            self.seen.add(vnum)
+
+            for exit_name, rvnum in graph.exits(vnum).items():
+                # wormy can't traverse up or down, but we can indicate it!
                 if exit_name == 'up':
-                    self._grid_map[self.cur_x][self.cur_y]['up'] = True
+                    grid.vertical[row, col] |= _UP
+                    continue
                 if exit_name == 'down':
-                    self._grid_map[self.cur_x][self.cur_y]['down'] = True
-
-                continue
-
-            self._grid_map[self.cur_x][self.cur_y][exit_name] = True
-
-            # update current coords based on exit name for next room
-            previous_current_coordinates: np.ndarray = self.current_coords.copy(
-            )
-            self.current_coords += _DIRECTION_MAPPING[exit_name]
-
-            # if any value is below 0, we are out of bounds, ignore and reset coords to last valid position
-            if np.any(self.current_coords < 0):
-                self.debug_msg("triggered coords less than 0; off map")
-                self.current_coords = previous_current_coordinates.copy()
-                continue
-
-            # if any value is > (center_coords * 2), we are out of bounds, ignore and reset coords to last valid position
-            if np.any(self.current_coords > (self.center_coords * 2)):
-                self.debug_msg("triggered coords more than max")
-                self.current_coords = previous_current_coordinates.copy()
-                continue
-
-            next_room: Dict[str, Any] = search_roomdb(vnum=rvnum)[rvnum]
-
-            ######## do any drawing of the map below here #################
-
-            self._grid_map[self.cur_x][self.cur_y][
-                'symbol'] = VALID_ROOM_SECTORS[next_room['type']].symbol
-
-            ############## do any drawing of the map above here ################
-            self.debug_msg(("******" * _debug_indent) + json.dumps(
-                {
-                    exit_name: {
-                        "next_room": next_room['name'],
-                        "rvnum": rvnum,
-                        "previous_coordinates": {
-                            "x": previous_current_coordinates[0],
-                            "y": previous_current_coordinates[1]
-                        },
-                        "direction_value": _DIRECTION_MAPPING[exit_name],
-                        "current_coordinates": {
-                            "x": self.cur_x,
-                            "y": self.cur_y
-                        },
-                        "next_room_type": next_room['type'],
-                        "symbol": VALID_ROOM_SECTORS[next_room['type']].symbol
-                    }
-                },
-                cls=DBDumpEncoder))
-
-            self.traverse(
-                next_room['exits'],
-                previous_current_coordinates=previous_current_coordinates,
-                previous_exit_name=OPPOSITE_DIRECTION[exit_name],
-                _debug_indent=(_debug_indent + 1))
+                    grid.vertical[row, col] |= _DOWN
+                    continue
 
-            # returning from recursion means we finished worming through a particular
-            # path.. resetting current_coords to starting point so the math aligns
-            self.debug_msg(
-                f"Path complete, resetting coordinates back to room {rvnum} at {previous_current_coordinates}"
-            )
-            self.current_coords = previous_current_coordinates.copy()
+                grid.edges[row, col] |= _EDGE_BITS[exit_name]
 
-        # exhausted all exits in room, roll back
-        return
+                drow, dcol = _DIRECTION_MAPPING[exit_name]
+                next_row, next_col = row + drow, col + dcol
+                if not (0 <= next_row <= max_row and 0 <= next_col <= max_col):
+                    continue
+                if rvnum not in graph:
+                    # the map changes if the room gets created
+                    self.seen.add(rvnum)
+                    continue
+                if rvnum in visited:
+                    continue
+                if grid.symbols[next_row, next_col] != '':
+                    self.debug_msg(f"room {rvnum} overlaps another room "
+                                   f"at {(next_row, next_col)}")
+                    continue
 
-    @property
-    def cur_x(self) -> np.int32:
-        return self.current_coords[1]
+                visited.add(rvnum)
+                sector = VALID_ROOM_SECTORS.get(graph.sector(rvnum))
+                grid.symbols[next_row, next_col] = (
+                    sector.symbol if sector is not None else '?')
+                queue.append((rvnum, next_row, next_col))
 
-    @property
-    def cur_y(self) -> np.int32:
-        return self.current_coords[0]
+                self.debug_msg(
+                    f"{exit_name} of {vnum} to {rvnum} "
+                    f"at {(next_row, next_col)} ({graph.sector(rvnum)})")
 
     def generate_map(self) -> str:
-        # update center location
-        self._grid_map[self.cur_x][self.cur_y]['symbol'] = "|M@|n"
-        # begin traversing rooms
-        self.traverse(self.cur_location.db.exits)
-
-        map_string: str = ""
-        map_size: np.ndarray = self.center_coords * 2
-
-        # fill in paths between rooms here based on current grid
-        for x in range(map_size[0] + 1):
-            for y in range(map_size[1] + 1):
-                grid_val: Dict[str, Any] = self._grid_map[x][y]
-
-                # ignore empty ones for now
-                if grid_val['symbol'] == '':
-                    continue
+        """
+        the map is the same for everyone in a room, so it's only crawled
+        again once a room drawn on it changes (see MapCache). Debug mode
+        always crawls.
+        """
+        key = (int(self.cur_location.key), self.map_size)
+        if not self._debug:
+            map_string = MAP_CACHE.get(self._graph, key)
+            if map_string is not None:
+                return map_string
 
-                # get all exits in that came out positive
-                exits: List[str] = [
-                    exit_name for exit_name, exists in grid_val.items()
-                    if exists is True  #and exit_name not in ('up', 'down')
-                ]
-
-                # map write '-', or '|' depending on exit directions relatively
-
-                for exit_ in exits:
-                    north_offset = x - 1
-                    south_offset = x + 1
-                    east_offset = y + 1
-                    west_offset = y - 1
-
-                    self.debug_msg((exit_, north_offset, south_offset,
-                                    east_offset, west_offset, map_size + 1))
-
-                    if exit_ == 'north' and north_offset > 0:
-                        self.debug_msg((north_offset, y, exit_))
-                        self._grid_map[north_offset][y][
-                            'symbol'] = _VERTICAL_PATH_ICON
-
-                    if exit_ == 'south' and south_offset < map_size[0] + 1:
-                        self.debug_msg((south_offset, y, exit_))
-                        self._grid_map[south_offset][y][
-                            'symbol'] = _VERTICAL_PATH_ICON
-
-                    if exit_ == 'east' and east_offset < map_size[0] + 1:
-                        self.debug_msg((x, east_offset, exit_))
-
-                        self._grid_map[x][east_offset][
-                            'symbol'] = _HORIZONTAL_PATH_ICON
-
-                    if exit_ == 'west' and west_offset > 0:
-                        self.debug_msg((x, west_offset, exit_))
-
-                        self._grid_map[x][west_offset][
-                            'symbol'] = _HORIZONTAL_PATH_ICON
-
-                    if exit_ == 'up' and (north_offset > 0
-                                          and east_offset < map_size[0] + 1):
-                        self.debug_msg((north_offset, east_offset, exit_))
-
-                        self._grid_map[north_offset][east_offset][
-                            'symbol'] = _UP_ICON
-
-                    if exit_ == 'down' and (west_offset > 0 and
-                                            south_offset < map_size[0] + 1):
-                        self.debug_msg((north_offset, east_offset, exit_))
-                        self._grid_map[south_offset][west_offset][
-                            'symbol'] = _DOWN_ICON
-
-        # convert grid into prettyness string
-        for x in range(map_size[0] + 1):
-            for y in range(map_size[1] + 1):
-                grid_val: Dict[str, Any] = self._grid_map[x][y]
-
-                if grid_val['symbol'] == '':
-                    map_string += f"{'':3}"
-                else:
-                    if grid_val['symbol'] in (_VERTICAL_PATH_ICON,
-                                              _HORIZONTAL_PATH_ICON, _UP_ICON,
-                                              _DOWN_ICON):
-                        map_string += grid_val['symbol']
-                    else:
-                        map_string += f"|c[{grid_val['symbol']:1}|c]|n"
-
-            map_string += "\n"
+        self.traverse()
+        map_string = self._grid.render()
+        MAP_CACHE.put(self._graph, key, map_string, frozenset(self.seen))
         return map_string
@@ -0,0 +1,101 @@
+"""
+Who and what is in a room, split by kind, so code that only cares about
+the players in a room doesn't check every object in it.
+
+Rooms keep their Occupancy up to date as things move in and out
+(Room.at_object_receive/at_object_leave). Things placed without those
+hooks, being created in the room or having their location set directly,
+are picked up the next time the occupancy is read: it's rebuilt whenever
+it no longer holds exactly the room's contents.
+
+Usage:
+    for pc in room.occupants.pcs():
+        pc.msg("hello")
+"""
+from world.utils.utils import is_npc, is_obj, is_pc
+
+PC, NPC, OBJ, OTHER = 'pc', 'npc', 'obj', 'other'
+
+
+def obj_kind(obj):
+    """which part of an occupancy obj goes in"""
+    if is_pc(obj):
+        return PC
+    if is_npc(obj):
+        return NPC
+    if is_obj(obj):
+        return OBJ
+    return OTHER
+
+
+class Occupancy:
+    """
+    Contents of a room partitioned by kind, each kind kept in the order
+    things arrived. The kind and look_index of everything is read once,
+    when it enters the room.
+
+    Args:
+        room: the room, anything with .contents
+    """
+    def __init__(self, room):
+        self.room = room
+        self._entries = dict()  # obj -> (kind, look_index)
+        self._kinds = {PC: dict(), NPC: dict(), OBJ: dict(), OTHER: dict()}
+        self.rebuilds = 0
+        self.rebuild()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, obj):
+        self._sync()
+        return obj in self._entries
+
+    def add(self, obj):
+        self.discard(obj)
+        kind = obj_kind(obj)
+        self._entries[obj] = (kind, obj.db.look_index or 0)
+        self._kinds[kind][obj] = None
+
+    def discard(self, obj):
+        entry = self._entries.pop(obj, None)
+        if entry is not None:
+            del self._kinds[entry[0]][obj]
+
+    def rebuild(self):
+        """reads every kind again from the room's contents"""
+        self._entries.clear()
+        for kind in self._kinds.values():
+            kind.clear()
+        for obj in self.room.contents:
+            self.add(obj)
+        self.rebuilds += 1
+
+    def _sync(self):
+        # same count isn't enough, something deleted (no leave hook) and
+        # something else placed without a hook would cancel out
+        contents = self.room.contents
+        if len(contents) != len(self._entries) or any(
+                obj not in self._entries for obj in contents):
+            self.rebuild()
+
+    def _iter(self, kind, exclude):
+        self._sync()
+        # copied, so callers can move things out while iterating
+        return [obj for obj in self._kinds[kind] if obj not in exclude]
+
+    def pcs(self, exclude=()):
+        return self._iter(PC, exclude)
+
+    def npcs(self, exclude=()):
+        return self._iter(NPC, exclude)
+
+    def objs(self, exclude=()):
+        return self._iter(OBJ, exclude)
+
+    def by_look_index(self, exclude=()):
+        """(kind, obj) of everything in the room, ordered for look"""
+        self._sync()
+        entries = sorted(self._entries.items(), key=lambda entry: entry[1][1])
+        return [(kind, obj) for obj, (kind, _) in entries
+                if obj not in exclude]
@@ -0,0 +1,238 @@
+"""
+Routes between rooms over the compiled room graph (see world.graph)
+
+Inside a zone, the next step towards a room of the same zone comes
+from a next hop table of that destination, computed the first time it's
+asked for and kept for the most recently used destinations, and dropped
+when the zone's rooms or exits change. Anything else falls back to a
+BFS (or Dijkstra, with a cost function) over the graph's CSR arrays.
+Nothing here touches the database.
+
+Usage:
+    next_step(ch.location.key, target.location.key)  # 'north'
+    find_path(1, 42)  # ['north', 'north', 'east']
+"""
+import heapq
+from collections import OrderedDict, deque
+
+import numpy as np
+from world.graph import DIRECTIONS, room_graph
+
+_UNREACHABLE = np.iinfo(np.int32).max
+_ROUTES_KEPT = 256  # destinations per zone whose next hops are kept
+
+
+class ZoneRoutes:
+    """
+    distances and next hops from every room of a zone towards the
+    destinations asked for, only exits between rooms of the zone are
+    followed. Each destination costs a BFS over the zone and two arrays
+    the size of the zone, so only the `kept` most recently used are kept.
+
+    Args:
+        graph: RoomGraph
+        zone: name of the zone
+        kept: number of destinations to keep the routes of
+    """
+    def __init__(self, graph, zone, kept=_ROUTES_KEPT):
+        self.zone = zone
+        self.version = graph.zone_version(zone)
+        self.vnums = sorted(graph.zone_rooms(zone))
+        self.index = {vnum: idx for idx, vnum in enumerate(self.vnums)}
+        self.kept = kept
+        self._routes = OrderedDict()  # destination index -> (hops, dists)
+
+        # incoming exits, as (source index, direction code), within the zone
+        self._incoming = [[(self.index[source], DIRECTIONS.index(direction))
+                           for source, direction in graph.incoming(vnum)
+                           if source in self.index] for vnum in self.vnums]
+
+    def _towards(self, dest):
+        routes = self._routes.get(dest)
+        if routes is not None:
+            self._routes.move_to_end(dest)
+            return routes
+
+        # a BFS backwards from the destination gives the first step
+        # every other room takes to reach it
+        size = len(self.vnums)
+        hops = np.full(size, -1, dtype=np.int8)
+        dists = np.full(size, _UNREACHABLE, dtype=np.int32)
+        dists[dest] = 0
+        queue = deque([dest])
+        while queue:
+            room = queue.popleft()
+            for source, code in self._incoming[room]:
+                if dists[source] == _UNREACHABLE:
+                    dists[source] = dists[room] + 1
+                    hops[source] = code
+                    queue.append(source)
+
+        routes = self._routes[dest] = (hops, dists)
+        if len(self._routes) > self.kept:
+            self._routes.popitem(last=False)
+        return routes
+
+    def next_step(self, start, goal):
+        """direction to take from start towards goal, None if there's no way"""
+        hops, _ = self._towards(self.index[goal])
+        code = hops[self.index[start]]
+        return None if code < 0 else DIRECTIONS[code]
+
+    def steps(self, start, goal):
+        """number of steps from start to goal, None if there's no way"""
+        _, dists = self._towards(self.index[goal])
+        dist = dists[self.index[start]]
+        return None if dist == _UNREACHABLE else int(dist)
+
+
+class Pathfinder:
+    """
+    Args:
+        graph: callable returning the RoomGraph to route over
+    """
+    def __init__(self, graph=room_graph):
+        self._graph = graph
+        self._zones = dict()  # zone -> ZoneRoutes
+
+    @property
+    def graph(self):
+        return self._graph()
+
+    def zone_routes(self, zone):
+        """routes of zone, started over if the zone changed since"""
+        graph = self.graph
+        routes = self._zones.get(zone)
+        if routes is None or routes.version != graph.zone_version(zone):
+            routes = self._zones[zone] = ZoneRoutes(graph, zone)
+        return routes
+
+    def _same_zone(self, graph, start, goal):
+        zone = graph.zone(start)
+        if zone is not None and zone == graph.zone(goal):
+            return zone
+        return None
+
+    def next_step(self, start, goal):
+        """direction to take from start to get closer to goal, or None"""
+        start, goal = int(start), int(goal)
+        graph = self.graph
+        if start not in graph or goal not in graph or start == goal:
+            return None
+
+        zone = self._same_zone(graph, start, goal)
+        if zone is not None:
+            step = self.zone_routes(zone).next_step(start, goal)
+            if step is not None:
+                return step
+
+        # leaves the zone, or the zone only connects back through another one
+        path = self.find_path(start, goal)
+        return path[0] if path else None
+
+    def distance(self, start, goal, max_depth=None):
+        """number of steps from start to goal, None if there's no way"""
+        start, goal = int(start), int(goal)
+        graph = self.graph
+        zone = self._same_zone(graph, start, goal)
+        if zone is not None:
+            steps = self.zone_routes(zone).steps(start, goal)
+            if steps is not None:
+                return steps
+
+        path = self.find_path(start, goal, max_depth=max_depth)
+        return None if path is None else len(path)
+
+    def find_path(self, start, goal, max_depth=None, cost=None):
+        """
+        Directions to follow from start to reach goal.
+
+        Args:
+            start: vnum of the room to start from
+            goal: vnum of the room to reach
+            max_depth: gives up on paths longer than this many steps
+            cost: optional callable of vnum -> cost of entering that room,
+                paths are then the cheapest instead of the shortest
+
+        Returns:
+            list of directions, None if goal can't be reached
+        """
+        graph = self.graph
+        src, dst = graph.index(int(start)), graph.index(int(goal))
+        if src is None or dst is None or int(goal) not in graph:
+            return None
+        if src == dst:
+            return []
+
+        indptr, targets, directions = graph.csr()
+        if cost is None:
+            came_from = self._bfs(indptr, targets, src, dst, max_depth)
+        else:
+            came_from = self._dijkstra(graph, indptr, targets, src, dst,
+                                       max_depth, cost)
+        if dst not in came_from:
+            return None
+
+        path = []
+        node = dst
+        while node != src:
+            node, edge = came_from[node]
+            path.append(DIRECTIONS[directions[edge]])
+        path.reverse()
+        return path
+
+    @staticmethod
+    def _bfs(indptr, targets, src, dst, max_depth):
+        came_from = {src: None}  # index -> (previous index, edge)
+        frontier, depth = [src], 0
+        while frontier and (max_depth is None or depth < max_depth):
+            depth += 1
+            next_frontier = []
+            for node in frontier:
+                for edge in range(indptr[node], indptr[node + 1]):
+                    target = int(targets[edge])
+                    if target in came_from:
+                        continue
+                    came_from[target] = (node, edge)
+                    if target == dst:
+                        return came_from
+                    next_frontier.append(target)
+            frontier = next_frontier
+        return came_from
+
+    @staticmethod
+    def _dijkstra(graph, indptr, targets, src, dst, max_depth, cost):
+        came_from = {src: None}
+        best = {src: 0}
+        queue = [(0, 0, src)]  # cost, steps, index
+        while queue:
+            spent, steps, node = heapq.heappop(queue)
+            if node == dst:
+                break
+            if spent > best[node]:
+                continue
+            if max_depth is not None and steps >= max_depth:
+                continue
+            for edge in range(indptr[node], indptr[node + 1]):
+                target = int(targets[edge])
+                total = spent + cost(graph.vnum(target))
+                if total < best.get(target, total + 1):
+                    best[target] = total
+                    came_from[target] = (node, edge)
+                    heapq.heappush(queue, (total, steps + 1, target))
+        return came_from
+
+
+PATHFINDER = Pathfinder()
+
+
+def find_path(start, goal, max_depth=None, cost=None):
+    return PATHFINDER.find_path(start, goal, max_depth=max_depth, cost=cost)
+
+
+def next_step(start, goal):
+    return PATHFINDER.next_step(start, goal)
+
+
+def distance(start, goal, max_depth=None):
+    return PATHFINDER.distance(start, goal, max_depth=max_depth)
@@ -0,0 +1,261 @@
+"""
+One scheduler for all the timed work of the game, instead of a ticker
+subscription per character.
+
+Timers sit in a hierarchical timing wheel: 3 wheels of 64 slots, a slot
+of the first wheel is one tick (RESOLUTION seconds), a slot of the next
+wheels spans all of the wheel below it. Adding or cancelling a timer is
+O(1), and a tick only looks at the timers due in it. A single reactor
+LoopingCall advances the wheel and runs what's due as one batch, timers
+of the same group together (see Scheduler.set_batch).
+
+Repeating timers added with stagger are spread over their interval, so
+300 characters saving every minute don't all save in the same second.
+
+Usage:
+    SCHEDULER.every(60, ch.save_character, key=('save', ch.id))
+    SCHEDULER.call_later(5, ch.msg, "You feel rested.")
+    SCHEDULER.cancel(('save', ch.id))
+"""
+import itertools
+import time
+from collections import OrderedDict
+
+from evennia import logger
+
+RESOLUTION = 1.0  # seconds a tick lasts
+
+_SLOTS = 64
+_WHEELS = 3
+
+# fractional part of the golden ratio, successive multiples of it spread
+# evenly over [0, 1) however many there are
+_GOLDEN = 0.6180339887498949
+
+
+class Timer:
+    """a callback due at tick `due`, again every `interval` ticks if set"""
+    __slots__ = ('key', 'due', 'interval', 'callback', 'args', 'kwargs',
+                 'group', 'cancelled')
+
+    def __init__(self, key, due, interval, callback, args, kwargs, group):
+        self.key = key
+        self.due = due
+        self.interval = interval
+        self.callback = callback
+        self.args = args
+        self.kwargs = kwargs
+        self.group = group
+        self.cancelled = False
+
+    @property
+    def name(self):
+        return getattr(self.callback, '__qualname__', repr(self.callback))
+
+
+class Scheduler:
+    """
+    Args:
+        resolution: seconds per tick
+        clock: callable returning the time in seconds
+    """
+    def __init__(self, resolution=RESOLUTION, clock=time.time):
+        self.resolution = resolution
+        self.clock = clock
+        self._origin = clock()
+        self._tick = 0
+        self._wheels = [[list() for _ in range(_SLOTS)]
+                        for _ in range(_WHEELS)]
+        self._overflow = list()  # timers beyond the last wheel
+        self._timers = dict()  # key -> Timer
+        self._spread = dict()  # interval -> repeating timers staggered
+        self._batches = dict()  # group -> (batch factory, per call factory)
+        self._anonymous = itertools.count()
+        self._loop = None
+
+        # callback name -> [calls, seconds spent, most seconds in a call]
+        self.costs = OrderedDict()
+        self.last_batch = 0
+
+    # timers
+
+    def _ticks(self, seconds):
+        return max(1, int(round(seconds / self.resolution)))
+
+    def _add(self, key, delay_ticks, interval, callback, args, kwargs,
+             group):
+        if key is None:
+            key = ('anonymous', next(self._anonymous))
+        self.cancel(key)
+        timer = Timer(key, self._tick + delay_ticks, interval, callback,
+                      args, kwargs, group)
+        self._timers[key] = timer
+        self._insert(timer)
+        return timer
+
+    def call_later(self, delay, callback, *args, key=None, group=None,
+                   **kwargs):
+        """runs callback once, delay seconds from now"""
+        return self._add(key, self._ticks(delay), None, callback, args,
+                         kwargs, group)
+
+    def every(self,
+              interval,
+              callback,
+              *args,
+              key=None,
+              group=None,
+              stagger=True,
+              **kwargs):
+        """
+        runs callback every interval seconds. With stagger, the first run
+        is pushed somewhere into the interval, away from the other timers
+        of the same interval, instead of one interval from now.
+        """
+        ticks = self._ticks(interval)
+        delay = ticks
+        if stagger:
+            count = self._spread.get(ticks, 0)
+            self._spread[ticks] = count + 1
+            delay = 1 + int((count * _GOLDEN) % 1 * ticks)
+        return self._add(key, delay, ticks, callback, args, kwargs, group)
+
+    def cancel(self, key):
+        """cancels the timer of key, returns whether there was one"""
+        timer = self._timers.pop(key, None)
+        if timer is None:
+            return False
+        timer.cancelled = True  # dropped from its slot when reached
+        return True
+
+    def __contains__(self, key):
+        return key in self._timers
+
+    def set_batch(self, group, factory, each=None):
+        """
+        timers of group due in the same tick run together inside the
+        context manager factory() returns, e.g. a database transaction.
+        Each of their callbacks also runs inside each() if given, e.g. a
+        savepoint, so one failing doesn't undo the others.
+        """
+        self._batches[group] = (factory, each)
+
+    # wheel
+
+    def _insert(self, timer):
+        delta = timer.due - self._tick
+        if delta <= 0:
+            # due now, the current slot of the first wheel runs next
+            self._wheels[0][self._tick % _SLOTS].append(timer)
+            return
+        for level in range(_WHEELS):
+            if delta < _SLOTS**(level + 1):
+                slot = (timer.due // _SLOTS**level) % _SLOTS
+                self._wheels[level][slot].append(timer)
+                return
+        self._overflow.append(timer)
+
+    def _advance(self):
+        """moves the wheel one tick on, returns the timers due in it"""
+        self._tick += 1
+        tick = self._tick
+
+        # when a wheel comes round, the next slot of the wheel above it
+        # is spread over the wheels below, starting from the top
+        wrapped = [
+            level for level in range(1, _WHEELS)
+            if tick % _SLOTS**level == 0
+        ]
+        if len(wrapped) == _WHEELS - 1 and tick % _SLOTS**_WHEELS == 0:
+            overflow, self._overflow = self._overflow, list()
+            for timer in overflow:
+                self._insert(timer)
+        for level in reversed(wrapped):
+            slot = (tick // _SLOTS**level) % _SLOTS
+            timers, self._wheels[level][slot] = self._wheels[level][slot], []
+            for timer in timers:
+                self._insert(timer)
+
+        slot = tick % _SLOTS
+        due, self._wheels[0][slot] = self._wheels[0][slot], []
+        return [timer for timer in due if not timer.cancelled]
+
+    def tick(self):
+        """runs everything due up to now, called by the LoopingCall"""
+        target = int((self.clock() - self._origin) / self.resolution)
+        due = []
+        while self._tick < target:
+            due.extend(self._advance())
+        self.last_batch = len(due)
+        if not due:
+            return 0
+
+        groups = OrderedDict()
+        for timer in due:
+            groups.setdefault(timer.group, []).append(timer)
+        for group, timers in groups.items():
+            factory, each = self._batches.get(group, (None, None))
+            if factory is None:
+                self._run(timers)
+                continue
+            try:
+                with factory():
+                    self._run(timers, each)
+            except Exception:
+                logger.log_trace(f"scheduler batch {group} failed")
+        return len(due)
+
+    def _run(self, timers, each=None):
+        for timer in timers:
+            if timer.interval is None:
+                self._timers.pop(timer.key, None)
+            else:
+                # after a stall, runs missed are not made up for
+                timer.due = max(timer.due + timer.interval, self._tick + 1)
+                self._insert(timer)
+
+            start = time.perf_counter()
+            try:
+                if each is None:
+                    timer.callback(*timer.args, **timer.kwargs)
+                else:
+                    with each():
+                        timer.callback(*timer.args, **timer.kwargs)
+            except Exception:
+                logger.log_trace(f"scheduled {timer.name} failed")
+            spent = time.perf_counter() - start
+
+            cost = self.costs.setdefault(timer.name, [0, 0.0, 0.0])
+            cost[0] += 1
+            cost[1] += spent
+            cost[2] = max(cost[2], spent)
+
+    # inspection
+
+    def depth(self):
+        """number of timers waiting"""
+        return len(self._timers)
+
+    def slot_depths(self):
+        """timers waiting in each wheel, and past the last one"""
+        depths = [sum(len(slot) for slot in wheel) for wheel in self._wheels]
+        return depths + [len(self._overflow)]
+
+    # driving
+
+    def start(self):
+        """starts ticking from the reactor"""
+        from twisted.internet.task import LoopingCall
+        if self._loop is not None and self._loop.running:
+            return
+        self._origin = self.clock() - self._tick * self.resolution
+        self._loop = LoopingCall(self.tick)
+        self._loop.start(self.resolution, now=False)
+
+    def stop(self):
+        if self._loop is not None and self._loop.running:
+            self._loop.stop()
+        self._loop = None
+
+
+SCHEDULER = Scheduler()
@@ -171,7 +171,7 @@ class SkillDB(Script):
 
     def add(self, skill: Skill):
         self.db.skills[skill.name] = skill
-        self.skills.update()
+        self.skills.reload()
 
     def __getitem__(self, key):
         if key in self.skills.all():
@@ -1,18 +1,92 @@
+import pickle
+from enum import Enum
+from functools import partial
+
+from django.db import transaction
+from evennia import logger
+from evennia.utils.dbserialize import deserialize
+
+# values a field can't be changed in place through
+_IMMUTABLE = (int, float, str, bytes, tuple, frozenset, Enum, type(None))
+
+# handlers with fields marked dirty or a write not committed yet, and
+# handlers that handed out a field that can be changed in place since the
+# last flush_changed()
+_DIRTY = set()
+_TOUCHED = set()
+
+# assignments to handler fields, the Attribute writes they turned into,
+# and the saves that found nothing to write
+WRITE_STATS = {'assignments': 0, 'writes': 0, 'clean': 0}
+
+
+def write_stats():
+    """counters of StorageHandler writes, and how many were saved"""
+    stats = dict(WRITE_STATS)
+    stats['avoided'] = stats['assignments'] - stats['writes']
+    return stats
+
+
+def flush_changed():
+    """
+    writes back every handler changed since the last call, whoever it is
+    on. Runs after every command, on the save timer and at server stop.
+    Returns the number of handlers written.
+    """
+    handlers = list(_DIRTY | _TOUCHED)
+    _TOUCHED.clear()
+    written = 0
+    for handler in handlers:
+        if getattr(handler.caller, 'pk', 0) is None:
+            _DIRTY.discard(handler)  # deleted since
+            continue
+        try:
+            # dirty handlers are written without comparing
+            if handler.flush(check=True):
+                written += 1
+            else:
+                _DIRTY.discard(handler)
+        except Exception:
+            # stays dirty, tried again next time
+            logger.log_trace(f"could not write back {handler}")
+    return written
+
+
 class StorageHandler:
+    """
+    Fields of the handler are stored as a dict in the Attribute
+    `__attr_name__` of caller.
+
+    The dict is read once into a live copy, assigning a field only marks
+    it dirty. flush() writes the dict back if anything changed. Handlers
+    marked dirty are written by flush_changed(), after every command and
+    on the save timer, whichever object they are on. Fields changed in
+    place, not through assignment, are marked with mark_dirty(), or found
+    by flush(check=True) comparing the dict to what was last written,
+    which flush_changed() does for handlers that handed such a field out.
+
+    A write only counts once its transaction commits, a handler whose
+    write was rolled back stays dirty and is written again.
+    """
     __attr_name__ = ""
+    __internal__ = ('caller', '_state', '_dirty', '_written')
 
     def __init__(self, caller):
-        self.caller = caller
-        self.name = self.__attr_name__
+        object.__setattr__(self, 'caller', caller)
+        object.__setattr__(self, '_state', None)
+        object.__setattr__(self, '_dirty', set())
+        object.__setattr__(self, '_written', None)
+        if self._load().get('name') != self.__attr_name__:
+            self.name = self.__attr_name__
         self.init()
 
     def __setattr__(self, name, value):
-        super().__setattr__(name, value)
-        if name not in ['caller']:
-            _v = self.caller.attributes.get(self.__attr_name__, default={})
-            # print(type(_v), type(name), type(value))
-            _v[name] = value
-            self.caller.attributes.add(self.__attr_name__, _v)
+        if name in self.__internal__:
+            super().__setattr__(name, value)
+            return
+        # only kept in the dict, reads go through __getattr__
+        self._load()[name] = value
+        self.mark_dirty(name)
 
     def __str__(self):
         return f"{self.__attr_name__} on ({self.caller})"
@@ -21,19 +95,92 @@ class StorageHandler:
         return str(self)
 
     def __getattr__(self, name):
+        if name in self.__internal__:
+            raise AttributeError(name)
         try:
-            return self.caller.attributes.get(self.__attr_name__,
-                                              default={})[name]
+            value = self._load()[name]
         except KeyError:
             return None
+        if not isinstance(value, _IMMUTABLE):
+            _TOUCHED.add(self)
+        return value
+
+    def _load(self):
+        state = self.__dict__['_state']
+        if state is None:
+            state = deserialize(
+                self.caller.attributes.get(self.__attr_name__, default={}))
+            object.__setattr__(self, '_state', state)
+            object.__setattr__(self, '_written', self._snapshot())
+        return state
+
+    def _snapshot(self):
+        try:
+            return pickle.dumps(self._state, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return None  # can't tell, always counts as changed
+
+    @property
+    def dirty(self):
+        return bool(self._dirty)
+
+    def changed(self):
+        """whether the fields differ from what was last written"""
+        if self._dirty:
+            return True
+        if self._state is None:
+            return False
+        written = self._written
+        return written is None or written != self._snapshot()
+
+    def mark_dirty(self, name):
+        self._dirty.add(name)
+        _DIRTY.add(self)
+        WRITE_STATS['assignments'] += 1
+
+    def flush(self, force=False, check=False):
+        """
+        writes the fields back if any were marked dirty, returns if it did
+
+        Args:
+            force: write even if nothing changed
+            check: also look for fields changed in place
+        """
+        if not (force or self._dirty):
+            if not (check and self.changed()):
+                if check:
+                    WRITE_STATS['clean'] += 1
+                return False
+        state = self._load()
+        self.caller.attributes.add(self.__attr_name__, state)
+        _DIRTY.add(self)  # until the write is committed
+        transaction.on_commit(
+            partial(self._committed, set(self._dirty), self._snapshot()))
+        WRITE_STATS['writes'] += 1
+        return True
+
+    def _committed(self, names, written):
+        """the write of fields names, and of state written, was committed"""
+        self._dirty.difference_update(names)
+        object.__setattr__(self, '_written', written)
+        if not self._dirty:
+            _DIRTY.discard(self)
+
+    def reload(self):
+        """drops the live copy, for when the Attribute was written directly"""
+        object.__setattr__(self, '_state', None)
+        object.__setattr__(self, '_written', None)
+        self._dirty.clear()
+        _DIRTY.discard(self)
+        _TOUCHED.discard(self)
 
     def init(self):
         pass
 
     def all(self, return_obj=False):
         if not return_obj:
-            return list(self.caller.attributes.get(self.__attr_name__).keys())
-        objs = list(self.caller.attributes.get(self.__attr_name__).values())
+            return list(self._load().keys())
+        objs = list(self._load().values())
         return [x for x in objs if x != self.__attr_name__]
 
     def get(self, name):
@@ -0,0 +1,44 @@
+"""
+Benchmark of Wormy map generation on a looping grid of rooms, every room
+is linked both ways to its neighbours. The time per room crawled stays
+flat as the map grows, the cost is linear in the rooms on the map.
+Maps served from the map cache are timed separately.
+
+Usage (world.map needs evennia set up, so from the game directory):
+    evennia shell -c "from world.unittests.bench_map import main; main()"
+"""
+import time
+
+from world.graph import RoomGraph
+from world.map import MAP_CACHE, Wormy
+from world.unittests.test_map import FakeCaller, looping_grid
+
+
+def bench(graph, center, size, repeat, cached=False):
+    elapsed = 0
+    for _ in range(repeat):
+        if not cached:
+            MAP_CACHE.clear()
+        start = time.perf_counter()
+        wormy = Wormy(FakeCaller(center), size, size, graph=graph)
+        wormy.generate_map()
+        elapsed += time.perf_counter() - start
+    return wormy.crawled, elapsed / repeat
+
+
+def main(width=50, repeat=20):
+    graph = RoomGraph(looping_grid(width))
+    center = (width // 2) * width + width // 2 + 1
+
+    print(f"{width}x{width} looping grid")
+    print(f"{'map size':>8} {'rooms':>8} {'ms/map':>10} {'us/room':>10} "
+          f"{'ms cached':>10}")
+    for size in (5, 9, 15, 25, 49, 2 * width - 1):
+        crawled, elapsed = bench(graph, center, size, repeat)
+        _, cached = bench(graph, center, size, repeat, cached=True)
+        print(f"{size:>8} {crawled:>8} {elapsed * 1000:>10.3f} "
+              f"{elapsed / crawled * 1e6:>10.2f} {cached * 1000:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""
+Benchmark of loading blueprint databases from the json dumps
+vs the binary snapshots, on a synthetic world. Besides opening and
+decoding the files, it times the dbload path: every blueprint read and
+pickled for the database __batch__ at a time, like
+BlueprintShards.replace() does (the queries themselves aren't timed),
+along with the memory it peaked at.
+
+Usage:
+    python -m world.unittests.bench_snapshot
+    python -m world.unittests.bench_snapshot --rooms 1000 --objs 500
+"""
+import argparse
+import copy
+import json
+import pathlib
+import pickle
+import tempfile
+import time
+import tracemalloc
+from itertools import islice
+
+from world.utils.dbio import load_blueprints
+from world.utils.snapshot import BlueprintSnapshot, write_snapshot
+
+# kept in step with DEFAULT_ROOM_STRUCT/DEFAULT_OBJ_STRUCT in world.globals,
+# which can't be imported without evennia
+ROOM_STRUCT = {
+    "name": "an unfinished room",
+    "zone": "null",
+    "desc": "You are in an unfinished room.",
+    'flags': [],
+    'type': "inside",
+    'exits': {
+        'north': -1,
+        'south': -1,
+        'east': -1,
+        'west': -1,
+        'up': -1,
+        'down': -1
+    },
+    'edesc': {},
+    "load_list": "",
+    "extra": {}
+}
+
+OBJ_STRUCT = {
+    "key": "an unfinshed object",
+    "sdesc": "an unfinshed object",
+    "ldesc": "an unfinished object is lying here",
+    "edesc": "",
+    "adesc": None,
+    "type": "default",
+    "weight": 0,
+    "cost": 0,
+    "level": 0,
+    "applies": [],
+    "tags": [],
+    "extra": {},
+    "zone": None
+}
+
+
+def make_rooms(count, width=100):
+    rooms = dict()
+    for vnum in range(1, count + 1):
+        room = copy.deepcopy(ROOM_STRUCT)
+        room['name'] = f"a synthetic room {vnum}"
+        room['zone'] = f"zone{vnum // 1000}"
+        room['desc'] = f"Room {vnum} of a large grid. " * 4
+        room['exits']['east'] = vnum + 1 if vnum % width else -1
+        room['exits']['west'] = vnum - 1 if (vnum - 1) % width else -1
+        room['exits']['north'] = vnum + width if vnum + width <= count else -1
+        room['exits']['south'] = vnum - width if vnum > width else -1
+        rooms[vnum] = room
+    return rooms
+
+
+def make_objs(count):
+    objs = dict()
+    for vnum in range(1, count + 1):
+        obj = copy.deepcopy(OBJ_STRUCT)
+        obj['key'] = f"object {vnum}"
+        obj['sdesc'] = f"a synthetic object {vnum}"
+        obj['type'] = ('equipment', 'weapon', 'default')[vnum % 3]
+        obj['weight'] = vnum % 50
+        obj['cost'] = vnum % 1000
+        obj['tags'] = ['synthetic']
+        obj['zone'] = f"zone{vnum // 1000}"
+        objs[vnum] = obj
+    return objs
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def load_json(path, struct):
+    with open(path) as f:
+        records, _ = load_blueprints(f, struct)
+    return records
+
+
+def load_snapshot(path, touch):
+    """opens a snapshot and decodes `touch` blueprints of it"""
+    with BlueprintSnapshot(path) as snapshot:
+        for vnum in list(snapshot)[:touch]:
+            snapshot[vnum]
+        return len(snapshot)
+
+
+# BlueprintShards.__batch__, typeclasses.scripts needs evennia
+BATCH = 1000
+
+
+def write_db(records):
+    """pickles records in batches, as they're written to the database"""
+    items = iter(records.items())
+    written = 0
+    while True:
+        batch = [pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+                 for _, record in islice(items, BATCH)]
+        if not batch:
+            return written
+        written += len(batch)
+
+
+def dbload_json(path, struct):
+    return write_db(load_json(path, struct))
+
+
+def dbload_snapshot(path, lazy):
+    """dbload from a snapshot, decoded all up front or as written"""
+    with BlueprintSnapshot(path, keep=not lazy) as snapshot:
+        return write_db(snapshot if lazy else dict(snapshot))
+
+
+def profiled(func, *args):
+    """seconds func took, and the most memory it used in mb"""
+    tracemalloc.start()
+    try:
+        _, seconds = timed(func, *args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak / 2**20
+
+
+def bench(name, records, struct, directory):
+    json_path = directory / f"{name}.json"
+    snap_path = directory / f"{name}.snap"
+    with open(json_path, 'w') as f:
+        f.write(json.dumps(records, indent=2))
+    write_snapshot(snap_path, records)
+
+    _, json_time = timed(load_json, json_path, struct)
+    _, lazy_time = timed(load_snapshot, snap_path, 0)
+    _, full_time = timed(load_snapshot, snap_path, len(records))
+
+    print(f"{name:<6} {len(records):>8} "
+          f"{json_path.stat().st_size / 2**20:>8.1f}mb "
+          f"{snap_path.stat().st_size / 2**20:>8.1f}mb "
+          f"{json_time:>9.3f}s {lazy_time:>9.3f}s {full_time:>9.3f}s")
+    return json_path, snap_path
+
+
+def bench_dbload(name, struct, json_path, snap_path):
+    for source, func, args in (
+        ('json', dbload_json, (json_path, struct)),
+        ('snap', dbload_snapshot, (snap_path, False)),
+        ('lazy', dbload_snapshot, (snap_path, True)),
+    ):
+        seconds, peak = profiled(func, *args)
+        print(f"{name:<6} {source:<6} {seconds:>9.3f}s {peak:>9.1f}mb")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rooms', type=int, default=100000)
+    parser.add_argument('--objs', type=int, default=50000)
+    args = parser.parse_args()
+
+    print(f"{'db':<6} {'records':>8} {'json':>10} {'snapshot':>10} "
+          f"{'json load':>10} {'snap open':>10} {'snap all':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = pathlib.Path(tmp)
+        paths = {
+            'rooms': bench('rooms', make_rooms(args.rooms), ROOM_STRUCT,
+                           directory),
+            'objs': bench('objs', make_objs(args.objs), OBJ_STRUCT,
+                          directory),
+        }
+
+        print(f"\ndbload (tracemalloc slows it down)\n"
+              f"{'db':<6} {'from':<6} {'time':>10} {'peak':>10}")
+        bench_dbload('rooms', ROOM_STRUCT, *paths['rooms'])
+        bench_dbload('objs', OBJ_STRUCT, *paths['objs'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+from unittest import TestCase
+
+from typeclasses.scripts import BlueprintStore, EntityDB
+from world import atlas as atlases
+from world.atlas import ZoneAtlas, get_atlas, layout_zone
+from world.graph import RoomGraph
+from world.scheduler import SCHEDULER
+from world.unittests.test_graph import make_room
+from world.unittests.test_map import looping_grid
+
+
+class TestLayout(TestCase):
+    def setUp(self):
+        # 1 - 2     5 (up from 2)    6 - 7 (not linked to the rest)
+        # |
+        # 3 - 4 - 9 (zone cave)
+        self.store = BlueprintStore(
+            {
+                1: make_room('town', east=2, south=3),
+                2: make_room('town', west=1, up=5),
+                3: make_room('town', north=1, east=4),
+                4: make_room('town', west=3, east=9),
+                5: make_room('town', down=2),
+                6: make_room('town', east=7),
+                7: make_room('town', west=6),
+                9: make_room('cave', west=4),
+            }, EntityDB.__indexes__)
+        self.graph = RoomGraph.from_store(self.store)
+
+    def test_coordinates(self):
+        coords, problems = layout_zone(self.graph, 'town')
+        self.assertListEqual(problems, [])
+        self.assertEqual(coords[1], (0, 0, 0))
+        self.assertEqual(coords[2], (1, 0, 0))
+        self.assertEqual(coords[3], (0, 1, 0))
+        self.assertEqual(coords[4], (1, 1, 0))
+        self.assertEqual(coords[5], (1, 0, 1))
+        self.assertNotIn(9, coords)
+
+        # parts not linked to the rest are placed to the side
+        self.assertEqual(coords[6], (3, 0, 0))
+        self.assertEqual(coords[7], (4, 0, 0))
+
+    def test_inconsistent_exits(self):
+        # 4 north leads back to 1, which already sits north of 3
+        self.store[4] = make_room('town', west=3, north=1)
+        coords, problems = layout_zone(self.graph, 'town')
+        self.assertEqual(len(problems), 1)
+        self.assertIn("exit north of 4 leads to 1", problems[0])
+
+    def test_overlapping_rooms(self):
+        # 8 south of 2 lands on 4
+        self.store[2] = make_room('town', west=1, south=8)
+        self.store[8] = make_room('town')
+        coords, problems = layout_zone(self.graph, 'town')
+        self.assertEqual(coords[8], coords[4])
+        self.assertIn("rooms 4 and 8 both sit at (1, 1, 0)", problems)
+
+    def test_layers(self):
+        atlas = ZoneAtlas.build(self.graph, 'town')
+        self.assertListEqual(atlas.layers, [0, 1])
+        self.assertEqual(atlas.cell_of(5), (1, 0, 2))
+
+        upstairs = atlas.window(5, 3, 3).splitlines()
+        self.assertEqual(upstairs[1], "   |c[|M@|n|c]|n   ")
+        self.assertIn('‾', upstairs[2])
+
+    def test_as_dict_round_trip(self):
+        atlas = ZoneAtlas.build(self.graph, 'town')
+        loaded = ZoneAtlas.from_dict(atlas.as_dict())
+        self.assertDictEqual(loaded.coords, atlas.coords)
+        self.assertEqual(loaded.window(1, 5, 5), atlas.window(1, 5, 5))
+        self.assertEqual(loaded.signature, atlas.signature)
+
+
+class TestAtlasCache(TestCase):
+    def setUp(self):
+        self.store = BlueprintStore(
+            {
+                1: make_room('town', east=2),
+                2: make_room('town', west=1),
+            }, EntityDB.__indexes__)
+        self.graph = RoomGraph.from_store(self.store)
+
+    def tearDown(self):
+        atlases._ATLASES.pop('town', None)
+        atlases._UNSAVED.discard('town')
+        SCHEDULER.cancel(('atlas', 'town'))
+
+    def test_stale_atlas_laid_out_later(self):
+        atlas = atlases._layout('town', self.graph)
+        self.assertIn('town', atlases._UNSAVED)
+        self.assertIs(get_atlas('town', self.graph), atlas)
+
+        # a new room doesn't hold up whoever is looking
+        self.store[3] = make_room('town', west=2)
+        self.assertIs(get_atlas('town', self.graph), atlas)
+        self.assertIn(('atlas', 'town'), SCHEDULER)
+        self.assertIsNone(atlas.cell_of(3))
+
+
+class TestAtlasWindow(TestCase):
+    def setUp(self):
+        self.graph = RoomGraph(looping_grid(20))
+        self.atlas = ZoneAtlas.build(self.graph, 'grid')
+
+    def test_spans_tiles(self):
+        self.assertListEqual(self.atlas.problems, [])
+        self.assertEqual(self.atlas.shape, (39, 39))
+        self.assertGreater(len(self.atlas.tiles), 1)
+
+        # room 190 is drawn at cell (18, 18), across four tiles
+        lines = self.atlas.window(190, 9, 9).splitlines()
+        self.assertEqual(len(lines), 9)
+        self.assertTrue(all('[' in line for line in lines[::2]))
+        self.assertIn('@', lines[4])
+
+    def test_edge_of_zone(self):
+        lines = self.atlas.window(1, 5, 5).splitlines()
+        self.assertEqual(lines[0], " " * 15)
+        self.assertTrue(lines[2].startswith(" " * 6 + "|c[|M@"))
+
+    def test_render_layer(self):
+        lines = self.atlas.render_layer(0, 1).splitlines()
+        self.assertEqual(len(lines), 39)
+        self.assertIn('@', lines[0])
+        self.assertIsNone(self.atlas.window(404, 5, 5))
@@ -0,0 +1,162 @@
+from types import SimpleNamespace
+from unittest import TestCase, mock
+
+import numpy as np
+from typeclasses.characters import AttrHandler
+from world.attributes import Attribute, VitalAttribute
+from world.characteristics import AgiChar, EndChar, IntChar, StrChar, WpChar
+from world.unittests.test_storagehandler import FakeCaller
+
+
+class FakeCharacter(FakeCaller):
+    def __init__(self):
+        super().__init__()
+        self.stats = SimpleNamespace(str=StrChar(base=40),
+                                     end=EndChar(base=40),
+                                     agi=AgiChar(base=40),
+                                     int=IntChar(base=40),
+                                     wp=WpChar(base=40))
+        self.attrs = AttrHandler(self)
+        self.attrs.set('level', Attribute('level', 10))
+        for name in ('health', 'magicka', 'stamina', 'speed', 'carry'):
+            self.attrs.set(name, VitalAttribute(name))
+
+
+class TestAttrMaxima(TestCase):
+    def setUp(self):
+        self.ch = FakeCharacter()
+        self.ch.attrs.update()
+
+    def test_not_recomputed_without_changes(self):
+        health = self.ch.attrs.health.max
+        with mock.patch('typeclasses.characters.np.log',
+                        wraps=np.log) as log:
+            self.ch.attrs.update()
+        self.assertEqual(log.call_count, 0)
+        self.assertEqual(self.ch.attrs.health.max, health)
+
+    def test_recomputed_when_inputs_change(self):
+        health = self.ch.attrs.health.max
+        stamina = self.ch.attrs.stamina.max
+        magicka = self.ch.attrs.magicka.max
+
+        self.ch.stats.end.base += 20
+        self.ch.attrs.update()
+        self.assertGreater(self.ch.attrs.health.max, health)
+        self.assertGreater(self.ch.attrs.stamina.max, stamina)
+        self.assertEqual(self.ch.attrs.magicka.max, magicka)
+
+        self.ch.attrs.modify_vital('magicka', by=5)
+        self.assertEqual(self.ch.attrs.magicka.max, magicka + 5)
+
+        self.ch.attrs.level.value = 20
+        self.ch.attrs.update()
+        self.assertGreater(self.ch.attrs.magicka.max, magicka + 5)
+
+
+@mock.patch('world.attributes.time.time')
+class TestVitalRegen(TestCase):
+    def test_regenerates_on_read(self, now):
+        now.return_value = 1000.0
+        vital = VitalAttribute('health')
+        vital.max = 100
+        vital.cur = 10
+        vital.regen = 2.0
+
+        now.return_value = 1010.0
+        self.assertEqual(vital.cur, 30)
+        now.return_value = 2000.0
+        self.assertEqual(vital.cur, 100)
+
+    def test_settle_before_changes(self, now):
+        now.return_value = 1000.0
+        vital = VitalAttribute('health')
+        vital.max = 100
+        vital.cur = 100
+        vital.regen = 1.0
+
+        # time spent full doesn't count once max goes up
+        now.return_value = 1050.0
+        vital.settle()
+        vital.max = 200
+        now.return_value = 1060.0
+        self.assertEqual(vital.cur, 110)
+
+        vital.cur -= 60
+        self.assertEqual(vital.cur, 50)
+
+    def test_old_vitals_load(self, now):
+        now.return_value = 1000.0
+        vital = VitalAttribute.__new__(VitalAttribute)
+        vital.__setstate__({'name': 'health', 'cur': 7, 'max': 10,
+                            'mod': [], 'rate': 1.0, 'rate_mod': 0.0})
+        self.assertEqual(vital.cur, 7)
+        self.assertEqual(vital.regen, 0.0)
+
+    def test_handler_regen(self, now):
+        now.return_value = 1000.0
+        ch = FakeCharacter()
+        ch.attrs.update()
+        ch.attrs.health.cur = 0
+        ch.attrs.start_regen()
+        ch.attrs.flush()
+
+        now.return_value = 1100.0
+        self.assertGreater(ch.attrs.health.cur, 0)
+        self.assertEqual(ch.attrs.carry.regen, 0.0)
+        self.assertFalse(ch.attrs.dirty)
+
+        ch.attrs.stop_regen()
+        cur = ch.attrs.health.cur
+        now.return_value = 1200.0
+        self.assertEqual(ch.attrs.health.cur, cur)
+
+    def test_regen_left_running_by_a_crash(self, now):
+        now.return_value = 1000.0
+        ch = FakeCharacter()
+        ch.attrs.update()
+        ch.attrs.health.cur = 0
+        ch.attrs.start_regen()
+
+        # server went down at 1010 without stopping it, back at 5000
+        now.return_value = 5000.0
+        with mock.patch('typeclasses.characters._STARTED', 4990.0):
+            ch.attrs.start_regen()
+        self.assertEqual(ch.attrs.health.cur, 0)
+        self.assertGreater(ch.attrs.health.regen, 0)
+
+    def test_until_full(self, now):
+        now.return_value = 1000.0
+        ch = FakeCharacter()
+        ch.attrs.update()
+        health = ch.attrs.health
+        health.cur = health.max
+        self.assertEqual(ch.attrs.until_full('health'), 0)
+
+        health.cur = health.max - 10
+        self.assertIsNone(ch.attrs.until_full('health'))
+        health.regen = 2.0
+        self.assertEqual(ch.attrs.until_full('health'), 5.0)
+        now.return_value = 1005.0
+        self.assertEqual(ch.attrs.until_full('health'), 0)
+
+    def test_regen_over_a_reload(self, now):
+        now.return_value = 1000.0
+        ch = FakeCharacter()
+        ch.attrs.update()
+        ch.attrs.health.cur = 0
+        ch.attrs.start_regen()
+        per_second = ch.attrs.regen_per_second()
+
+        # reloaded at 1100, back up at 1200
+        now.return_value = 1100.0
+        ch.attrs.settle_regen()
+        before = ch.attrs.health.cur
+        self.assertEqual(before, int(100 * per_second))
+        now.return_value = 1200.0
+        with mock.patch('typeclasses.characters._STARTED', 1190.0):
+            ch.attrs.start_regen()
+        self.assertEqual(ch.attrs.health.cur, before)
+
+        now.return_value = 1300.0
+        self.assertGreater(ch.attrs.health.cur, before)
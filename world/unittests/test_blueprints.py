@@ -0,0 +1,141 @@
+import copy
+from types import SimpleNamespace
+from unittest import TestCase
+
+from typeclasses.scripts import BlueprintShards, EntityDB
+
+
+class FakeAttribute:
+    def __init__(self, key, value, category):
+        self.key = key
+        self.category = category
+        self.db_value = copy.deepcopy(value)  # as stored, before decoding
+        self.decoded = False
+
+    @property
+    def value(self):
+        self.decoded = True
+        return self.db_value
+
+
+class FakeAttributeHandler:
+    """the parts of evennia's AttributeHandler the blueprint dbs use"""
+    def __init__(self):
+        self.attrs = dict()  # (key, category) -> FakeAttribute
+        self.queries = 0
+
+    def has(self, key, category=None):
+        return (key, category) in self.attrs
+
+    def get(self,
+            key=None,
+            default=None,
+            category=None,
+            return_obj=False,
+            return_list=False):
+        if key is None:
+            attrs = [
+                attr for (_, cat), attr in self.attrs.items()
+                if cat == category
+            ]
+            return attrs if return_obj else [attr.value for attr in attrs]
+        attr = self.attrs.get((key, category))
+        if attr is None:
+            return default
+        return attr if return_obj else attr.value
+
+    def add(self, key, value, category=None):
+        self.batch_add((key, value, category))
+
+    def batch_add(self, *args):
+        self.queries += 1
+        for key, value, category in args:
+            self.attrs[(key, category)] = FakeAttribute(key, value, category)
+
+    def remove(self, key, category=None):
+        self.attrs.pop((key, category), None)
+
+    def clear(self, category=None):
+        for key in [key for key in self.attrs if key[1] == category]:
+            del self.attrs[key]
+
+    def keys(self, category):
+        return sorted(key for key, cat in self.attrs if cat == category)
+
+
+def make_room(name):
+    return {'name': name, 'zone': 'town', 'exits': {'north': -1}}
+
+
+class TestBlueprintShards(TestCase):
+    def setUp(self):
+        self.obj = SimpleNamespace(attributes=FakeAttributeHandler())
+        self.shards = BlueprintShards(self.obj, 'blueprint')
+
+    def test_round_trip(self):
+        self.shards.batch_set({1: make_room('one'), 2: make_room('two')})
+        self.assertEqual(self.obj.attributes.queries, 1)
+        self.assertListEqual(self.obj.attributes.keys('blueprint'),
+                             ['1', '2'])
+
+        # loaded again after a restart, nothing is decoded until read
+        attrs = self.obj.attributes.attrs
+        for attr in attrs.values():
+            attr.decoded = False
+        shards = BlueprintShards(self.obj, 'blueprint')
+        self.assertListEqual(sorted(shards), [1, 2])
+        self.assertDictEqual(shards.raw(1), make_room('one'))
+        self.assertFalse(attrs[('1', 'blueprint')].decoded)
+        self.assertDictEqual(shards[2], make_room('two'))
+        self.assertTrue(attrs[('2', 'blueprint')].decoded)
+        self.assertDictEqual(shards.raw(2), make_room('two'))
+
+    def test_set_and_delete(self):
+        self.shards[5] = make_room('five')
+        self.shards[6] = make_room('six')
+        del self.shards[5]
+        self.assertListEqual(self.obj.attributes.keys('blueprint'), ['6'])
+        self.assertDictEqual(
+            dict(BlueprintShards(self.obj, 'blueprint').items()),
+            {6: make_room('six')})
+
+    def test_replace(self):
+        self.shards.batch_set({1: make_room('one'), 2: make_room('two')})
+        self.obj.attributes.add('other', 1, category='blueprint_meta')
+        self.obj.attributes.queries = 0
+
+        self.shards.__batch__ = 2
+        records = {vnum: make_room(str(vnum)) for vnum in (2, 3, 4, 5, 6)}
+        self.shards.replace(records)
+        self.assertEqual(self.obj.attributes.queries, 3)
+        self.assertListEqual(self.obj.attributes.keys('blueprint'),
+                             ['2', '3', '4', '5', '6'])
+        self.assertTrue(self.obj.attributes.has('other', 'blueprint_meta'))
+        self.assertDictEqual(dict(self.shards.items()), records)
+
+
+class TestVnumMigration(TestCase):
+    def setUp(self):
+        self.db = EntityDB()
+        self.db.attributes = FakeAttributeHandler()
+        self.db.ndb = SimpleNamespace(store=None)
+        self.legacy = {1: make_room('one'), 7: make_room('seven')}
+        self.db.attributes.add('vnum', self.legacy)
+
+    def test_migrates_once(self):
+        store = self.db.vnum
+        self.assertDictEqual(dict(store.peek_items()), self.legacy)
+        self.assertFalse(self.db.attributes.has('vnum'))
+        self.assertListEqual(self.db.attributes.keys('blueprint'),
+                             ['1', '7'])
+
+        # loaded again, e.g. after a reload
+        queries = self.db.attributes.queries
+        self.db.ndb.store = None
+        self.assertDictEqual(dict(self.db.vnum.peek_items()), self.legacy)
+        self.assertEqual(self.db.attributes.queries, queries)
+
+    def test_empty_legacy_db(self):
+        self.db.attributes.add('vnum', None)
+        self.assertEqual(len(self.db.vnum), 0)
+        self.assertFalse(self.db.attributes.has('vnum'))
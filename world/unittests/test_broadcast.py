@@ -0,0 +1,71 @@
+from unittest import TestCase
+
+from typeclasses.scripts import BlueprintStore, EntityDB
+from world.broadcast import Listeners
+from world.graph import RoomGraph
+from world.unittests.test_graph import make_room
+from world.unittests.test_map import FakeLocation
+
+
+class FakePC:
+    def __init__(self, vnum):
+        self.location = FakeLocation(str(vnum))
+
+    def move(self, vnum):
+        self.location = FakeLocation(str(vnum))
+
+
+class TestListeners(TestCase):
+    def setUp(self):
+        # 1 - 2 - 3 (town) - 4 (cave)
+        self.store = BlueprintStore(
+            {
+                1: make_room('town', east=2),
+                2: make_room('town', west=1, east=3),
+                3: make_room('town', west=2, east=4),
+                4: make_room('cave', west=3),
+            }, EntityDB.__indexes__)
+        graph = RoomGraph.from_store(self.store)
+        self.listeners = Listeners(graph=lambda: graph)
+
+        self.alice, self.bob = FakePC(1), FakePC(4)
+        self.listeners.enter(self.alice)
+        self.listeners.enter(self.bob)
+
+    def test_in_zone(self):
+        self.assertListEqual(self.listeners.in_zone('town'), [self.alice])
+        self.assertListEqual(self.listeners.in_zone('cave'), [self.bob])
+        self.assertListEqual(
+            self.listeners.in_zone('town', exclude=(self.alice, )), [])
+
+    def test_follows_moves(self):
+        self.bob.move(3)
+        self.listeners.enter(self.bob)
+        self.assertListEqual(self.listeners.in_zone('town'),
+                             [self.alice, self.bob])
+        self.assertListEqual(self.listeners.in_zone('cave'), [])
+
+        self.listeners.leave(self.alice)
+        self.assertListEqual(self.listeners.in_zone('town'), [self.bob])
+        self.assertEqual(len(self.listeners), 1)
+
+    def test_rooms_moved_to_another_zone(self):
+        room = self.store[3]
+        room['zone'] = 'cave'
+        self.store[3] = room
+        self.bob.move(3)
+        self.listeners.enter(self.bob)
+
+        room = self.store[1]
+        room['zone'] = 'cave'
+        self.store[1] = room
+        self.assertListEqual(self.listeners.in_zone('town'), [])
+        self.assertCountEqual(self.listeners.in_zone('cave'),
+                              [self.alice, self.bob])
+
+    def test_in_rooms_and_within(self):
+        self.assertListEqual(self.listeners.in_rooms([1, 2]), [self.alice])
+        self.assertListEqual(self.listeners.within(2, 1), [self.alice])
+        self.assertListEqual(self.listeners.within(2, 2),
+                             [self.alice, self.bob])
+        self.assertListEqual(self.listeners.within(1, 0), [self.alice])
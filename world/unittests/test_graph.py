@@ -0,0 +1,147 @@
+from unittest import TestCase
+
+from typeclasses.scripts import BlueprintStore, EntityDB
+from world.graph import RoomGraph
+from world.pathfinding import Pathfinder, ZoneRoutes
+
+
+def make_room(zone, **exits):
+    room = {
+        'zone': zone,
+        'exits': {
+            'north': -1,
+            'south': -1,
+            'east': -1,
+            'west': -1,
+            'up': -1,
+            'down': -1
+        }
+    }
+    room['exits'].update(exits)
+    return room
+
+
+class TestRoomGraph(TestCase):
+    def setUp(self):
+        self.store = BlueprintStore(
+            {
+                1: make_room('town', north=2, east=3),
+                2: make_room('town', south=1),
+                3: make_room('town', west=1, up=10),
+                10: make_room('sky'),
+                20: make_room('cave', down=21),
+                21: make_room('cave'),
+            }, EntityDB.__indexes__)
+        self.graph = RoomGraph.from_store(self.store)
+
+    def test_exits_and_neighbours(self):
+        self.assertDictEqual(self.graph.exits(1), {'north': 2, 'east': 3})
+        self.assertListEqual(sorted(self.graph.neighbours(3)), [1, 10])
+        self.assertListEqual(self.graph.neighbours(404), [])
+
+    def test_incoming(self):
+        self.assertListEqual(self.graph.incoming(1), [(2, 'south'),
+                                                      (3, 'west')])
+        self.assertListEqual(self.graph.incoming(10), [(3, 'up')])
+
+    def test_zone_rooms(self):
+        self.assertSetEqual(self.graph.zone_rooms('town'), {1, 2, 3})
+        self.assertEqual(self.graph.zone(20), 'cave')
+
+    def test_components(self):
+        self.assertListEqual(self.graph.components(), [{1, 2, 3, 10},
+                                                       {20, 21}])
+
+    def test_csr(self):
+        indptr, targets, directions = self.graph.csr()
+        idx = self.graph.index(1)
+        out = {
+            self.graph.vnum(t)
+            for t in targets[indptr[idx]:indptr[idx + 1]]
+        }
+        self.assertSetEqual(out, {2, 3})
+        self.assertEqual(len(targets), len(directions))
+
+    def test_follows_store_writes(self):
+        version = self.graph.version
+        town = self.graph.zone_version('town')
+
+        self.store[4] = make_room('town', south=2)
+        self.assertIn(4, self.graph)
+        self.assertListEqual(self.graph.incoming(2), [(1, 'north'),
+                                                      (4, 'south')])
+        self.assertGreater(self.graph.version, version)
+        self.assertGreater(self.graph.zone_version('town'), town)
+
+        del self.store[3]
+        self.assertNotIn(3, self.graph)
+        self.assertListEqual(self.graph.incoming(10), [])
+        self.assertListEqual(self.graph.neighbours(1), [2])
+        self.assertSetEqual(self.graph.zone_rooms('town'), {1, 2, 4})
+
+    def test_dangling_exit_resolves(self):
+        self.store[30] = make_room('cave', north=31)
+        self.assertListEqual(self.graph.neighbours(30), [])
+        self.store[31] = make_room('cave')
+        self.assertListEqual(self.graph.neighbours(30), [31])
+
+    def test_stale_on_replace(self):
+        self.store.replace({1: make_room('town')})
+        self.assertTrue(self.graph.stale)
+
+
+class TestPathfinding(TestCase):
+    def setUp(self):
+        # 1 - 2 - 3
+        # |       |
+        # 4 ----- 5 - 6 (zone cave)
+        self.store = BlueprintStore(
+            {
+                1: make_room('town', east=2, south=4),
+                2: make_room('town', west=1, east=3),
+                3: make_room('town', west=2, south=5),
+                4: make_room('town', north=1, east=5),
+                5: make_room('town', west=4, north=3, east=6),
+                6: make_room('cave', west=5),
+                7: make_room('town'),
+            }, EntityDB.__indexes__)
+        self.graph = RoomGraph.from_store(self.store)
+        self.paths = Pathfinder(graph=lambda: self.graph)
+
+    def test_find_path(self):
+        self.assertListEqual(self.paths.find_path(1, 6),
+                             ['south', 'east', 'east'])
+        self.assertListEqual(self.paths.find_path(1, 1), [])
+        self.assertIsNone(self.paths.find_path(1, 7))
+        self.assertIsNone(self.paths.find_path(1, 404))
+        self.assertIsNone(self.paths.find_path(1, 6, max_depth=2))
+
+    def test_weighted_path(self):
+        cost = lambda vnum: 10 if vnum == 4 else 1
+        self.assertListEqual(self.paths.find_path(1, 5, cost=cost),
+                             ['east', 'east', 'south'])
+
+    def test_zone_next_hops(self):
+        routes = self.paths.zone_routes('town')
+        self.assertEqual(routes.next_step(1, 5), 'south')
+        self.assertEqual(routes.steps(2, 4), 2)
+        self.assertIsNone(routes.steps(1, 7))
+        self.assertEqual(self.paths.next_step(6, 1), 'west')
+        self.assertEqual(self.paths.distance(1, 6), 3)
+
+    def test_zone_routes_kept_per_destination(self):
+        routes = ZoneRoutes(self.graph, 'town', kept=2)
+        self.assertEqual(routes.next_step(1, 5), 'south')
+        self.assertEqual(routes.next_step(5, 1), 'west')
+        self.assertEqual(routes.steps(5, 2), 2)
+        self.assertEqual(len(routes._routes), 2)
+        self.assertEqual(routes.next_step(2, 5), 'east')
+
+    def test_recomputed_when_exits_change(self):
+        routes = self.paths.zone_routes('town')
+        self.assertIs(self.paths.zone_routes('town'), routes)
+
+        self.store[1] = make_room('town', south=4)
+        self.assertIsNot(self.paths.zone_routes('town'), routes)
+        self.assertEqual(self.paths.next_step(1, 2), 'south')
+        self.assertEqual(self.paths.distance(1, 2), 4)
@@ -1,4 +1,5 @@
 from unittest import TestCase
+from world.graph import RoomGraph
 from world.map import Wormy
 
 
@@ -25,31 +26,108 @@ class TestWormy(TestCase):
 
     def test_map_grid_initialization(self):
         map_size_x, map_size_y = (5, 5)
-        grid = Wormy.initialize_grid_map(map_size_x, map_size_y)
-
-        expected_empty_grid_value = {
-            'symbol': '',
-            'up': False,
-            'down': False,
-            'south': False,
-            'east': False,
-            'west': False,
-            'north': False
-        }
-
-        self.assertEqual(len(grid), map_size_y)
-        self.assertEqual(len(grid[0]), map_size_x)
-        self.assertDictEqual(expected_empty_grid_value, grid[0][0])
-
-    def test_map_grid_distinct_grid_values(self):
-        """tests to make sure grid values are identically seperate dictionaries and not references"""
-        map_size_x, map_size_y = (9, 9)
-        grid = Wormy.initialize_grid_map(map_size_x, map_size_y)
-
-        grid_x_0 = grid[0][0]
-        grid_x_1 = grid[0][1]
-        grid_y_0 = grid[1][0]
-        grid_y_1 = grid[2][0]
-
-        self.assertIsNot(grid_x_0, grid_x_1)
-        self.assertIsNot(grid_y_0, grid_y_1)
+        grid = Wormy.initialize_grid(map_size_x, map_size_y)
+
+        self.assertEqual(grid.shape, (map_size_x, map_size_y))
+        self.assertTrue((grid.symbols == '').all())
+        self.assertFalse(grid.edges.any())
+        self.assertFalse(grid.vertical.any())
+
+    def test_map_grid_render(self):
+        grid = Wormy.initialize_grid(3, 3)
+        grid.symbols[0, 0] = '.'
+        grid.edges[0, 0] = 4  # east
+        grid.symbols[0, 2] = ','
+        lines = grid.render().splitlines()
+
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[0], "|c[.|c]|n---|c[,|c]|n")
+        self.assertEqual(lines[1], " " * 9)
+
+
+class FakeLocation:
+    def __init__(self, key):
+        self.key = key
+
+
+class FakeCaller:
+    def __init__(self, vnum):
+        self.location = FakeLocation(str(vnum))
+
+    def msg(self, text):
+        pass
+
+
+def looping_grid(width):
+    """width x width rooms, every room linked both ways to its neighbours"""
+    rooms = dict()
+    for row in range(width):
+        for col in range(width):
+            vnum = row * width + col + 1
+            rooms[vnum] = {
+                'zone': 'grid',
+                'type': 'field',
+                'exits': {
+                    'north': vnum - width if row > 0 else -1,
+                    'south': vnum + width if row < width - 1 else -1,
+                    'east': vnum + 1 if col < width - 1 else -1,
+                    'west': vnum - 1 if col > 0 else -1,
+                    'up': -1,
+                    'down': -1
+                }
+            }
+    return rooms
+
+
+class TestWormyCrawl(TestCase):
+    def setUp(self):
+        self.graph = RoomGraph(looping_grid(50))
+
+    def test_crawls_each_room_once(self):
+        center = 25 * 50 + 26
+        wormy = Wormy(FakeCaller(center), 5, 5, graph=self.graph)
+        map_string = wormy.generate_map()
+
+        # a 9x9 grid holds 5x5 rooms, everything else is skipped
+        self.assertEqual(wormy.crawled, 25)
+        self.assertEqual(map_string.count("[|g,|n|c]"), 24)
+        self.assertEqual(map_string.count("@"), 1)
+
+    def test_corner_stops_at_the_edge(self):
+        wormy = Wormy(FakeCaller(1), 5, 5, graph=self.graph)
+        wormy.generate_map()
+        self.assertEqual(wormy.crawled, 9)
+
+
+class TestMapCache(TestCase):
+    def setUp(self):
+        self.rooms = looping_grid(20)
+        self.graph = RoomGraph(self.rooms)
+        self.center = 10 * 20 + 11
+
+    def generate(self):
+        wormy = Wormy(FakeCaller(self.center), 5, 5, graph=self.graph)
+        return wormy, wormy.generate_map()
+
+    def test_reuses_map(self):
+        first, map_string = self.generate()
+        second, cached = self.generate()
+        self.assertEqual(first.crawled, 25)
+        self.assertEqual(second.crawled, 0)
+        self.assertEqual(cached, map_string)
+
+    def test_room_on_map_changed(self):
+        self.generate()
+        room = self.rooms[self.center + 1]
+        room['type'] = 'inside'
+        self.graph.set_room(self.center + 1, room)
+
+        wormy, map_string = self.generate()
+        self.assertEqual(wormy.crawled, 25)
+        self.assertIn("|n.|n", map_string)
+
+    def test_room_off_map_changed(self):
+        self.generate()
+        self.graph.set_room(1, self.rooms[1])
+        wormy, _ = self.generate()
+        self.assertEqual(wormy.crawled, 0)
@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+from unittest import TestCase, mock
+
+from world.occupancy import NPC, OBJ, PC, Occupancy
+
+
+class FakeObj:
+    def __init__(self, kind, look_index=0):
+        self.kind = kind
+        self.db = SimpleNamespace(look_index=look_index)
+
+
+class FakeRoom:
+    def __init__(self, *contents):
+        self.contents = list(contents)
+
+
+@mock.patch('world.occupancy.obj_kind', lambda obj: obj.kind)
+class TestOccupancy(TestCase):
+    def setUp(self):
+        self.pc = FakeObj(PC)
+        self.npc = FakeObj(NPC, look_index=2)
+        self.obj = FakeObj(OBJ, look_index=1)
+        self.room = FakeRoom(self.pc, self.npc, self.obj)
+
+    def test_partitions(self):
+        occupants = Occupancy(self.room)
+        self.assertListEqual(occupants.pcs(), [self.pc])
+        self.assertListEqual(occupants.npcs(), [self.npc])
+        self.assertListEqual(occupants.objs(), [self.obj])
+        self.assertListEqual(occupants.pcs(exclude=(self.pc, )), [])
+
+    def test_by_look_index(self):
+        occupants = Occupancy(self.room)
+        self.assertListEqual(occupants.by_look_index(),
+                             [(PC, self.pc), (OBJ, self.obj),
+                              (NPC, self.npc)])
+
+    def test_follows_moves(self):
+        occupants = Occupancy(self.room)
+        other = FakeObj(PC)
+
+        self.room.contents.append(other)
+        occupants.add(other)
+        self.room.contents.remove(self.pc)
+        occupants.discard(self.pc)
+
+        self.assertListEqual(occupants.pcs(), [other])
+        self.assertEqual(occupants.rebuilds, 1)
+
+    def test_rebuilds_when_out_of_step(self):
+        occupants = Occupancy(self.room)
+        other = FakeObj(NPC)
+
+        # created in the room, no hook called
+        self.room.contents.append(other)
+        self.assertListEqual(occupants.npcs(), [self.npc, other])
+        self.assertEqual(occupants.rebuilds, 2)
+
+        # location set to None directly, no hook called
+        self.room.contents.remove(self.pc)
+        self.assertListEqual(occupants.pcs(), [])
+
+    def test_rebuilds_when_swapped_without_hooks(self):
+        occupants = Occupancy(self.room)
+        other = FakeObj(PC)
+
+        # pc deleted, other created in the room, neither called a hook
+        self.room.contents.remove(self.pc)
+        self.room.contents.append(other)
+        self.assertListEqual(occupants.pcs(), [other])
+        self.assertEqual(occupants.rebuilds, 2)
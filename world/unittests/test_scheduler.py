@@ -0,0 +1,127 @@
+from contextlib import contextmanager, nullcontext
+from unittest import TestCase
+
+from world.scheduler import Scheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestScheduler(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = Scheduler(clock=self.clock)
+        self.calls = []
+
+    def advance(self, seconds, step=1):
+        for _ in range(int(seconds / step)):
+            self.clock.now += step
+            self.scheduler.tick()
+
+    def record(self, name):
+        self.calls.append((name, int(self.clock.now - 1000)))
+
+    def test_call_later(self):
+        self.scheduler.call_later(3, self.record, 'b')
+        self.scheduler.call_later(1, self.record, 'a')
+        self.advance(5)
+        self.assertListEqual(self.calls, [('a', 1), ('b', 3)])
+        self.assertEqual(self.scheduler.depth(), 0)
+
+    def test_long_delays_cascade(self):
+        for delay in (70, 4095, 4100, 300000):
+            self.scheduler.call_later(delay, self.record, delay)
+        self.assertListEqual(self.scheduler.slot_depths(), [0, 2, 1, 1])
+
+        self.advance(300000, step=5)
+        self.assertListEqual(self.calls, [(70, 70), (4095, 4095),
+                                          (4100, 4100), (300000, 300000)])
+
+    def test_every_and_cancel(self):
+        self.scheduler.every(10, self.record, 'save', key='save',
+                             stagger=False)
+        self.advance(30)
+        self.assertListEqual(self.calls, [('save', 10), ('save', 20),
+                                          ('save', 30)])
+
+        self.assertTrue(self.scheduler.cancel('save'))
+        self.assertFalse(self.scheduler.cancel('save'))
+        self.advance(30)
+        self.assertEqual(len(self.calls), 3)
+
+    def test_key_replaces(self):
+        self.scheduler.call_later(5, self.record, 'old', key='k')
+        self.scheduler.call_later(2, self.record, 'new', key='k')
+        self.advance(10)
+        self.assertListEqual(self.calls, [('new', 2)])
+
+    def test_stagger_spreads(self):
+        for i in range(60):
+            self.scheduler.every(60, self.record, i, key=i)
+        self.advance(60)
+        seconds = [when for _, when in self.calls]
+        self.assertEqual(len(seconds), 60)
+        # no second gets more than a couple of the 60 saves
+        self.assertLessEqual(max(seconds.count(x) for x in seconds), 2)
+
+    def test_stall_runs_once(self):
+        self.scheduler.every(2, self.record, 'x', stagger=False)
+        self.clock.now += 7
+        self.assertEqual(self.scheduler.tick(), 1)
+        self.advance(2)
+        self.assertListEqual(self.calls, [('x', 7), ('x', 8)])
+
+    def test_batches_and_costs(self):
+        batches = []
+
+        @contextmanager
+        def batch():
+            batches.append([])
+            yield
+            batches[-1].append('done')
+
+        def fail():
+            raise ValueError
+
+        self.scheduler.set_batch('save', batch)
+        for i in range(3):
+            self.scheduler.call_later(1, self.record, i, group='save')
+        self.scheduler.call_later(1, fail)
+        self.advance(1)
+
+        self.assertEqual(len(self.calls), 3)
+        self.assertListEqual(batches, [['done']])
+        self.assertEqual(self.scheduler.last_batch, 4)
+        costs = self.scheduler.costs
+        self.assertEqual(costs['TestScheduler.record'][0], 3)
+        self.assertEqual(costs['TestScheduler.test_batches_and_costs.<locals>.fail'][0], 1)
+
+    def test_each_call_in_its_own_savepoint(self):
+        entered = []
+
+        @contextmanager
+        def savepoint():
+            entered.append('savepoint')
+            try:
+                yield
+            except ValueError:
+                entered.append('rolled back')
+                raise
+
+        def fail():
+            raise ValueError
+
+        self.scheduler.set_batch('save', nullcontext,
+                                 savepoint)
+        self.scheduler.call_later(1, fail, group='save')
+        self.scheduler.call_later(1, self.record, 'a', group='save')
+        self.advance(1)
+
+        self.assertListEqual(entered,
+                             ['savepoint', 'rolled back', 'savepoint'])
+        self.assertListEqual(self.calls, [('a', 1)])
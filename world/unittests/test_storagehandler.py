@@ -0,0 +1,132 @@
+from unittest import TestCase, mock
+
+from world.storagehandler import StorageHandler, flush_changed, write_stats
+
+
+class FakeAttributes:
+    def __init__(self):
+        self.values = dict()
+        self.writes = 0
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def add(self, key, value):
+        self.values[key] = dict(value)
+        self.writes += 1
+
+
+class FakeCaller:
+    def __init__(self):
+        self.attributes = FakeAttributes()
+
+
+class Counters(StorageHandler):
+    __attr_name__ = 'counters'
+
+
+class TestStorageHandler(TestCase):
+    def setUp(self):
+        self.caller = FakeCaller()
+        self.handler = Counters(self.caller)
+        self.handler.flush()
+        self.caller.attributes.writes = 0
+
+    def test_writes_back_once(self):
+        before = write_stats()
+        self.handler.kills = 1
+        self.handler.kills = 2
+        self.handler.set('deaths', 1)
+
+        self.assertEqual(self.caller.attributes.writes, 0)
+        self.assertEqual(self.handler.kills, 2)
+        self.assertTrue(self.handler.dirty)
+
+        self.assertTrue(self.handler.flush())
+        self.assertFalse(self.handler.flush())
+        self.assertEqual(self.caller.attributes.writes, 1)
+        self.assertEqual(self.caller.attributes.values['counters']['kills'], 2)
+
+        after = write_stats()
+        self.assertEqual(after['assignments'] - before['assignments'], 3)
+        self.assertEqual(after['avoided'] - before['avoided'], 2)
+
+    def test_in_place_changes(self):
+        self.handler.items = []
+        self.handler.flush()
+        self.handler.items.append('sword')
+        self.assertFalse(self.handler.dirty)
+
+        self.handler.mark_dirty('items')
+        self.handler.flush()
+        self.assertListEqual(self.caller.attributes.values['counters']['items'],
+                             ['sword'])
+
+    def test_reload(self):
+        self.handler.kills = 5
+        self.caller.attributes.values['counters'] = {'kills': 1}
+        self.handler.reload()
+        self.assertEqual(self.handler.kills, 1)
+        self.assertFalse(self.handler.dirty)
+        self.assertIsNone(self.handler.deaths)
+
+    def test_check_finds_in_place_changes(self):
+        self.handler.items = ['sword']
+        self.handler.flush()
+        before = write_stats()
+
+        self.assertFalse(self.handler.flush(check=True))
+        self.handler.items.append('shield')
+        self.assertTrue(self.handler.changed())
+        self.assertFalse(self.handler.flush())
+        self.assertTrue(self.handler.flush(check=True))
+        self.assertFalse(self.handler.changed())
+        self.assertListEqual(self.caller.attributes.values['counters']['items'],
+                             ['sword', 'shield'])
+
+        after = write_stats()
+        self.assertEqual(after['writes'] - before['writes'], 1)
+        self.assertEqual(after['clean'] - before['clean'], 1)
+
+    def test_flush_changed_reaches_any_handler(self):
+        flush_changed()
+        other = FakeCaller()
+        mob = Counters(other)
+        flush_changed()
+        other.attributes.writes = 0
+
+        # assigned on one, changed in place on another
+        mob.kills = 3
+        self.handler.items = ['sword']
+        flush_changed()
+        self.handler.items.append('shield')
+        self.assertEqual(flush_changed(), 1)
+        self.assertEqual(flush_changed(), 0)
+
+        self.assertEqual(other.attributes.values['counters']['kills'], 3)
+        self.assertListEqual(self.caller.attributes.values['counters']['items'],
+                             ['sword', 'shield'])
+
+    def test_flush_changed_skips_deleted(self):
+        flush_changed()
+        self.caller.pk = None
+        self.handler.kills = 1
+        self.assertEqual(flush_changed(), 0)
+        self.assertEqual(self.caller.attributes.writes, 0)
+
+    def test_rolled_back_write_is_retried(self):
+        flush_changed()
+        committed = []
+        with mock.patch('world.storagehandler.transaction') as transaction:
+            transaction.on_commit = committed.append
+            self.handler.kills = 1
+            self.assertEqual(flush_changed(), 1)
+            # rolled back, the commit hooks never run
+            committed.clear()
+            self.assertTrue(self.handler.dirty)
+
+            self.assertEqual(flush_changed(), 1)
+            committed.pop()()
+        self.assertFalse(self.handler.dirty)
+        self.assertEqual(flush_changed(), 0)
+        self.assertEqual(self.caller.attributes.writes, 2)
@@ -138,12 +138,11 @@ def act(msg, hide_invisible, hide_sleep, ch, obj, vict_obj, announce_type):
         msg = msg.replace("$P", sdesc)
 
     if announce_type == Announce.ToRoom:
-        for obj in ch.location.contents:
-            if is_pc(obj):
-                if (hide_invisible and is_invis(obj)) or (
-                        hide_sleep and is_sleeping(obj)) or (obj.id == ch.id):
-                    continue
-                obj.msg(msg)
+        for obj in ch.location.occupants.pcs(exclude=(ch, )):
+            if (hide_invisible and is_invis(obj)) or (hide_sleep
+                                                      and is_sleeping(obj)):
+                continue
+            obj.msg(msg)
         return
     if announce_type == Announce.ToChar:
         ch.msg(msg)
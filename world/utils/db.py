@@ -2,11 +2,9 @@
 utility functions related to queries things from internal
 script databases (objdb, roomdb, zonedb, mobdb, etc...)
 """
-import re
-from evennia import GLOBAL_SCRIPTS, logger
-from evennia.utils.dbserialize import deserialize
-
-_RE_COMPARATOR_PATTERN = re.compile(r"(<[>=]?|>=?|!)")
+from evennia import GLOBAL_SCRIPTS
+from world.utils.query import SearchResult, compile_query, parse_query
+from world.utils.vnums import MAX_VNUM
 
 
 def _search_db(db, vnum=None, return_keys=False, **kwargs):
@@ -36,6 +34,8 @@ def _search_db(db, vnum=None, return_keys=False, **kwargs):
 
         search_mobdb(key='dog', attack='bite') # all mobs with the key of dog and attack of bite
 
+        search_mobdb(key='^dra') # all mobs whose key starts with 'dra'
+
         # search for equipment that cost more than 100 coin and weigh less than 10
         objs = search_objdb(type='equipment', weight="<10", cost=">=100")
 
@@ -64,11 +64,22 @@ def _search_db(db, vnum=None, return_keys=False, **kwargs):
             search_*(level=">0") # return all mobs level > 0
 
         # to get mobs between a range (level 5-10)
+        results = search_mobs(level="5..10")
         results = search_mobs(db=search_mobs(level=">=5"), level="<=10")
 
         # to get objects that weight between 2-10lbs
         results = search_objs(db=search_objs(weight=">=2"), weight="<=10")
 
+        Kwargs are compiled once into a QueryPlan (see world.utils.query).
+        When db is a blueprint database (EntityDB.vnum), kwargs on indexed
+        fields (zone, type, flags, level, etc...) are answered from its
+        secondary indexes (substring and prefix searches on key, sdesc,
+        ldesc, name and desc use a trigram index), only the remaining
+        kwargs are checked per record.
+        Passing a previous result back in as db merges both plans, so the
+        chained range search above is a single range lookup, over the
+        vnums of the previous result only.
+
     """
     results = dict()
     db = db
@@ -95,113 +106,119 @@ def _search_db(db, vnum=None, return_keys=False, **kwargs):
             results.update(dict(db))
             return results if not return_keys else list(results.keys())
 
-    for vnum, data in db.items():
-        if kwargs:
-
-            success_matches = 0  # uses a counting system to make sure a specific record matches on ALL supplied kwargs
-            for kfield, kvalue in kwargs.items():
-                dvalue = data.get(kfield, None)
-                dtype = type(dvalue)
-                if not kfield:
-                    break
-
-                # some extra parsing protocols for each
-                # data type depending on what the datatype is for the value in data
-
-                # handle base list type
-                if dtype is list:
-                    # allows matching like so
-                    # "1 2 3" == [1,2,3]
-                    kvalue = dtype(kvalue.split(' '))
-                    matches = all([x in dvalue for x in kvalue])
-                    if not matches:
-                        break
-                    success_matches += 1
-                    continue
-
-                #  parses int types and parses the custom logical operator tags
-                # >=, >, <= <
-                # currently only supports single operators.
-                # This is invalid:
-                #  x = "10<,15>=" or something like that, it expects the format
-                # [operator][value]
-                elif dtype is int:
-                    matches = re.split(_RE_COMPARATOR_PATTERN, kvalue)
-                    if matches and len(matches) > 1:
-                        matches = matches[1:]
-                        condition, value = matches
-                        value = dtype(value)
-                        if condition == ">=" and dvalue >= value:
-                            success_matches += 1
-                        elif condition == ">" and dvalue > value:
-                            success_matches += 1
-                        elif condition == "<=" and dvalue <= value:
-                            success_matches += 1
-                        elif condition == "<" and dvalue < value:
-                            success_matches += 1
-                        continue
-
-                    else:
-                        # cast to type of what dvalue is, this case it is int
-                        kvalue = dtype(kvalue)
-                        if kvalue == dvalue:
-                            # results[vnum] = data
-                            success_matches += 1
-                            continue
-
-                # handle parsing of on extra fields
-                # extra field on data is simply another dictionary
-                # within the dictionary.
-                # allows the following to match:
-                #
-                # "language aldmerish" == {'language': 'aldmerish'}
-                elif dtype is dict and kfield == 'extra':
-                    key, value = kvalue.split(' ')
-                    for k, v, in dvalue.items():
-                        vtype = type(v)
-                        if k == key and v == vtype(value):
-                            success_matches += 1
-                            continue
-
-                # handle str types
-                elif dtype is str:
-                    kvalue = dtype(
-                        kvalue).lower()  # cast to type of what dvalue is
-                    if kvalue in dvalue.lower():
-                        # results[vnum] = data
-                        success_matches += 1
-                        continue
-                else:
-                    logger.log_errmsg(f"not supported data type: {dtype}")
-                    continue
-
-            # if the number of success_matches == len(kwargs)
-            # then each iteration of kwargs.items() found match, meaning
-            # this record passes, and is stored
-            if success_matches == len(kwargs):
-                results[vnum] = data
+    if not kwargs:
+        return results if not return_keys else list(results.keys())
+
+    plan, within = compile_query(kwargs), None
+    if isinstance(db, SearchResult) and db.source is not None:
+        plan, within = db.plan.merged(plan), db.keys()
+        db = db.source
+
+    results = SearchResult(plan.execute(db, within), plan=plan, source=db)
 
     # return results, or keys if specified.
     return results if not return_keys else list(results.keys())
 
 
+def query_db(db, query, aliases=None, known_fields=None):
+    """
+    Evaluates a boolean query expression (see world.utils.query.parse_query)
+    against db. Every `field value` term resolves to a set of vnums, from
+    the secondary indexes when db has them, and the operators are plain
+    set algebra, records are only looked up once for the final result.
+
+    Args:
+        db: dictionary representation of the database
+        query: query string, ex: "flags aggr && level >10 ! applies sneak"
+        aliases: dictionary of field name aliases (ex: name -> key)
+        known_fields: if given, fields not in here search the extra field
+
+    Returns:
+        Dictionary of matched records, ordered by vnum
+
+    Raises:
+        QueryError if query can't be parsed
+    """
+    vnums = parse_query(query, aliases=aliases,
+                        known_fields=known_fields).evaluate(db)
+    return {vnum: db[vnum] for vnum in sorted(vnums)}
+
+
+def zone_vnum_ranges(zonedb=None):
+    """zone name -> (low, high) of every zone that has its `vnums` range set"""
+    zonedb = GLOBAL_SCRIPTS.zonedb.vnum if zonedb is None else zonedb
+    ranges = dict()
+    for zone in zonedb.values():
+        low, high = zone.get('vnums', (-1, -1))
+        if 0 < low <= high:
+            ranges[zone['name']] = (low, high)
+    return ranges
+
+
+def _zone_bounds(zone, zonedb):
+    """
+    (low, high) a zone allocates vnums from and the ranges to skip, zones
+    without a range share whatever isn't set aside for other zones
+    """
+    ranges = zone_vnum_ranges(zonedb)
+    if zone in ranges:
+        return ranges[zone], ()
+    return (1, MAX_VNUM), sorted(ranges.values())
+
+
+def next_vnum(db, zone=None, zonedb=None):
+    """
+    Takes the lowest free vnum of db (roomdb, objdb, mobdb store)
+    within the vnum range of zone.
+
+    Args:
+        db: BlueprintStore of the database
+        zone: name of the zone, ex: has_zone(ch)
+        zonedb: zone database, defaults to GLOBAL_SCRIPTS.zonedb
+
+    Returns:
+        the vnum, it won't be handed out again until released
+
+    Raises:
+        VnumRangeFull if the zone has no free vnum left
+    """
+    (low, high), exclude = _zone_bounds(zone, zonedb)
+    return db.allocator.allocate(low, high, exclude)
+
+
+def reserve_vnums(db, count, zone=None, zonedb=None):
+    """
+    Same as next_vnum, but takes the `count` lowest free vnums at once,
+    or none of them if there aren't enough.
+    """
+    (low, high), exclude = _zone_bounds(zone, zonedb)
+    return db.allocator.reserve(count, low, high, exclude)
+
+
+def release_vnums(db, vnums):
+    """gives back taken vnums that never got a blueprint written to them"""
+    for vnum in vnums:
+        if vnum not in db:
+            db.allocator.release(vnum)
+
+
 def search_mobdb(vnum=None, db=None, return_keys=False, **kwargs):
-    db = GLOBAL_SCRIPTS.mobdb.vnum if not db else db
+    db = GLOBAL_SCRIPTS.mobdb.vnum if db is None else db
     return _search_db(db=db, vnum=vnum, return_keys=return_keys, **kwargs)
 
 
 def search_objdb(vnum=None, db=None, return_keys=False, **kwargs):
-    db = GLOBAL_SCRIPTS.objdb.vnum if not db else db
+    db = GLOBAL_SCRIPTS.objdb.vnum if db is None else db
     return _search_db(db=db, vnum=vnum, return_keys=return_keys, **kwargs)
 
 
 def search_zonedb(vnum=None, db=None, return_keys=False, **kwargs):
-    db = GLOBAL_SCRIPTS.zonedb.vnum if not db else db
+    db = GLOBAL_SCRIPTS.zonedb.vnum if db is None else db
     return _search_db(db=db, vnum=vnum, return_keys=return_keys, **kwargs)
 
 
 def search_roomdb(vnum=None, db=None, return_keys=False, **kwargs):
-    db = GLOBAL_SCRIPTS.roomdb.vnum if not db else db
+    db = GLOBAL_SCRIPTS.roomdb.vnum if db is None else db
     return _search_db(db=db, vnum=vnum, return_keys=return_keys, **kwargs)
 
 
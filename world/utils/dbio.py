@@ -0,0 +1,291 @@
+"""
+reading and writing the json flat files of the blueprint
+databases (objdb, roomdb, zonedb, mobdb, etc...)
+"""
+import copy
+import gzip
+import json
+import os
+import re
+import shutil
+
+_JSON_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_RE_UNSAFE_FILENAME = re.compile(r"[^\w.-]+")
+
+
+class _JSONStream:
+    """
+    buffered reader over a text file object, only keeps the part
+    of the file that hasn't been decoded yet in memory
+    """
+    def __init__(self, fobj, chunk_size):
+        self.fobj = fobj
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        if self.eof:
+            return False
+        chunk = self.fobj.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def skip_ws(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf) or not self.fill():
+                return
+
+    def peek(self):
+        self.skip_ws()
+        if self.pos >= len(self.buf):
+            raise ValueError("unexpected end of json file")
+        return self.buf[self.pos]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"expected `{char}` in json file, "
+                             f"got `{self.buf[self.pos]}`")
+        self.pos += 1
+
+    def decode(self):
+        """decodes the next json value, reading more of the file as needed"""
+        self.skip_ws()
+        while True:
+            try:
+                value, end = _JSON_DECODER.raw_decode(self.buf, self.pos)
+            except ValueError:
+                if not self.fill():
+                    raise
+                continue
+
+            # a number at the end of the buffer might be cut short
+            if end == len(self.buf) and not self.eof and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_object(fobj, chunk_size=65536):
+    """
+    Yields (key, value) of a top level json object one member at
+    a time, without loading the whole file, or its decoded form,
+    into memory.
+
+    Args:
+        fobj: text file object positioned at the start of the object
+        chunk_size: number of characters read at a time
+    """
+    stream = _JSONStream(fobj, chunk_size)
+    stream.expect('{')
+    if stream.peek() == '}':
+        return
+
+    while True:
+        key = stream.decode()
+        if not isinstance(key, str):
+            raise ValueError(f"json object keys must be strings, got {key!r}")
+        stream.expect(':')
+        yield key, stream.decode()
+
+        if stream.peek() == ',':
+            stream.pos += 1
+            continue
+        stream.expect('}')
+        return
+
+
+def fill_defaults(record, struct, extra_struct=None):
+    """
+    adds fields missing from record based on struct (one of the
+    DEFAULT_*_STRUCT in globals.py), dict fields are filled a level
+    deep. extra_struct are defaults for the `extra` field.
+    """
+    for field, value in struct.items():
+        if field not in record:
+            record[field] = copy.deepcopy(value)
+        elif isinstance(value, dict) and isinstance(record[field], dict):
+            for nfield, nvalue in value.items():
+                if nfield not in record[field]:
+                    record[field][nfield] = copy.deepcopy(nvalue)
+
+    if extra_struct and isinstance(record.get('extra'), dict):
+        for efield, evalue in extra_struct.items():
+            if efield not in record['extra']:
+                record['extra'][efield] = copy.deepcopy(evalue)
+    return record
+
+
+def load_blueprints(fobj, struct, extra_structs=None):
+    """
+    Reads a blueprint json file ({vnum: blueprint, ...}) and checks
+    and fills in defaults for every blueprint as it is read.
+
+    Args:
+        fobj: text file object of the json file
+        struct: DEFAULT_*_STRUCT the blueprints are based on
+        extra_structs: dict of type -> defaults of its `extra` field
+
+    Returns:
+        tuple of (dict of vnum -> blueprint, list of error strings),
+        invalid blueprints are left out of the dict
+    """
+    records, errors = dict(), list()
+    extra_structs = extra_structs or dict()
+
+    for vnum, record in iter_json_object(fobj):
+        try:
+            vnum = int(vnum)
+        except ValueError:
+            errors.append(f"invalid vnum `{vnum}`")
+            continue
+
+        if not isinstance(record, dict):
+            errors.append(f"[{vnum}] blueprint is not an object")
+            continue
+
+        if vnum in records:
+            errors.append(f"[{vnum}] duplicate vnum, using the last one")
+
+        extra_struct = extra_structs.get(record.get('type'), None)
+        records[vnum] = fill_defaults(record, struct, extra_struct)
+    return records, errors
+
+
+def load_blueprint_files(paths, struct, extra_structs=None):
+    """
+    same as load_blueprints, but merges several files (the shards of
+    a database) into one dict of vnum -> blueprint
+    """
+    records, errors = dict(), list()
+    for path in paths:
+        with open_json(path) as f:
+            try:
+                shard, shard_errors = load_blueprints(f, struct, extra_structs)
+            except ValueError as err:
+                raise ValueError(f"{path.name}: {err}")
+
+        errors.extend(f"{path.name}: {error}" for error in shard_errors)
+        for vnum in shard.keys() & records.keys():
+            errors.append(f"{path.name}: [{vnum}] duplicate vnum, "
+                          "using the last one")
+        records.update(shard)
+    return records, errors
+
+
+def open_json(path, mode='r'):
+    """opens a json file as text, transparently gunzipping .gz files"""
+    path = str(path)
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def shard_name(value):
+    """file safe name of a shard (zone) value"""
+    return _RE_UNSAFE_FILENAME.sub('_', str(value)).strip('_') or 'none'
+
+
+def shard_files(directory):
+    """json shard files of a sharded dump, in a stable order"""
+    return sorted(
+        path for path in directory.iterdir()
+        if path.name.endswith(('.json', '.json.gz')))
+
+
+def write_shards(directory, shards, compress=False, cls=None):
+    """
+    Writes each shard (name -> {vnum: blueprint}) of a database into its
+    own json file under directory. The new files are written next to the
+    old dump and swapped in at the end, so a failed dump never leaves a
+    half written one behind.
+
+    Returns:
+        number of bytes written
+    """
+    tmp = directory.with_name(directory.name + '.tmp')
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    files = dict()
+    for name, records in shards.items():
+        files.setdefault(shard_name(name), dict()).update(records)
+
+    ext = '.json.gz' if compress else '.json'
+    written = 0
+    for name, records in sorted(files.items()):
+        path = tmp / f"{name}{ext}"
+        with open_json(path, 'w') as f:
+            f.write(json.dumps(records, indent=2, cls=cls))
+        written += path.stat().st_size
+
+    old = directory.with_name(directory.name + '.old')
+    shutil.rmtree(old, ignore_errors=True)
+    if directory.exists():
+        os.replace(directory, old)
+    os.replace(tmp, directory)
+    shutil.rmtree(old, ignore_errors=True)
+    return written
+
+
+def append_journal(path, entries, cls=None):
+    """
+    Appends entries (dicts of db, op, vnum and data) to a json lines
+    journal, one entry per line.
+
+    Returns:
+        number of bytes appended
+    """
+    lines = "".join(json.dumps(entry, cls=cls) + "\n" for entry in entries)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(lines)
+    return len(lines)
+
+
+def read_journal(path):
+    """
+    Reads the entries of a json lines journal in the order they were
+    written. A line cut short (ex: crash while appending) ends the
+    journal, everything before it is still returned.
+    """
+    entries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            entries.append(entry)
+    return entries
+
+
+def apply_journal(records, entries, db, struct=None, extra_structs=None):
+    """
+    applies the journal entries of db (set/del of a vnum) onto records,
+    blueprints that are set get their defaults filled when struct is given
+    """
+    extra_structs = extra_structs or dict()
+    for entry in entries:
+        if entry.get('db') != db:
+            continue
+        vnum = int(entry['vnum'])
+        if entry['op'] == 'del':
+            records.pop(vnum, None)
+            continue
+
+        record = entry['data']
+        if struct is not None:
+            record = fill_defaults(record, struct,
+                                   extra_structs.get(record.get('type')))
+        records[vnum] = record
+    return records
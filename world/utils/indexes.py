@@ -0,0 +1,378 @@
+"""
+in-memory secondary indexes kept over the blueprint databases
+(objdb, roomdb, zonedb, mobdb, etc...)
+
+Each index covers a single blueprint field and maps the values found
+in that field to the vnums of the records holding them. Indexes only
+understand one python type each; records that hold something else in
+the indexed field are kept aside in `others` so a search can still
+test them the slow way and return exactly what a full scan would.
+"""
+import re
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right, insort
+
+_RE_COMPARATOR_PATTERN = re.compile(r"(<[>=]?|>=?|!)")
+
+
+class _FieldIndex(ABC):
+    __field_type__ = None
+
+    def __init__(self, field):
+        self.field = field
+        self.others = set()  # vnums where field is set, but isn't __field_type__
+        self._values = dict()  # vnum -> indexed value, used when removing
+
+    def __len__(self):
+        return len(self._values)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}:{self.field} ({len(self)})>"
+
+    def conforms(self, value):
+        return type(value) is self.__field_type__
+
+    def add(self, vnum, record):
+        self.remove(vnum)
+        value = record.get(self.field, None)
+        if value is None:
+            return
+
+        if not self.conforms(value):
+            self.others.add(vnum)
+            return
+
+        value = self._key(value)
+        self._values[vnum] = value
+        self._insert(vnum, value)
+
+    def remove(self, vnum):
+        self.others.discard(vnum)
+        value = self._values.pop(vnum, None)
+        if value is not None:
+            self._delete(vnum, value)
+
+    def clear(self):
+        self.others.clear()
+        self._values.clear()
+        self._clear()
+
+    def _key(self, value):
+        return value
+
+    @abstractmethod
+    def _insert(self, vnum, value):
+        pass
+
+    @abstractmethod
+    def _delete(self, vnum, value):
+        pass
+
+    @abstractmethod
+    def _clear(self):
+        pass
+
+    @abstractmethod
+    def match(self, kvalue):
+        """
+        returns set of vnums whose conforming value matches kvalue
+        using the same rules as `_search_db`
+        """
+
+
+class HashIndex(_FieldIndex):
+    """
+    Indexes str fields with few distinct values (zone, type, sector).
+
+    Matching keeps the substring semantics of `_search_db`, but only
+    has to test each distinct value once instead of every record.
+    """
+    __field_type__ = str
+
+    def __init__(self, field):
+        super().__init__(field)
+        self._postings = dict()  # lowered value -> set of vnums
+
+    def _key(self, value):
+        return value.lower()
+
+    def _insert(self, vnum, value):
+        self._postings.setdefault(value, set()).add(vnum)
+
+    def _delete(self, vnum, value):
+        vnums = self._postings[value]
+        vnums.discard(vnum)
+        if not vnums:
+            del self._postings[value]
+
+    def _clear(self):
+        self._postings.clear()
+
+    def values(self):
+        return list(self._postings.keys())
+
+    def estimate(self, kvalue, prefix=False):
+        """number of vnums match() would return, without building the set"""
+        kvalue = str(kvalue).lower()
+        if prefix:
+            return sum(
+                len(vnums) for value, vnums in self._postings.items()
+                if value.startswith(kvalue))
+        return sum(
+            len(vnums) for value, vnums in self._postings.items()
+            if kvalue in value)
+
+    def equals(self, value):
+        return set(self._postings.get(str(value).lower(), ()))
+
+    def match(self, kvalue):
+        kvalue = str(kvalue).lower()
+        results = set()
+        for value, vnums in self._postings.items():
+            if kvalue in value:
+                results |= vnums
+        return results
+
+    def prefix(self, kvalue):
+        """vnums whose value starts with kvalue"""
+        kvalue = str(kvalue).lower()
+        results = set()
+        for value, vnums in self._postings.items():
+            if value.startswith(kvalue):
+                results |= vnums
+        return results
+
+
+class TrigramIndex(_FieldIndex):
+    """
+    Full text index for free form str fields (key, sdesc, ldesc, name, desc).
+
+    Every lowered value is broken into overlapping 3 character grams, each
+    gram gets a posting of vnums. A substring search intersects the
+    postings of the search string's grams and only verifies the few
+    survivors. Values are indexed with a leading anchor so prefix searches
+    narrow down the same way. Searches shorter than a gram test each value.
+    """
+    __field_type__ = str
+    __anchor__ = '\x02'
+
+    def __init__(self, field):
+        super().__init__(field)
+        self._postings = dict()  # gram -> set of vnums
+
+    @staticmethod
+    def _grams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def _key(self, value):
+        return value.lower()
+
+    def _insert(self, vnum, value):
+        for gram in self._grams(self.__anchor__ + value):
+            self._postings.setdefault(gram, set()).add(vnum)
+
+    def _delete(self, vnum, value):
+        for gram in self._grams(self.__anchor__ + value):
+            vnums = self._postings[gram]
+            vnums.discard(vnum)
+            if not vnums:
+                del self._postings[gram]
+
+    def _clear(self):
+        self._postings.clear()
+
+    def _candidates(self, text):
+        """vnums holding every gram of text, None if text is too short"""
+        grams = self._grams(text)
+        if not grams:
+            return None
+        postings = [self._postings.get(g, set()) for g in grams]
+        postings.sort(key=len)
+        return set(postings[0]).intersection(*postings[1:])
+
+    def estimate(self, kvalue, prefix=False):
+        """upper bound of vnums match() or prefix() would return"""
+        kvalue = str(kvalue).lower()
+        grams = self._grams(self.__anchor__ + kvalue if prefix else kvalue)
+        if not grams:
+            return len(self)
+        return min(len(self._postings.get(g, ())) for g in grams)
+
+    def match(self, kvalue):
+        kvalue = str(kvalue).lower()
+        candidates = self._candidates(kvalue)
+        if candidates is None:
+            candidates = self._values.keys()
+        return {
+            vnum
+            for vnum in candidates if kvalue in self._values[vnum]
+        }
+
+    def prefix(self, kvalue):
+        """vnums whose value starts with kvalue"""
+        kvalue = str(kvalue).lower()
+        candidates = self._candidates(self.__anchor__ + kvalue)
+        if candidates is None:
+            candidates = self._values.keys()
+        return {
+            vnum
+            for vnum in candidates if self._values[vnum].startswith(kvalue)
+        }
+
+
+class SetIndex(_FieldIndex):
+    """
+    Indexes list fields (flags, applies, tags), each hashable element
+    in the list gets its own posting of vnums.
+    """
+    __field_type__ = list
+
+    def __init__(self, field):
+        super().__init__(field)
+        self._postings = dict()  # element -> set of vnums
+
+    def _key(self, value):
+        elements = set()
+        for element in value:
+            try:
+                hash(element)
+            except TypeError:
+                # things like [apply, mod] pairs can never match
+                # a space seperated search string anyways
+                continue
+            elements.add(element)
+        return frozenset(elements)
+
+    def _insert(self, vnum, value):
+        for element in value:
+            self._postings.setdefault(element, set()).add(vnum)
+
+    def _delete(self, vnum, value):
+        for element in value:
+            vnums = self._postings[element]
+            vnums.discard(vnum)
+            if not vnums:
+                del self._postings[element]
+
+    def _clear(self):
+        self._postings.clear()
+
+    def contains(self, *elements):
+        """vnums that contain all of elements"""
+        postings = [self._postings.get(e, set()) for e in elements]
+        if not postings:
+            return set()
+        postings.sort(key=len)
+        return set(postings[0]).intersection(*postings[1:])
+
+    def estimate(self, *elements):
+        """upper bound of vnums contains() would return"""
+        return min([len(self._postings.get(e, ())) for e in elements] or [0])
+
+    def match(self, kvalue):
+        return self.contains(*str(kvalue).split(' '))
+
+
+class SortedIndex(_FieldIndex):
+    """
+    Indexes int fields (level, weight, cost) as a sorted list
+    of (value, vnum) so comparisons become bisect lookups.
+    """
+    __field_type__ = int
+
+    def __init__(self, field):
+        super().__init__(field)
+        self._entries = list()
+
+    def _insert(self, vnum, value):
+        insort(self._entries, (value, vnum))
+
+    def _delete(self, vnum, value):
+        idx = bisect_left(self._entries, (value, vnum))
+        del self._entries[idx]
+
+    def _clear(self):
+        self._entries.clear()
+
+    def _bounds(self, low, high, low_inclusive, high_inclusive):
+        entries = self._entries
+        start, end = 0, len(entries)
+        if low is not None:
+            start = bisect_left(entries, (low, )) if low_inclusive \
+                else bisect_right(entries, (low, float('inf')))
+        if high is not None:
+            end = bisect_right(entries, (high, float('inf'))) if high_inclusive \
+                else bisect_left(entries, (high, ))
+        return start, max(start, end)
+
+    def range(self, low=None, high=None, low_inclusive=True,
+              high_inclusive=True):
+        """
+        returns set of vnums whose value falls between low and high,
+        None on either end means unbounded
+        """
+        start, end = self._bounds(low, high, low_inclusive, high_inclusive)
+        return {vnum for _, vnum in self._entries[start:end]}
+
+    def count(self, low=None, high=None, low_inclusive=True,
+              high_inclusive=True):
+        """same as len(range(...)) but only costs two bisects"""
+        start, end = self._bounds(low, high, low_inclusive, high_inclusive)
+        return end - start
+
+    def match(self, kvalue):
+        matches = re.split(_RE_COMPARATOR_PATTERN, str(kvalue))
+        if len(matches) > 1:
+            condition, value = matches[1:]
+            value = int(value)
+            if condition == ">=":
+                return self.range(low=value)
+            elif condition == ">":
+                return self.range(low=value, low_inclusive=False)
+            elif condition == "<=":
+                return self.range(high=value)
+            elif condition == "<":
+                return self.range(high=value, high_inclusive=False)
+            return set()
+        value = int(kvalue)
+        return self.range(low=value, high=value)
+
+
+class BlueprintIndexes:
+    """
+    Holds every secondary index of a single blueprint database
+
+    Args:
+        spec: dictionary of field -> index class
+    """
+    def __init__(self, spec):
+        self._indexes = {
+            field: index_cls(field)
+            for field, index_cls in spec.items()
+        }
+
+    def __contains__(self, field):
+        return field in self._indexes
+
+    def __iter__(self):
+        return iter(self._indexes.values())
+
+    def get(self, field, default=None):
+        return self._indexes.get(field, default)
+
+    def add(self, vnum, record):
+        for index in self._indexes.values():
+            index.add(vnum, record)
+
+    def remove(self, vnum):
+        for index in self._indexes.values():
+            index.remove(vnum)
+
+    def clear(self):
+        for index in self._indexes.values():
+            index.clear()
+
+    def rebuild(self, items):
+        self.clear()
+        for vnum, record in items:
+            self.add(vnum, record)
@@ -0,0 +1,585 @@
+"""
+query compiler for searches against the blueprint databases
+
+`_search_db` kwargs (level=">10", flags="aggr sentinel",
+extra="language aldmerish", ...) are compiled into a QueryPlan once per
+search, instead of being re-parsed for every record. The plan answers
+what it can from the secondary indexes of the database (smallest
+estimated result first) and only tests what's left record by record,
+cheapest predicates first.
+
+String predicates match substrings, or prefixes when the value starts
+with `^`:
+
+    search_mobdb(key="^dra")  # dragon, draugr... but not "a dragon"
+
+Int predicates support a range form on top of the usual comparators:
+
+    search_mobdb(level="5..10")  # 5 <= level <= 10
+
+and plans of chained searches are merged, so
+
+    search_mobdb(db=search_mobdb(level=">=5"), level="<=10")
+
+runs as a single `level="5..10"` range lookup against mobdb, kept to the
+vnums the first search found. Blueprints added or changed to match since
+then aren't found, a chained search only narrows the first result.
+
+Values of list fields are split on spaces, `flags="aggr sentinel"`
+matches records flagged with both. In query expressions (see
+parse_query) they are split on commas too, `flags aggr,sentinel`.
+"""
+import re
+from functools import lru_cache
+from evennia import logger
+from world.utils.indexes import HashIndex, SetIndex, SortedIndex, TrigramIndex, _RE_COMPARATOR_PATTERN
+
+_RE_RANGE_PATTERN = re.compile(r"^\s*(-?\d+)\s*\.\.\s*(-?\d+)\s*$")
+
+# relative cost of testing a predicate against a single record,
+# by the type of value being tested. Cheap (and usually selective)
+# tests run first so expensive ones see fewer records.
+_TEST_COST = {int: 0, list: 1, dict: 2, str: 3}
+
+
+class Predicate:
+    """
+    A single compiled `field=value` criteria. Every way the value can be
+    interpreted (int comparison, list membership, extra lookup, substring)
+    is parsed up front; which one is used still depends on the type found
+    in each record, same as it always has.
+
+    Args:
+        field: field of the records tested
+        value: criteria, as given to _search_db
+        list_split: regex the value is split on to match list fields,
+            by default it's split on single spaces
+    """
+    def __init__(self, field, value, list_split=None):
+        self.field = field
+        self.value = value
+        self.parts = (self, )
+
+        text = str(value)
+        self.lower = text.lower()
+
+        # "^dra" only matches strings starting with "dra"
+        self.prefix = None
+        if self.lower.startswith('^') and len(self.lower) > 1:
+            self.prefix = self.lower[1:]
+        if list_split is None:
+            self.elements = text.split(' ')
+        else:
+            self.elements = [e for e in re.split(list_split, text) if e
+                             ] or [text]
+
+        self.extra = None
+        if field == 'extra':
+            extra = text.split(' ')
+            if len(extra) == 2:
+                self.extra = tuple(extra)
+
+        self.low, self.high = None, None
+        self.low_inclusive, self.high_inclusive = True, True
+        self.is_range = False  # uses comparators or a..b form
+        self.int_ok = self._parse_int(text)
+
+    def __repr__(self):
+        return f"<Predicate {self.field}={self.value!r}>"
+
+    def _parse_int(self, text):
+        ranged = _RE_RANGE_PATTERN.match(text)
+        if ranged:
+            self.low, self.high = sorted(map(int, ranged.groups()))
+            self.is_range = True
+            return True
+
+        matches = re.split(_RE_COMPARATOR_PATTERN, text)
+        try:
+            if len(matches) > 1:
+                condition, value = matches[1:]
+                value = int(value)
+                self.is_range = True
+                if condition == ">=":
+                    self.low = value
+                elif condition == ">":
+                    self.low, self.low_inclusive = value, False
+                elif condition == "<=":
+                    self.high = value
+                elif condition == "<":
+                    self.high, self.high_inclusive = value, False
+                else:
+                    return False
+                return True
+
+            self.low = self.high = int(text)
+            return True
+        except ValueError:
+            return False
+
+    @property
+    def bounds(self):
+        return (self.low, self.high, self.low_inclusive, self.high_inclusive)
+
+    def test_int(self, dvalue):
+        if not self.int_ok:
+            return False
+        if self.low is not None:
+            if dvalue < self.low or (dvalue == self.low
+                                     and not self.low_inclusive):
+                return False
+        if self.high is not None:
+            if dvalue > self.high or (dvalue == self.high
+                                      and not self.high_inclusive):
+                return False
+        return True
+
+    def test(self, dvalue):
+        """checks value of record's field against this predicate"""
+        dtype = type(dvalue)
+
+        # "1 2 3" == [1,2,3]
+        if dtype is list:
+            return all([x in dvalue for x in self.elements])
+
+        elif dtype is int:
+            return self.test_int(dvalue)
+
+        # "language aldmerish" == {'language': 'aldmerish'}
+        elif dtype is dict and self.field == 'extra':
+            if self.extra is None:
+                return False
+            key, value = self.extra
+            if key not in dvalue:
+                return False
+            v = dvalue[key]
+            try:
+                return v == type(v)(value)
+            except (TypeError, ValueError):
+                return False
+
+        elif dtype is str:
+            if self.prefix is not None:
+                return dvalue.lower().startswith(self.prefix)
+            return self.lower in dvalue.lower()
+
+        logger.log_errmsg(f"not supported data type: {dtype}")
+        return False
+
+    def test_record(self, record):
+        return self.test(record.get(self.field, None))
+
+    def estimate(self, index):
+        """estimated number of vnums lookup() would return from index"""
+        if isinstance(index, SortedIndex):
+            found = index.count(*self.bounds) if self.int_ok else 0
+        elif isinstance(index, (HashIndex, TrigramIndex)):
+            if self.prefix is not None:
+                found = index.estimate(self.prefix, prefix=True)
+            else:
+                found = index.estimate(self.lower)
+        elif isinstance(index, SetIndex):
+            found = index.estimate(*self.elements)
+        else:
+            found = len(index)
+        return found + len(index.others)
+
+    def lookup(self, index, db):
+        """set of vnums in db matching this predicate, answered by index"""
+        if isinstance(index, SortedIndex):
+            matched = index.range(*self.bounds) if self.int_ok else set()
+        elif isinstance(index, (HashIndex, TrigramIndex)):
+            if self.prefix is not None:
+                matched = index.prefix(self.prefix)
+            else:
+                matched = index.match(self.lower)
+        elif isinstance(index, SetIndex):
+            matched = index.contains(*self.elements)
+        else:
+            matched = index.match(self.value)
+
+        # records that hold an unexpected type in this field
+        peek, _ = _readers(db)
+        for vnum in index.others:
+            if self.test_record(peek(vnum)):
+                matched.add(vnum)
+        return matched
+
+
+class RangePredicate(Predicate):
+    """
+    Several range predicates over the same field folded into one,
+    int records are checked against the intersected bounds (and looked
+    up with a single bisect), anything else against each original part.
+    """
+    def __init__(self, *parts):
+        self.field = parts[0].field
+        self.value = " ".join(str(p.value) for p in parts)
+        self.parts = tuple(p for part in parts for p in part.parts)
+        self.lower = self.value.lower()
+        self.elements, self.extra, self.prefix = [], None, None
+        self.is_range = True
+        self.int_ok = all(p.int_ok for p in self.parts)
+        self.low, self.high = None, None
+        self.low_inclusive, self.high_inclusive = True, True
+
+        for p in self.parts:
+            if p.low is not None and (self.low is None or p.low > self.low or
+                                      (p.low == self.low
+                                       and not p.low_inclusive)):
+                self.low, self.low_inclusive = p.low, p.low_inclusive
+            if p.high is not None and (self.high is None
+                                       or p.high < self.high or
+                                       (p.high == self.high
+                                        and not p.high_inclusive)):
+                self.high, self.high_inclusive = p.high, p.high_inclusive
+
+    def test(self, dvalue):
+        if type(dvalue) is int:
+            return self.test_int(dvalue)
+        return all(p.test(dvalue) for p in self.parts)
+
+
+class QueryPlan:
+    """
+    Compiled form of a set of search kwargs, see `compile_query`
+    """
+    def __init__(self, predicates):
+        self.predicates = self._fold_ranges(predicates)
+
+    def __repr__(self):
+        return f"<QueryPlan {self.predicates}>"
+
+    @staticmethod
+    def _fold_ranges(predicates):
+        folded, ranges = [], dict()
+        for pred in predicates:
+            if pred.is_range and pred.int_ok:
+                ranges.setdefault(pred.field, []).append(pred)
+            else:
+                folded.append(pred)
+
+        for field, preds in ranges.items():
+            folded.append(preds[0] if len(preds) == 1 else RangePredicate(
+                *preds))
+        return folded
+
+    def merged(self, other):
+        """new plan matching records that pass both self and other"""
+        return QueryPlan(self.predicates + other.predicates)
+
+    def execute(self, db, within=None):
+        """
+        runs plan against db (any mapping of vnum -> record)
+
+        Args:
+            within: if given, only the records of these vnums are tested
+
+        Returns:
+            list of (vnum, record) that match every predicate
+        """
+        indexes = getattr(db, 'indexes', None)
+        indexed, scanned = [], []
+        for pred in self.predicates:
+            index = indexes.get(pred.field) if indexes is not None else None
+            if index is None:
+                scanned.append(pred)
+            else:
+                indexed.append((pred.estimate(index), pred, index))
+
+        candidates = None
+        if within is not None:
+            candidates = {vnum for vnum in within if vnum in db}
+            if not candidates:
+                return []
+        indexed.sort(key=lambda x: x[0])
+        for estimate, pred, index in indexed:
+            if candidates is None:
+                candidates = pred.lookup(index, db)
+            elif estimate <= len(candidates):
+                candidates &= pred.lookup(index, db)
+            else:
+                # cheaper to test the few candidates left than to
+                # build a large posting set just to intersect it
+                scanned.append(pred)
+
+            if not candidates:
+                return []
+
+        scanned.sort(key=lambda pred: _predicate_cost(pred, db))
+        peek, peek_items = _readers(db)
+        if candidates is None:
+            records = peek_items()
+        else:
+            records = ((vnum, peek(vnum)) for vnum in sorted(candidates))
+
+        return [(vnum, db[vnum]) for vnum, record in records
+                if all(pred.test_record(record) for pred in scanned)]
+
+
+def _readers(db):
+    """
+    (lookup, items) reading the records of db without copying them,
+    BlueprintStore copies blueprints read the usual way
+    """
+    if hasattr(db, 'peek'):
+        return db.peek, db.peek_items
+    return db.__getitem__, db.items
+
+
+def _predicate_cost(pred, db):
+    """guess cost of testing pred by peeking at the type it sees in db"""
+    _, peek_items = _readers(db)
+    for _, record in peek_items():
+        return _TEST_COST.get(type(record.get(pred.field, None)), 4)
+    return 0
+
+
+@lru_cache(maxsize=256)
+def _compile_cached(items):
+    return QueryPlan([Predicate(field, value) for field, value in items])
+
+
+def compile_query(kwargs):
+    """
+    compiles search kwargs into a QueryPlan
+
+    Args:
+        kwargs: dictionary of field -> criteria as accepted by _search_db
+    """
+    items = tuple(kwargs.items())
+    try:
+        return _compile_cached(items)
+    except TypeError:  # unhashable criteria
+        return QueryPlan([Predicate(field, value) for field, value in items])
+
+
+class SearchResult(dict):
+    """
+    Dictionary of matched records returned by `_search_db`. Remembers the
+    plan and database that produced it, so passing it back in as `db`
+    merges both searches into one plan, run over the original database
+    but only for the vnums found here.
+
+    Once changed (records added, removed or replaced) it forgets its
+    source and is searched like any other dictionary.
+    """
+    def __init__(self, records=(), plan=None, source=None):
+        super().__init__(records)
+        self.plan = plan
+        self.source = source
+
+    def _changed(self):
+        self.source = None
+
+    def __setitem__(self, vnum, record):
+        self._changed()
+        super().__setitem__(vnum, record)
+
+    def __delitem__(self, vnum):
+        self._changed()
+        super().__delitem__(vnum)
+
+    def pop(self, *args):
+        self._changed()
+        return super().pop(*args)
+
+    def popitem(self):
+        self._changed()
+        return super().popitem()
+
+    def setdefault(self, *args):
+        self._changed()
+        return super().setdefault(*args)
+
+    def update(self, *args, **kwargs):
+        self._changed()
+        super().update(*args, **kwargs)
+
+    def clear(self):
+        self._changed()
+        super().clear()
+
+
+class QueryError(ValueError):
+    """raised when a query expression can't be parsed"""
+    pass
+
+
+_RE_QUERY_TOKEN = re.compile(
+    r"\s*(&&|\|\||!|\(|\)|\"[^\"]*\"|'[^']*'|[^\s()!]+)")
+_QUERY_OPERATORS = ('&&', '||', '!')
+
+
+class _Leaf:
+    """`field value` criteria of a query expression"""
+    def __init__(self, field, value):
+        # "applies sneak,hidden", a value can't hold spaces unquoted
+        self.predicate = Predicate(field, value, list_split=r"[ ,]")
+
+    def __repr__(self):
+        return f"({self.predicate.field} {self.predicate.value!r})"
+
+    def evaluate(self, db, within=None):
+        pred = self.predicate
+        indexes = getattr(db, 'indexes', None)
+        index = indexes.get(pred.field) if indexes is not None else None
+
+        peek, peek_items = _readers(db)
+        if within is not None and (index is None
+                                   or pred.estimate(index) > len(within)):
+            # only a few candidates left, test them directly
+            return {vnum for vnum in within if pred.test_record(peek(vnum))}
+
+        if index is not None:
+            found = pred.lookup(index, db)
+        else:
+            found = {
+                vnum
+                for vnum, record in peek_items() if pred.test_record(record)
+            }
+        return found if within is None else found & within
+
+
+class _Not:
+    def __init__(self, expr):
+        self.expr = expr
+
+    def __repr__(self):
+        return f"(! {self.expr})"
+
+    def evaluate(self, db, within=None):
+        base = set(db.keys()) if within is None else within
+        return base - self.expr.evaluate(db, base)
+
+
+class _BinOp:
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def __repr__(self):
+        return f"({self.left} {self.op} {self.right})"
+
+    def evaluate(self, db, within=None):
+        left = self.left.evaluate(db, within)
+        if self.op == '||':
+            return left | self.right.evaluate(db, within)
+
+        if not left:
+            return left
+
+        if self.op == '&&':
+            return self.right.evaluate(db, left)
+
+        # '!', left and not right
+        return left - self.right.evaluate(db, left)
+
+
+class _QueryParser:
+    def __init__(self, text, aliases=None, known_fields=None):
+        self.tokens = self._tokenize(text)
+        self.pos = 0
+        self.aliases = aliases or dict()
+        self.known_fields = known_fields
+
+    @staticmethod
+    def _tokenize(text):
+        tokens, pos = [], 0
+        text = text.strip()
+        while pos < len(text):
+            match = _RE_QUERY_TOKEN.match(text, pos)
+            if not match:
+                raise QueryError(f"can't parse query near `{text[pos:]}`")
+            token = match.group(1)
+            if token[0] in "\"'":
+                token = ('value', token[1:-1])
+            tokens.append(token)
+            pos = match.end()
+        return tokens
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def next(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise QueryError("empty query")
+        expr = self.expression()
+        if self.peek() is not None:
+            raise QueryError(f"unexpected `{self.peek()}`")
+        return expr
+
+    def expression(self):
+        # every operator has the same precedence and is
+        # evaluated left to right (LHF), a term following
+        # another term without an operator is an implicit &&
+        expr = self.unary()
+        while self.peek() not in (None, ')'):
+            token = self.peek()
+            if token in _QUERY_OPERATORS:
+                self.next()
+                op = token
+            else:
+                op = '&&'
+            expr = _BinOp(op, expr, self.unary())
+        return expr
+
+    def unary(self):
+        if self.peek() == '!':
+            self.next()
+            return _Not(self.unary())
+        return self.atom()
+
+    def atom(self):
+        token = self.next()
+        if token is None:
+            raise QueryError("query ended early, expected `field value`")
+
+        if token == '(':
+            expr = self.expression()
+            if self.next() != ')':
+                raise QueryError("missing closing `)`")
+            return expr
+
+        if token in _QUERY_OPERATORS or token == ')' or isinstance(
+                token, tuple):
+            raise QueryError(f"expected a field, got `{token}`")
+
+        value = self.next()
+        if value is None or value in _QUERY_OPERATORS or value in ('(', ')'):
+            raise QueryError(f"`{token}` is missing a value")
+        if isinstance(value, tuple):
+            value = value[1]
+
+        field = self.aliases.get(token.lower(), token.lower())
+        if self.known_fields is not None and field not in self.known_fields:
+            # unknown fields are looked up in the extra field
+            return _Leaf('extra', f"{field} {value}")
+        return _Leaf(field, value)
+
+
+def parse_query(text, aliases=None, known_fields=None):
+    """
+    parses a query expression into a tree that evaluates to a set of vnums
+
+    Grammar:
+        expression := term ([&& | || | !] term)*
+        term       := ! term | ( expression ) | field value
+
+    Operators are evaluated left to right, `a ! b` means a and not b,
+    terms without an operator in between are and'ed. Values with spaces
+    can be quoted.
+
+    Args:
+        text: query string, ex: "key puff || key dragon && position standing"
+        aliases: dictionary of field name aliases (ex: name -> key)
+        known_fields: if given, fields not in here search the extra field
+    """
+    return _QueryParser(text, aliases=aliases,
+                        known_fields=known_fields).parse()
@@ -0,0 +1,96 @@
+"""
+upgrades stored blueprints to the schemas in BLUEPRINT_SCHEMAS
+(world/globals.py), once per schema version
+
+Each EntityDB remembers the schema version its blueprints were last
+upgraded to. Upgrading runs the registered migrations for every version
+in between, then fills in fields missing from the struct, so code that
+reads blueprints can rely on every field being there.
+
+    @migration('room', 2)
+    def _rename_sector(record):
+        record['type'] = record.pop('sector', 'inside')
+        return record
+"""
+from evennia import GLOBAL_SCRIPTS
+from evennia.utils.dbserialize import deserialize
+from world.globals import BLUEPRINT_SCHEMAS
+from world.utils.dbio import fill_defaults
+
+_MIGRATIONS = dict()  # db -> {version: func(record) -> record}
+
+
+def migration(db, version):
+    """registers the decorated function as the upgrade of db blueprints to version"""
+    def decorator(func):
+        _MIGRATIONS.setdefault(db, dict())[version] = func
+        return func
+
+    return decorator
+
+
+def extra_structs(db):
+    """defaults of the `extra` field by blueprint type, only objs have them"""
+    if db != 'obj':
+        return None
+    from typeclasses.objs.custom import CUSTOM_OBJS
+    return {
+        type_: obj.__specific_fields__
+        for type_, obj in CUSTOM_OBJS.items()
+    }
+
+
+def upgrade_blueprint(db, record, from_version=0, extras=None):
+    """
+    upgrades a plain python blueprint of db from from_version to the
+    current schema version
+
+    Args:
+        db: name of database (mob, obj, room, zone, trig)
+        record: blueprint, modified in place
+        from_version: schema version record was written with
+        extras: extra_structs(db), looked up if not given
+    """
+    schema = BLUEPRINT_SCHEMAS[db]
+    migrations = _MIGRATIONS.get(db, dict())
+    for version in range(from_version + 1, schema['version'] + 1):
+        if version in migrations:
+            record = migrations[version](record)
+
+    extras = extra_structs(db) if extras is None else extras
+    extra_struct = (extras or dict()).get(record.get('type'), None)
+    return fill_defaults(record, schema['struct'], extra_struct)
+
+
+def migrate_db(db):
+    """
+    upgrades every stored blueprint of `db` that's behind on its schema,
+    written back in a single batch.
+
+    Returns:
+        number of blueprints that changed
+    """
+    script = GLOBAL_SCRIPTS.get(db + 'db')
+    schema = BLUEPRINT_SCHEMAS[db]
+    from_version = script.schema_version
+    if from_version >= schema['version']:
+        return 0
+
+    store = script.vnum
+    extras = extra_structs(db)
+    upgraded = dict()
+    for vnum, record in store.peek_items():
+        # upgraded in place, on the only copy made of the blueprint
+        new = upgrade_blueprint(db, deserialize(record), from_version, extras)
+        if new != record:
+            upgraded[vnum] = new
+
+    if upgraded:
+        store.update(upgraded)
+    script.schema_version = schema['version']
+    return len(upgraded)
+
+
+def migrate_blueprints():
+    """upgrades every blueprint database, returns db -> number changed"""
+    return {db: migrate_db(db) for db in BLUEPRINT_SCHEMAS}
@@ -0,0 +1,151 @@
+"""
+binary snapshots of the blueprint databases, a fast start
+alternative to the json dumps in resources/json
+
+Layout (little endian):
+
+    header      magic b"SCRL", u16 version, u32 number of blueprints
+    table       per blueprint, sorted by vnum: i64 vnum, u64 offset, u32 length
+    payloads    one pickled blueprint per table entry
+
+The file is memory mapped when opened, only the table is read up front,
+each blueprint is unpickled the first time it's accessed.
+"""
+import mmap
+import os
+import pickle
+import struct
+from collections.abc import Mapping
+
+SNAPSHOT_MAGIC = b"SCRL"
+SNAPSHOT_VERSION = 1
+
+_HEADER = struct.Struct("<4sHI")
+_ENTRY = struct.Struct("<qQI")
+
+
+class SnapshotError(ValueError):
+    """raised when a file isn't a valid blueprint snapshot"""
+    pass
+
+
+def write_snapshot(path, records):
+    """
+    Writes records (vnum -> blueprint, plain python) as a snapshot,
+    the file is written next to path and swapped in when complete.
+
+    Returns:
+        number of bytes written
+    """
+    vnums = sorted(records.keys())
+    payloads = [
+        pickle.dumps(records[vnum], protocol=pickle.HIGHEST_PROTOCOL)
+        for vnum in vnums
+    ]
+
+    offset = _HEADER.size + _ENTRY.size * len(vnums)
+    table = bytearray()
+    for vnum, payload in zip(vnums, payloads):
+        table += _ENTRY.pack(int(vnum), offset, len(payload))
+        offset += len(payload)
+
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(vnums)))
+        f.write(table)
+        for payload in payloads:
+            f.write(payload)
+    os.replace(tmp, path)
+    return offset
+
+
+class BlueprintSnapshot(Mapping):
+    """
+    Read only vnum -> blueprint mapping over a snapshot file,
+    blueprints are decoded lazily and kept once decoded.
+
+    Args:
+        path: the snapshot file
+        keep: keep decoded blueprints, without it every access decodes
+            again and a pass over all of them (like loading them in the
+            database) only holds one at a time
+
+    Usage:
+        with BlueprintSnapshot(path) as rooms:
+            room = rooms[1]
+    """
+    def __init__(self, path, keep=True):
+        self.path = path
+        self.keep = keep
+        self._file = open(path, 'rb')
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            if size < _HEADER.size:
+                raise SnapshotError(f"{path} is too small to be a snapshot")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+        try:
+            magic, version, count = _HEADER.unpack_from(self._map, 0)
+            if magic != SNAPSHOT_MAGIC:
+                raise SnapshotError(f"{path} is not a blueprint snapshot")
+            if version != SNAPSHOT_VERSION:
+                raise SnapshotError(
+                    f"{path} is snapshot version {version}, "
+                    f"expected {SNAPSHOT_VERSION}")
+
+            end = _HEADER.size + _ENTRY.size * count
+            if end > size:
+                raise SnapshotError(f"{path} is truncated")
+
+            self._table = {
+                vnum: (offset, length)
+                for vnum, offset, length in _ENTRY.iter_unpack(
+                    self._map[_HEADER.size:end])
+            }
+            if any(offset + length > size
+                   for offset, length in self._table.values()):
+                raise SnapshotError(f"{path} is truncated")
+        except Exception:
+            self.close()
+            raise
+        self._decoded = dict()
+        self._decodes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __getitem__(self, vnum):
+        try:
+            return self._decoded[vnum]
+        except KeyError:
+            pass
+        offset, length = self._table[vnum]
+        record = pickle.loads(self._map[offset:offset + length])
+        self._decodes += 1
+        if self.keep:
+            self._decoded[vnum] = record
+        return record
+
+    def __iter__(self):
+        return iter(self._table)
+
+    def __len__(self):
+        return len(self._table)
+
+    def __contains__(self, vnum):
+        return vnum in self._table
+
+    @property
+    def decoded(self):
+        """number of blueprints decoded so far"""
+        return self._decodes
@@ -1,12 +1,26 @@
 import re
 import unittest
+from unittest import mock
+import io
+import pathlib
+import tempfile
 import json
+from types import SimpleNamespace
 import numpy as np
 
 from evennia import GLOBAL_SCRIPTS
-from evennia.utils.dbserialize import deserialize
+from world.globals import BLUEPRINT_SCHEMAS, DEFAULT_ROOM_STRUCT
 from world.utils.utils import DBDumpEncoder, capitalize_sentence, _LANG_TAGS, parse_dot_notation, room_exists
-from world.utils.db import _search_db, search_mobdb, search_objdb, search_roomdb, search_zonedb, _RE_COMPARATOR_PATTERN
+from world.utils.db import _search_db, next_vnum, query_db, release_vnums, reserve_vnums, search_mobdb, search_objdb, search_roomdb, search_zonedb
+from world.utils.dbio import append_journal, apply_journal, iter_json_object, load_blueprint_files, load_blueprints, read_journal, shard_files, write_shards
+from world.utils.schema import _MIGRATIONS, migrate_db, migration, upgrade_blueprint
+from world.utils.snapshot import BlueprintSnapshot, SnapshotError, write_snapshot
+from world.utils.indexes import HashIndex, SetIndex, SortedIndex, TrigramIndex, _RE_COMPARATOR_PATTERN
+from world.utils.query import QueryError, RangePredicate, compile_query
+from world.utils.vnums import MAX_VNUM, IntervalSet, VnumAllocator, VnumRangeFull
+from typeclasses.scripts import BlueprintStore, EntityDB
+from typeclasses.rooms.rooms import _ROOM_CACHE, Room, _cache_room, _uncache_room, get_room
+from commands.wiz import _compact_journal, _dump_incremental
 
 
 class TestNumpyToJsonEncoding(unittest.TestCase):
@@ -64,19 +78,19 @@ class TestSearchDB(unittest.TestCase):
         }
 
     def test_mobdb_return_all(self):
-        db = deserialize(GLOBAL_SCRIPTS.mobdb.vnum)
+        db = GLOBAL_SCRIPTS.mobdb.vnum.as_dict()
         self.assertDictEqual(db, search_mobdb('all'))
 
     def test_objdb_return_all(self):
-        db = deserialize(GLOBAL_SCRIPTS.objdb.vnum)
+        db = GLOBAL_SCRIPTS.objdb.vnum.as_dict()
         self.assertDictEqual(db, search_objdb('all'))
 
     def test_zonedb_return_all(self):
-        db = deserialize(GLOBAL_SCRIPTS.zonedb.vnum)
+        db = GLOBAL_SCRIPTS.zonedb.vnum.as_dict()
         self.assertDictEqual(db, search_zonedb('all'))
 
     def test_roomdb_return_all(self):
-        db = deserialize(GLOBAL_SCRIPTS.roomdb.vnum)
+        db = GLOBAL_SCRIPTS.roomdb.vnum.as_dict()
         self.assertDictEqual(db, search_roomdb('all'))
 
     def test_one_keyword(self):
@@ -129,6 +143,655 @@ class TestSearchDB(unittest.TestCase):
         self.assertListEqual(result[1:], expected)
 
 
+class TestIndexedSearchDB(unittest.TestCase):
+    def setUp(self) -> None:
+        self.mock_db = {
+            1: {
+                'key': 'puff dragon',
+                'zone': 'Dragon_lair',
+                'flags': ['aggr', 'sentinel'],
+                'level': 10,
+                'extra': {
+                    'language': 'draconic'
+                }
+            },
+            2: {
+                'key': 'dog',
+                'zone': 'town',
+                'flags': ['sentinel'],
+                'level': 3,
+                'extra': {
+                    'language': 'common'
+                }
+            },
+            3: {
+                'key': 'guard',
+                'zone': 'town',
+                'flags': [],
+                'level': 15,
+                'extra': {}
+            },
+            4: {
+                'key': 'odd one',
+                'zone': None,
+                'flags': 'aggr',
+                'level': '12',
+                'extra': {}
+            }
+        }
+        self.store = BlueprintStore(dict(self.mock_db), EntityDB.__indexes__)
+
+    def assertSameSearch(self, **kwargs):
+        self.assertDictEqual(_search_db(db=self.mock_db, **kwargs),
+                             _search_db(db=self.store, **kwargs))
+
+    def test_indexed_fields_match_full_scan(self):
+        self.assertSameSearch(zone='town')
+        self.assertSameSearch(zone='DRAGON')
+        self.assertSameSearch(flags='aggr')
+        self.assertSameSearch(flags='aggr sentinel')
+        self.assertSameSearch(level='>=10')
+        self.assertSameSearch(level='<10')
+        self.assertSameSearch(level='12')
+        self.assertSameSearch(zone='town', level='>5', key='guard')
+        self.assertSameSearch(extra='language common')
+
+    def test_index_kept_up_to_date(self):
+        self.store[5] = {'key': 'rat', 'zone': 'town', 'level': 1}
+        self.assertListEqual(
+            _search_db(db=self.store, zone='town', return_keys=True),
+            [2, 3, 5])
+
+        del self.store[2]
+        self.assertListEqual(
+            _search_db(db=self.store, level='<=3', return_keys=True), [5])
+
+        self.store.clear()
+        self.assertDictEqual(_search_db(db=self.store, zone='town'), {})
+
+    def test_reads_are_copies(self):
+        record = self.store[2]
+        record['zone'] = 'sewers'
+        record['flags'].append('aggr')
+        self.assertEqual(self.store.peek(2)['zone'], 'town')
+        self.assertListEqual(
+            _search_db(db=self.store, flags='aggr', return_keys=True), [1, 4])
+        self.assertFalse(self.store.changes)
+
+        self.store[2] = record
+        self.assertListEqual(
+            _search_db(db=self.store, zone='sewers', return_keys=True), [2])
+        self.assertDictEqual(self.store.changes, {2: False})
+
+    def test_sorted_index_range(self):
+        index = SortedIndex('level')
+        for vnum, record in self.mock_db.items():
+            index.add(vnum, record)
+        self.assertSetEqual(index.range(3, 10), {1, 2})
+        self.assertSetEqual(index.range(3, 10, low_inclusive=False), {1})
+        self.assertSetEqual(index.others, {4})
+
+    def test_hash_and_set_index_removal(self):
+        hindex, sindex = HashIndex('zone'), SetIndex('flags')
+        for vnum, record in self.mock_db.items():
+            hindex.add(vnum, record)
+            sindex.add(vnum, record)
+        hindex.remove(2)
+        sindex.remove(1)
+        self.assertSetEqual(hindex.equals('town'), {3})
+        self.assertSetEqual(sindex.contains('sentinel'), {2})
+        self.assertSetEqual(sindex.contains('aggr'), set())
+
+
+class TestQueryPlan(unittest.TestCase):
+    def setUp(self) -> None:
+        self.mock_db = {
+            vnum: {
+                'key': f"mob {vnum}",
+                'level': vnum,
+                'flags': ['aggr'] if vnum % 2 else []
+            }
+            for vnum in range(1, 21)
+        }
+        self.store = BlueprintStore(dict(self.mock_db), EntityDB.__indexes__)
+
+    def test_range_form(self):
+        for db in (self.mock_db, self.store):
+            records = _search_db(db=db, level="5..10", return_keys=True)
+            self.assertListEqual(records, list(range(5, 11)))
+
+    def test_chained_ranges_fold_into_one(self):
+        first = _search_db(db=self.store, level=">=5")
+        records = _search_db(db=first, level="<=10", flags='aggr')
+
+        self.assertListEqual(list(records.keys()), [5, 7, 9])
+        ranges = [
+            p for p in records.plan.predicates
+            if isinstance(p, RangePredicate)
+        ]
+        self.assertEqual(len(ranges), 1)
+        self.assertEqual((ranges[0].low, ranges[0].high), (5, 10))
+
+    def test_chained_after_changes_searches_what_is_left(self):
+        first = _search_db(db=self.store, level=">=5")
+        first.pop(7)
+        del first[9]
+        records = _search_db(db=first, level="<=10", flags='aggr')
+        self.assertListEqual(list(records.keys()), [5])
+
+    def test_chained_only_narrows(self):
+        first = _search_db(db=self.store, level=">=5")
+        self.store[21] = {'key': 'mob 21', 'level': 8, 'flags': ['aggr']}
+        record = self.store[2]
+        record['level'] = 6
+        self.store[2] = record
+        del self.store[9]
+
+        records = _search_db(db=first, level="<=10", flags='aggr')
+        self.assertListEqual(list(records.keys()), [5, 7])
+
+    def test_list_values_split_on_spaces(self):
+        self.mock_db[3]['flags'] = ['aggr', 'sentinel']
+        for db in (self.mock_db,
+                   BlueprintStore(dict(self.mock_db), EntityDB.__indexes__)):
+            self.assertListEqual(
+                _search_db(db=db, flags='aggr sentinel', return_keys=True),
+                [3])
+            self.assertListEqual(
+                _search_db(db=db, flags='aggr,sentinel', return_keys=True),
+                [])
+
+    def test_chained_empty_result_stays_empty(self):
+        first = _search_db(db=self.store, level=">100")
+        self.assertDictEqual(_search_db(db=first, flags='aggr'), {})
+
+    def test_plan_is_compiled_once(self):
+        self.assertIs(compile_query({'level': '>5'}),
+                      compile_query({'level': '>5'}))
+
+
+class TestTrigramIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.mock_db = {
+            1: {'key': 'dragon', 'sdesc': 'a Red Dragon'},
+            2: {'key': 'draugr', 'sdesc': 'an old draugr'},
+            3: {'key': 'puff dragon', 'sdesc': 'Puff the magic dragon'},
+            4: {'key': 'rat', 'sdesc': 'a rat'},
+            5: {'key': 5, 'sdesc': 'a number'},
+        }
+        self.store = BlueprintStore(dict(self.mock_db), EntityDB.__indexes__)
+
+    def search(self, **kwargs):
+        results = [
+            _search_db(db=db, return_keys=True, **kwargs)
+            for db in (self.mock_db, self.store)
+        ]
+        self.assertListEqual(results[0], results[1])
+        return results[0]
+
+    def test_substring(self):
+        self.assertListEqual(self.search(key='dragon'), [1, 3])
+        self.assertListEqual(self.search(sdesc='red drag'), [1])
+        self.assertListEqual(self.search(key='ra'), [1, 2, 3, 4])
+        self.assertListEqual(self.search(key='nothing'), [])
+
+    def test_prefix(self):
+        self.assertListEqual(self.search(key='^dra'), [1, 2])
+        self.assertListEqual(self.search(key='^d'), [1, 2])
+        self.assertListEqual(self.search(sdesc='^puff'), [3])
+
+    def test_index_updates(self):
+        index = self.store.indexes.get('key')
+        self.assertIsInstance(index, TrigramIndex)
+        self.assertSetEqual(index.others, {5})
+
+        self.store[4] = {'key': 'dragon rat', 'sdesc': 'a rat'}
+        self.assertSetEqual(index.match('dragon'), {1, 3, 4})
+        del self.store[1]
+        self.assertSetEqual(index.prefix('dragon'), {4})
+        self.assertFalse(
+            any(1 in vnums for vnums in index._postings.values()))
+
+
+class TestQueryLanguage(unittest.TestCase):
+    def setUp(self) -> None:
+        self.mock_db = {
+            1: {'key': 'puff', 'position': 'standing', 'attack': 'hit',
+                'level': 1, 'applies': []},
+            2: {'key': 'dragon', 'position': 'standing', 'attack': 'bite',
+                'level': 30, 'applies': ['sneak']},
+            3: {'key': 'dragon', 'position': 'sleeping', 'attack': 'claw',
+                'level': 25, 'applies': []},
+            4: {'key': 'puff', 'position': 'sitting', 'attack': 'hit',
+                'level': 2, 'applies': ['sneak', 'hidden']},
+            5: {'key': 'rat', 'position': 'standing', 'attack': 'bite',
+                'level': 1, 'applies': ['hidden']},
+        }
+        self.store = BlueprintStore(dict(self.mock_db), EntityDB.__indexes__)
+
+    def query(self, text, **kwargs):
+        results = [
+            list(query_db(db, text, **kwargs).keys())
+            for db in (self.mock_db, self.store)
+        ]
+        self.assertListEqual(results[0], results[1])
+        return results[0]
+
+    def test_single_term(self):
+        self.assertListEqual(self.query("key puff"), [1, 4])
+        self.assertListEqual(self.query("name puff", aliases={'name': 'key'}),
+                             [1, 4])
+
+    def test_left_to_right(self):
+        self.assertListEqual(
+            self.query(
+                "key puff || key dragon && position standing ! attack bite"),
+            [1])
+        self.assertListEqual(self.query("key dragon ! attack bite || key rat"),
+                             [3, 5])
+
+    def test_grouping_and_not(self):
+        self.assertListEqual(
+            self.query("key rat || (key dragon && level >26)"), [2, 5])
+        self.assertListEqual(self.query("! position standing"), [3, 4])
+
+    def test_implicit_and_and_lists(self):
+        self.assertListEqual(self.query("applies sneak,hidden"), [4])
+        self.assertListEqual(self.query("position standing applies hidden"),
+                             [5])
+
+    def test_unknown_fields_search_extra(self):
+        db = {
+            1: {'key': 'a book', 'extra': {'category': 'fiction'}},
+            2: {'key': 'a book', 'extra': {'category': 'history'}},
+        }
+        self.assertListEqual(
+            list(query_db(db, "name book category fiction",
+                          aliases={'name': 'key'},
+                          known_fields={'key', 'extra'}).keys()), [1])
+
+    def test_invalid_queries(self):
+        for text in ("key", "key puff &&", "(key puff", "&& key puff", ""):
+            with self.assertRaises(QueryError):
+                query_db(self.mock_db, text)
+
+
+class TestDBIO(unittest.TestCase):
+    def setUp(self) -> None:
+        self.data = {
+            str(vnum): {
+                'key': f"mob {vnum}",
+                'level': vnum * 1000,
+                'stats': {'str': vnum},
+                'flags': ['aggr', "quoted \"}"]
+            }
+            for vnum in range(1, 50)
+        }
+        self.text = json.dumps(self.data, indent=2)
+
+    def test_streamed_object_matches_json_load(self):
+        for chunk_size in (1, 7, 65536):
+            streamed = dict(
+                iter_json_object(io.StringIO(self.text), chunk_size=chunk_size))
+            self.assertDictEqual(streamed, self.data)
+
+        self.assertDictEqual(dict(iter_json_object(io.StringIO(" {} "))), {})
+
+    def test_invalid_json(self):
+        for text in ('[1, 2]', '{"1": {"key": "a"}', '{"1" {}}'):
+            with self.assertRaises(ValueError):
+                dict(iter_json_object(io.StringIO(text), chunk_size=4))
+
+    def test_load_blueprints(self):
+        struct = {'key': 'unfinished', 'level': 0, 'stats': {'str': 0, 'end': 0}}
+        text = json.dumps({'1': {'key': 'puff', 'stats': {'str': 5}},
+                           'two': {}, '3': [], '4': {'level': 2}})
+        records, errors = load_blueprints(io.StringIO(text), struct)
+
+        self.assertListEqual(list(records.keys()), [1, 4])
+        self.assertDictEqual(records[1], {
+            'key': 'puff', 'level': 0, 'stats': {'str': 5, 'end': 0}})
+        self.assertEqual(records[4]['key'], 'unfinished')
+        self.assertEqual(len(errors), 2)
+
+    def test_shards_roundtrip(self):
+        shards = {
+            'forest': {1: {'key': 'tree', 'zone': 'forest'}},
+            'dark cave': {2: {'key': 'bat', 'zone': 'dark cave'}},
+            None: {3: {'key': 'lost'}},
+        }
+        struct = {'key': '', 'zone': 'null'}
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = pathlib.Path(tmp) / 'mobs'
+            for compress in (False, True):
+                write_shards(directory, shards, compress=compress)
+                paths = shard_files(directory)
+                self.assertEqual(len(paths), 3)
+                self.assertTrue(
+                    all(p.name.endswith('.gz') == compress for p in paths))
+
+                records, errors = load_blueprint_files(paths, struct)
+                self.assertListEqual(sorted(records.keys()), [1, 2, 3])
+                self.assertEqual(records[3]['zone'], 'null')
+                self.assertListEqual(errors, [])
+
+            # stale shards of an older dump are dropped
+            write_shards(directory, {'forest': shards['forest']})
+            self.assertEqual(len(shard_files(directory)), 1)
+
+    def test_journal(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = pathlib.Path(tmp) / 'journal.jsonl'
+            append_journal(path, [
+                {'db': 'mob', 'op': 'set', 'vnum': 1, 'data': {'key': 'a'}},
+                {'db': 'obj', 'op': 'set', 'vnum': 1, 'data': {'key': 'b'}},
+            ])
+            append_journal(path, [
+                {'db': 'mob', 'op': 'del', 'vnum': 2},
+                {'db': 'mob', 'op': 'set', 'vnum': 3, 'data': {}},
+            ])
+            with open(path, 'a') as f:
+                f.write('{"db": "mob", "op": "del", "vn')
+
+            entries = read_journal(path)
+            self.assertEqual(len(entries), 4)
+
+            records = {1: {'key': 'old'}, 2: {'key': 'gone'}}
+            apply_journal(records, entries, 'mob', struct={'key': 'new'})
+            self.assertDictEqual(records, {1: {'key': 'a'}, 3: {'key': 'new'}})
+
+    def test_compact_needs_a_base_dump(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            dump_ground = pathlib.Path(tmp)
+            _dump_incremental({'room': {3: {'key': 'new', 'zone': 'z'}}},
+                              dump_ground)
+
+            # folding the journal alone would make a dump of just room 3
+            with self.assertRaises(FileNotFoundError):
+                _compact_journal(dump_ground)
+            self.assertTrue((dump_ground / 'journal.jsonl').exists())
+            self.assertFalse((dump_ground / 'rooms').exists())
+
+            write_shards(dump_ground / 'rooms',
+                         {'z': {1: {'key': 'old', 'zone': 'z'}}})
+            _compact_journal(dump_ground)
+            records, _ = load_blueprint_files(
+                shard_files(dump_ground / 'rooms'), dict())
+            self.assertListEqual(sorted(records.keys()), [1, 3])
+            self.assertFalse((dump_ground / 'journal.jsonl').exists())
+
+    def test_store_tracks_changes(self):
+        saved = []
+        store = BlueprintStore({1: {'key': 'a'}, 2: {'key': 'b'}},
+                               EntityDB.__indexes__,
+                               on_change=saved.append)
+        store[3] = {'key': 'c'}
+        store[3] = {'key': 'cc'}
+        del store[1]
+        self.assertDictEqual(store.changes, {3: False, 1: True})
+        # only the marks that changed are persisted
+        self.assertListEqual(saved, [{3: False}, {1: True}])
+
+        taken = store.take_changes()
+        self.assertDictEqual(store.changes, {})
+        self.assertIsNone(saved[-1])
+        store[3] = {'key': 'd'}
+        store.restore_changes(taken)
+        self.assertDictEqual(store.changes, {3: False, 1: True})
+        self.assertDictEqual(saved[-1], {1: True})
+
+    def test_replace_store(self):
+        store = BlueprintStore({1: {'key': 'old', 'level': 1}},
+                               EntityDB.__indexes__)
+        store.replace({2: {'key': 'new', 'level': 5}})
+        self.assertListEqual(list(store.keys()), [2])
+        self.assertListEqual(_search_db(db=store, key='old', return_keys=True), [])
+        self.assertListEqual(_search_db(db=store, level='5', return_keys=True), [2])
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self) -> None:
+        self.records = {
+            vnum: {
+                'name': f"room {vnum}",
+                'exits': {'north': vnum + 1, 'south': -1},
+                'flags': ['dark'] if vnum % 3 else []
+            }
+            for vnum in (1, 5, 2, 100, -3)
+        }
+
+    def test_roundtrip_is_lazy(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = pathlib.Path(tmp) / 'rooms.snap'
+            write_snapshot(path, self.records)
+
+            with BlueprintSnapshot(path) as snapshot:
+                self.assertEqual(len(snapshot), 5)
+                self.assertListEqual(list(snapshot), [-3, 1, 2, 5, 100])
+                self.assertEqual(snapshot.decoded, 0)
+
+                self.assertDictEqual(snapshot[5], self.records[5])
+                self.assertEqual(snapshot.decoded, 1)
+                self.assertNotIn(3, snapshot)
+                self.assertDictEqual(dict(snapshot), self.records)
+
+    def test_not_kept(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = pathlib.Path(tmp) / 'rooms.snap'
+            write_snapshot(path, self.records)
+
+            with BlueprintSnapshot(path, keep=False) as snapshot:
+                self.assertDictEqual(dict(snapshot.items()), self.records)
+                self.assertEqual(snapshot.decoded, 5)
+                self.assertIsNot(snapshot[5], snapshot[5])
+                self.assertEqual(snapshot.decoded, 7)
+
+    def test_replace_from_snapshot(self):
+        store = BlueprintStore({1: {'name': 'old'}}, EntityDB.__indexes__)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = pathlib.Path(tmp) / 'rooms.snap'
+            write_snapshot(path, self.records)
+            with BlueprintSnapshot(path, keep=False) as snapshot:
+                store.replace(snapshot)
+        self.assertDictEqual(dict(store.peek_items()), self.records)
+        self.assertEqual(store.take_changes(),
+                         dict.fromkeys(self.records, False))
+
+    def test_invalid_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = pathlib.Path(tmp) / 'rooms.snap'
+            write_snapshot(path, self.records)
+            data = path.read_bytes()
+
+            for bad in (b'', b'JSON' + data[4:], data[:-10]):
+                path.write_bytes(bad)
+                with self.assertRaises(SnapshotError):
+                    BlueprintSnapshot(path)
+
+
+class TestSchema(unittest.TestCase):
+    def tearDown(self) -> None:
+        _MIGRATIONS.pop('room', None)
+
+    def test_fills_missing_fields(self):
+        room = upgrade_blueprint('room', {'name': 'a cellar',
+                                          'exits': {'north': 2}})
+        self.assertEqual(room['name'], 'a cellar')
+        self.assertEqual(room['exits']['north'], 2)
+        self.assertEqual(room['exits']['down'], -1)
+        self.assertSetEqual(set(room.keys()), set(DEFAULT_ROOM_STRUCT.keys()))
+        self.assertIsNot(room['flags'], DEFAULT_ROOM_STRUCT['flags'])
+
+    def test_extra_defaults(self):
+        obj = upgrade_blueprint('obj', {'type': 'container', 'extra': {}},
+                                extras={'container': {'limit': -1}})
+        self.assertDictEqual(obj['extra'], {'limit': -1})
+
+    def test_migrations_run_from_stored_version(self):
+        version = BLUEPRINT_SCHEMAS['room']['version']
+
+        @migration('room', version)
+        def _rename(record):
+            record['name'] = record.pop('title')
+            return record
+
+        room = upgrade_blueprint('room', {'title': 'a cellar'},
+                                 from_version=version - 1)
+        self.assertEqual(room['name'], 'a cellar')
+
+        # already at the current version, nothing to run
+        room = upgrade_blueprint('room', {'name': 'a hall'},
+                                 from_version=version)
+        self.assertEqual(room['name'], 'a hall')
+
+    def test_migrate_db_writes_only_what_changed(self):
+        version = BLUEPRINT_SCHEMAS['room']['version']
+        current = upgrade_blueprint('room', {'name': 'a hall'})
+        store = BlueprintStore({1: current, 2: {'name': 'a cellar'}},
+                               EntityDB.__indexes__)
+        script = SimpleNamespace(vnum=store, schema_version=version - 1)
+        with mock.patch('world.utils.schema.GLOBAL_SCRIPTS') as scripts:
+            scripts.get.return_value = script
+            self.assertEqual(migrate_db('room'), 1)
+            self.assertEqual(migrate_db('room'), 0)
+
+        self.assertDictEqual(store.changes, {2: False})
+        self.assertEqual(script.schema_version, version)
+        self.assertSetEqual(set(store[2].keys()),
+                            set(DEFAULT_ROOM_STRUCT.keys()))
+
+    def test_store_update_batches(self):
+        store = BlueprintStore({1: {'key': 'a'}}, EntityDB.__indexes__)
+        store.update({1: {'key': 'b'}, 2: {'key': 'c'}})
+        self.assertDictEqual(store.changes, {1: False, 2: False})
+        self.assertListEqual(_search_db(db=store, key='b', return_keys=True),
+                             [1])
+
+
+class TestVnumAllocator(unittest.TestCase):
+    def setUp(self) -> None:
+        self.zonedb = {
+            1: {'name': 'cave', 'vnums': [100, 102]},
+            2: {'name': 'town', 'vnums': [-1, -1]},
+        }
+        self.rooms = BlueprintStore({v: {'zone': 'town'} for v in (1, 2, 4)},
+                                    EntityDB.__indexes__)
+
+    def test_interval_set(self):
+        free = IntervalSet([(1, 3), (7, 9)])
+        free.remove(2)
+        self.assertListEqual(list(free), [(1, 1), (3, 3), (7, 9)])
+        free.add(2)
+        self.assertListEqual(list(free), [(1, 3), (7, 9)])
+        self.assertEqual(free.first(4, 20), 7)
+        self.assertIsNone(free.first(10, 20))
+
+    def test_allocates_lowest_gap(self):
+        allocator = VnumAllocator([1, 2, 4])
+        self.assertEqual(allocator.allocate(), 3)
+        self.assertEqual(allocator.allocate(), 5)
+        allocator.release(2)
+        self.assertEqual(allocator.allocate(), 2)
+        self.assertEqual(allocator.allocate(low=MAX_VNUM), MAX_VNUM)
+        self.assertRaises(VnumRangeFull, allocator.allocate, MAX_VNUM)
+
+    def test_reserve_all_or_nothing(self):
+        allocator = VnumAllocator([2])
+        self.assertListEqual(allocator.reserve(3), [1, 3, 4])
+        self.assertRaises(VnumRangeFull, allocator.reserve, 3, 5, 6)
+        self.assertTrue(allocator.is_free(5))
+
+    def test_zone_range(self):
+        vnum = next_vnum(self.rooms, zone='cave', zonedb=self.zonedb)
+        self.assertEqual(vnum, 100)
+        self.assertListEqual(
+            reserve_vnums(self.rooms, 2, zone='cave', zonedb=self.zonedb),
+            [101, 102])
+        self.assertRaises(VnumRangeFull, next_vnum, self.rooms, 'cave',
+                          self.zonedb)
+
+    def test_zone_without_range_skips_others(self):
+        self.rooms.update({v: {'zone': 'town'} for v in range(5, 100)})
+        self.assertEqual(next_vnum(self.rooms, 'town', self.zonedb), 3)
+        self.assertEqual(next_vnum(self.rooms, 'town', self.zonedb), 103)
+
+    def test_store_keeps_allocator_in_step(self):
+        self.assertEqual(next_vnum(self.rooms, zonedb=self.zonedb), 3)
+        self.rooms[5] = {'zone': 'town'}
+        del self.rooms[1]
+        self.assertEqual(next_vnum(self.rooms, zonedb=self.zonedb), 1)
+        self.assertEqual(next_vnum(self.rooms, zonedb=self.zonedb), 6)
+
+        # never written, so it's given back
+        release_vnums(self.rooms, [3, 5])
+        self.assertEqual(next_vnum(self.rooms, zonedb=self.zonedb), 3)
+
+    def test_replace_keeps_handed_out_vnums(self):
+        held = next_vnum(self.rooms, zonedb=self.zonedb)
+        self.assertEqual(held, 3)
+        self.rooms.replace({v: {'zone': 'town'} for v in (1, 2, 6)})
+
+        # 3 is still open in an editor, 4 was dropped by the load
+        self.assertEqual(next_vnum(self.rooms, zonedb=self.zonedb), 4)
+        self.assertEqual(next_vnum(self.rooms, zonedb=self.zonedb), 5)
+        self.assertEqual(next_vnum(self.rooms, zonedb=self.zonedb), 7)
+
+
+class TestRoomCache(unittest.TestCase):
+    class FakeRoom:
+        def __init__(self, key):
+            self.key = key
+            self.pk = 1
+
+    def tearDown(self) -> None:
+        _ROOM_CACHE.pop(90001, None)
+
+    def test_cached_rooms_skip_the_database(self):
+        room = self.FakeRoom("90001")
+        _cache_room(room)
+        self.assertIs(get_room(90001), room)
+        self.assertIs(get_room("90001"), room)
+
+    def test_uncache(self):
+        room = self.FakeRoom("90001")
+        _cache_room(room)
+        _uncache_room(self.FakeRoom("90001"))  # not the cached one
+        self.assertIs(_ROOM_CACHE[90001], room)
+        _uncache_room(room)
+        self.assertNotIn(90001, _ROOM_CACHE)
+
+    def test_invalid_vnums(self):
+        self.assertIsNone(get_room(-1))
+        self.assertIsNone(get_room("Limbo"))
+        _cache_room(self.FakeRoom("Limbo"))  # ignored
+
+
+class TestRoomHeader(unittest.TestCase):
+    def setUp(self) -> None:
+        self.room = SimpleNamespace(
+            ndb=SimpleNamespace(render_version=None, header=None),
+            db=SimpleNamespace(name="A room",
+                               desc="Plain.",
+                               exits={
+                                   'north': 2,
+                                   'south': -1
+                               }))
+
+    def test_header_is_cached(self):
+        header = Room.render_header(self.room)
+        self.assertIn("|lcnorth|ltnorth|le", header)
+        self.assertNotIn("south", header)
+
+        self.room.db.name = "Renamed"
+        self.assertIs(Room.render_header(self.room), header)
+
+    def test_touch_renders_again(self):
+        Room.render_header(self.room)
+        self.room.db.name = "Renamed"
+        Room.touch(self.room)
+        self.assertIn("Renamed", Room.render_header(self.room))
+
+
 class TestRPLanguageParser(unittest.TestCase):
     def setUp(self) -> None:
         self.text = """
@@ -309,10 +309,6 @@ def clear_terminal(obj):
     obj.msg("\u001B[2J")
 
 
-def next_available_rvnum():
-    return max(GLOBAL_SCRIPTS.roomdb.vnum.keys()) + 1
-
-
 def get_name(obj):
     if is_pc(obj):
         return obj.name
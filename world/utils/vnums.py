@@ -0,0 +1,173 @@
+"""
+hands out free vnums for the blueprint databases (rooms, objs, mobs, ...)
+
+Free vnums are kept as sorted, disjoint intervals, so finding the lowest
+free vnum of a zone's range is a bisect instead of a scan over every
+vnum in the database. Each BlueprintStore keeps its allocator in step as
+blueprints are written and deleted.
+"""
+from bisect import bisect_right
+
+MAX_VNUM = 2**31 - 1
+
+
+class VnumRangeFull(ValueError):
+    """raised when there is no free vnum left in the requested range"""
+    pass
+
+
+class IntervalSet:
+    """
+    Sorted set of disjoint, inclusive [start, end] intervals of ints
+
+    Lookups are a bisect, O(log n) in the number of intervals. Splitting
+    or merging intervals inserts into or deletes from plain lists, which
+    is O(n) but only moves pointers, a database would need many
+    thousands of holes for it to show next to the bisect.
+    """
+    def __init__(self, intervals=()):
+        self._starts = []
+        self._ends = []
+        for start, end in sorted(intervals):
+            self._starts.append(start)
+            self._ends.append(end)
+
+    def __contains__(self, value):
+        i = bisect_right(self._starts, value) - 1
+        return i >= 0 and self._ends[i] >= value
+
+    def __iter__(self):
+        return zip(self._starts, self._ends)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def first(self, low, high):
+        """lowest value in the set between low and high, None if there isn't one"""
+        i = bisect_right(self._starts, low) - 1
+        if i >= 0 and self._ends[i] >= low:
+            value = low
+        elif i + 1 < len(self._starts):
+            value = self._starts[i + 1]
+        else:
+            return None
+        return value if value <= high else None
+
+    def remove(self, value):
+        i = bisect_right(self._starts, value) - 1
+        if i < 0 or self._ends[i] < value:
+            return
+        start, end = self._starts[i], self._ends[i]
+        if start == end:
+            del self._starts[i]
+            del self._ends[i]
+        elif value == start:
+            self._starts[i] += 1
+        elif value == end:
+            self._ends[i] -= 1
+        else:
+            self._ends[i] = value - 1
+            self._starts.insert(i + 1, value + 1)
+            self._ends.insert(i + 1, end)
+
+    def add(self, value):
+        if value in self:
+            return
+        i = bisect_right(self._starts, value)  # interval after value
+        joins_left = i > 0 and self._ends[i - 1] == value - 1
+        joins_right = i < len(self._starts) and self._starts[i] == value + 1
+
+        if joins_left and joins_right:
+            self._ends[i - 1] = self._ends[i]
+            del self._starts[i]
+            del self._ends[i]
+        elif joins_left:
+            self._ends[i - 1] = value
+        elif joins_right:
+            self._starts[i] = value
+        else:
+            self._starts.insert(i, value)
+            self._ends.insert(i, value)
+
+
+class VnumAllocator:
+    """
+    Tracks the free vnums of a single blueprint database
+
+    Args:
+        used: vnums already taken
+        held: vnums handed out that have no blueprint yet, ex: the
+            allocator is rebuilt while an editor has one open
+    """
+    def __init__(self, used=(), held=()):
+        free, start = [], 1
+        for vnum in sorted(v for v in used if 1 <= v <= MAX_VNUM):
+            if vnum > start:
+                free.append((start, vnum - 1))
+            start = max(start, vnum + 1)
+        if start <= MAX_VNUM:
+            free.append((start, MAX_VNUM))
+        self.free = IntervalSet(free)
+
+        self.held = set()  # handed out, nothing written to them yet
+        for vnum in held:
+            if vnum in self.free:
+                self.free.remove(vnum)
+                self.held.add(vnum)
+
+    def is_free(self, vnum):
+        return vnum in self.free
+
+    def use(self, vnum):
+        """marks vnum as taken, ex: a blueprint was written to it"""
+        self.free.remove(vnum)
+        self.held.discard(vnum)
+
+    def release(self, vnum):
+        """gives vnum back, ex: its blueprint was deleted"""
+        self.held.discard(vnum)
+        if 1 <= vnum <= MAX_VNUM:
+            self.free.add(vnum)
+
+    def _first(self, low, high, exclude):
+        low, high = max(low, 1), min(high, MAX_VNUM)
+        while low <= high:
+            vnum = self.free.first(low, high)
+            if vnum is None:
+                return None
+            for start, end in exclude:
+                if start <= vnum <= end:
+                    low = end + 1
+                    break
+            else:
+                return vnum
+        return None
+
+    def allocate(self, low=1, high=MAX_VNUM, exclude=()):
+        """
+        takes and returns the lowest free vnum between low and high,
+        skipping the (start, end) ranges in exclude. Raises VnumRangeFull
+        if there isn't one.
+        """
+        vnum = self._first(low, high, exclude)
+        if vnum is None:
+            raise VnumRangeFull(f"no free vnums between {low} and {high}")
+        self.free.remove(vnum)
+        self.held.add(vnum)
+        return vnum
+
+    def reserve(self, count, low=1, high=MAX_VNUM, exclude=()):
+        """
+        takes the `count` lowest free vnums between low and high, all or
+        nothing, for bulk imports. Unused ones should be released.
+        """
+        vnums = []
+        try:
+            for _ in range(count):
+                vnums.append(self.allocate(low, high, exclude))
+        except VnumRangeFull:
+            for vnum in vnums:
+                self.release(vnum)
+            raise VnumRangeFull(
+                f"not enough free vnums between {low} and {high} for {count}")
+        return vnums